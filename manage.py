@@ -9,8 +9,26 @@ import sys
 import subprocess
 import json
 import argparse
+import asyncio
+import time
+from datetime import datetime
 from pathlib import Path
 
+from monitoring.accesslog import DEFAULT_LOG
+from monitoring.bench import compare_rows, load_mix, result_rows, run_bench
+from monitoring.loganalyze import DEFAULT_PATTERNS, analyze, summary_rows
+from monitoring.logtail import LEVELS, LogFollower
+from monitoring.query import (
+    AGGREGATES, DEFAULT_AGGREGATES, FORMATS, GROUP_BY,
+    format_rows, match_series, parse_duration, parse_time, run_query
+)
+from monitoring.replay import DEFAULT_METHODS, LogReplayer, replay_rows
+from monitoring.scenarios import ScenarioError, load_scenarios
+from monitoring.tsdb import TimeSeriesStore
+
+METRICS_DIR = os.environ.get('BOOKVERSE_METRICS_DIR', 'metrics')
+LOGS_POLL_INTERVAL = 0.5
+
 class Colors:
     OKGREEN = '\033[92m'
     WARNING = '\033[93m'
@@ -128,15 +146,81 @@ def status_app():
         else:
             print_warning("Nenhum processo Node.js encontrado")
 
-def logs_app():
-    """Mostra logs da aplicação"""
-    print_info("Logs do BookVerse:")
+LEVEL_COLORS = {'INFO': '', 'WARN': Colors.WARNING, 'ERROR': Colors.FAIL}
+
+def print_log_line(entry):
+    color = LEVEL_COLORS[entry.level]
+    print(f"{entry.clock} {color}{entry.level:<5}{Colors.ENDC if color else ''} "
+          f"{entry.source:<7} {entry.message}")
+
+def logs_app(args):
+    """Mostra os logs da aplicação e do monitor e acompanha as linhas novas"""
+    # Bytes lidos do fim de cada arquivo para mostrar as últimas --lines linhas
+    follower = LogFollower(capacity=max(args.lines, 1) * 4, initial_bytes=max(args.lines, 1) * 1024)
+    if not any(os.path.exists(path) for path in follower.paths):
+        if check_pm2():
+            run_command(f"pm2 logs bookverse --lines {args.lines}", capture=False)
+        else:
+            print_info(f"Nenhum log encontrado em {', '.join(follower.paths)}")
+            print_info("Logs são exibidos no terminal onde a aplicação está rodando")
+        return True
     
-    if check_pm2():
-        run_command("pm2 logs bookverse --lines 50", capture=False)
-    else:
-        print_info("PM2 não disponível")
-        print_info("Logs são exibidos no terminal onde a aplicação está rodando")
+    print_info(f"Logs do BookVerse: {', '.join(follower.paths)}")
+    follower.poll()
+    for entry in follower.recent(args.lines, args.level):
+        print_log_line(entry)
+    if args.no_follow:
+        return True
+    
+    minimum = LEVELS.index(args.level)
+    try:
+        while True:
+            time.sleep(LOGS_POLL_INTERVAL)
+            for entry in follower.poll():
+                if LEVELS.index(entry.level) >= minimum:
+                    print_log_line(entry)
+    except KeyboardInterrupt:
+        rates = follower.rates()
+        print_info(f"Último minuto: {rates['ERROR']} erro(s), {rates['WARN']} aviso(s)")
+    finally:
+        follower.close()
+    return True
+
+def logs_analyze_app(args):
+    """Estatísticas por rota dos access logs (nginx e PM2), em paralelo e incremental"""
+    patterns = args.files.split(',') if args.files else DEFAULT_PATTERNS
+    state_path = args.state if args.incremental else None
+    try:
+        analysis, info = analyze(patterns, args.processes, state_path)
+    except KeyboardInterrupt:
+        print_warning("Análise interrompida")
+        return False
+    if not info['files']:
+        print_error(f"Nenhum log encontrado em {', '.join(patterns)}")
+        return False
+    
+    summary = analysis.summary()
+    if args.format != 'table':
+        print(format_rows(summary_rows(summary, args.top), args.format))
+        return True
+    
+    megabytes = info['bytes'] / 1024 / 1024
+    rate = megabytes / info['elapsed'] if info['elapsed'] > 0 else 0
+    print_info(f"{len(info['files'])} arquivo(s), {megabytes:.1f} MB lidos em {info['elapsed']:.1f}s "
+               f"({rate:.0f} MB/s, {info['lines']} linhas)")
+    if info['incremental']:
+        print_info(f"Modo incremental: totais acumulados em {args.state}")
+    if analysis.invalid:
+        print_info(f"{analysis.invalid} linhas fora do formato de access log ignoradas")
+    if not summary:
+        print_warning("Nenhuma requisição encontrada. Para a API sem nginx, ative "
+                      "BOOKVERSE_ACCESS_LOG=1 (setup-pm2 já ativa)")
+        return True
+    print(format_rows(summary_rows(summary, args.top)))
+    if not any(route['latency'] for route in summary.values()):
+        print_warning("Sem $request_time nos logs (formato combined): sem percentis de latência. "
+                      "Use o log_format bookverse_timed do optimize.py")
+    return True
 
 def install_deps():
     """Instala dependências"""
@@ -198,7 +282,8 @@ def setup_pm2():
             "instances": 1,
             "exec_mode": "cluster",
             "env": {
-                "NODE_ENV": "production"
+                "NODE_ENV": "production",
+                "BOOKVERSE_ACCESS_LOG": "1"
             },
             "error_file": "./logs/err.log",
             "out_file": "./logs/out.log",
@@ -233,20 +318,215 @@ def monitor_app():
         print_error(f"Erro ao iniciar monitor: {e}")
         return False
 
+def metrics_app(args):
+    """Consulta as métricas gravadas pelo performance-monitor.py"""
+    if not os.path.isdir(METRICS_DIR):
+        print_error(f"Nenhuma métrica encontrada em {METRICS_DIR}/")
+        print_info("Inicie o monitor com: python3 performance-monitor.py")
+        return False
+    
+    if args.subaction == 'list':
+        store = TimeSeriesStore(METRICS_DIR, readonly=True)
+        names = store.series_names()
+        if args.series:
+            names = match_series(names, args.series)
+        for name in names:
+            print(name)
+        return True
+    
+    if args.subaction != 'query':
+        print_error("Use: manage.py metrics query|list [opções]")
+        return False
+    
+    try:
+        until = parse_time(args.until)
+        since = parse_time(args.since)
+        step = parse_duration(args.step) if args.step else None
+    except ValueError as e:
+        print_error(str(e))
+        return False
+    
+    aggregates = [name.strip() for name in args.agg.split(',')]
+    unknown = [name for name in aggregates if name not in AGGREGATES]
+    if unknown:
+        print_error(f"Agregados inválidos: {', '.join(unknown)} (disponíveis: {', '.join(AGGREGATES)})")
+        return False
+    
+    tiers, rows = run_query(
+        METRICS_DIR, args.series, since, until, step, aggregates, args.group_by
+    )
+    if not rows:
+        print_warning(f"Nenhum dado para '{args.series}' no intervalo")
+        return True
+    
+    if args.format == 'table':
+        print_info(f"Camadas consultadas: {', '.join(tiers)}")
+    print(format_rows(rows, args.format))
+    return True
+
+def bench_app(args):
+    """Gera carga em taxa constante contra o servidor e salva o resultado em JSON"""
+    scenarios = None
+    try:
+        if args.scenarios is not None:
+            scenarios = load_scenarios(args.scenarios or None)
+            routes = []
+        else:
+            routes = load_mix(args.mix)
+        duration = parse_duration(args.duration)
+        warmup = parse_duration(args.warmup)
+    except (ValueError, TypeError, ScenarioError) as e:
+        print_error(str(e))
+        return False
+    
+    unit = 'sessões/s' if scenarios else 'req/s'
+    print_info(f"Carga em {args.url}: {args.rate:g} {unit} por {args.duration} "
+               f"({args.connections} conexões, {args.processes} processo(s))")
+    print_info("Mistura: " + ', '.join(f"{choice.name}={choice.weight:g}" for choice in scenarios or routes))
+    try:
+        result = run_bench(args.url, routes, args.rate, duration, args.connections,
+                           args.processes, args.timeout, warmup, scenarios=scenarios)
+    except (OSError, RuntimeError) as e:
+        print_error(f"Falha no gerador de carga: {e}")
+        return False
+    except KeyboardInterrupt:
+        print_warning("Benchmark interrompido")
+        return False
+    
+    output = args.output or f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    
+    print(format_rows(result_rows(result)))
+    print()
+    if scenarios:
+        print_info("Sessões completas (latência da jornada inteira, com as pausas):")
+        print(format_rows(result_rows(result, 'scenarios')))
+        print()
+    if result['generator']['saturated']:
+        print_warning(f"Gerador atrasado (p99 {result['generator']['dispatch_lag']['p99']:.1f}ms): "
+                      "a taxa pedida não foi aplicada, use mais --processes")
+    for failure in result['generator']['failures']:
+        print_warning(f"Processo gerador falhou: {failure}")
+    print_success(f"Resultado salvo em {output}")
+    
+    if args.compare:
+        try:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print_error(f"Não foi possível ler {args.compare}: {e}")
+            return False
+        print_info(f"Comparação com {args.compare} (latência em ms, corrigida):")
+        print(format_rows(compare_rows(baseline, result)))
+    return True
+
+def replay_app(args):
+    """Reproduz um access log do nginx contra o servidor e compara as latências"""
+    if not os.path.exists(args.log):
+        print_error(f"Log não encontrado: {args.log}")
+        return False
+    try:
+        duration = parse_duration(args.duration) if args.log_duration else None
+    except ValueError as e:
+        print_error(str(e))
+        return False
+    
+    print_info(f"Reproduzindo {args.log} em {args.url} a {args.speed:g}x")
+    replayer = LogReplayer(
+        args.url, speed=args.speed, connections=args.connections, timeout=args.timeout,
+        methods=args.methods.split(','), prefix=args.prefix, duration=duration
+    )
+    try:
+        result = asyncio.run(replayer.run(args.log))
+    except KeyboardInterrupt:
+        print_warning("Replay interrompido")
+        return False
+    
+    output = args.output or f"replay-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    
+    counts = result['counts']
+    print_info(f"{counts['replayed']} requisições reproduzidas ({result['log_span']:.0f}s de log), "
+               f"{counts['skipped']} ignoradas, {counts['invalid']} linhas inválidas")
+    if not any(route['captured'] for route in result['routes'].values()):
+        print_warning("O log não tem $request_time (formato combined): sem latência registrada "
+                      "para comparar. Use o log_format bookverse_timed do optimize.py")
+    print(format_rows(replay_rows(result)))
+    lag = result['generator']['lag']
+    if lag and lag['p99'] > 100:
+        print_warning(f"Replay atrasado (p99 {lag['p99']:.0f}ms): o servidor ou o gerador "
+                      "não acompanhou a velocidade pedida")
+    print_success(f"Resultado salvo em {output}")
+    return True
+
 def main():
     """Função principal"""
     parser = argparse.ArgumentParser(description='BookVerse - Gerenciador da Aplicação')
     parser.add_argument('action', choices=[
         'start', 'stop', 'restart', 'status', 'logs',
-        'install', 'build', 'create-admin', 'setup-pm2', 'monitor'
+        'install', 'build', 'create-admin', 'setup-pm2', 'monitor', 'metrics', 'bench', 'replay'
     ], help='Ação a ser executada')
+    parser.add_argument('subaction', nargs='?', help='Subcomando (metrics: query, list; logs: analyze)')
+    
+    metrics = parser.add_argument_group('metrics')
+    metrics.add_argument('--series', default='*',
+                         help="Série ou glob (ex.: 'response_times:*.response_time')")
+    metrics.add_argument('--since', default='1h',
+                         help="Início: '2h', '14:00', 'yesterday 14:00' ou ISO")
+    metrics.add_argument('--until', default='now', help='Fim (mesmos formatos de --since)')
+    metrics.add_argument('--agg', default=','.join(DEFAULT_AGGREGATES),
+                         help=f"Agregados separados por vírgula ({', '.join(AGGREGATES)})")
+    metrics.add_argument('--group-by', choices=GROUP_BY, default='series',
+                         help='Agrupamento das séries')
+    metrics.add_argument('--step', help="Tamanho do bucket (ex.: 1m, 5m, 1h)")
+    metrics.add_argument('--format', choices=FORMATS, default='table', help='Formato de saída')
+    
+    bench = parser.add_argument_group('bench')
+    bench.add_argument('--url', default=os.environ.get('BOOKVERSE_URL', 'http://localhost:5000'),
+                       help='Servidor alvo (bench e replay)')
+    bench.add_argument('--rate', type=float, default=500, help='Requisições por segundo (taxa constante)')
+    bench.add_argument('--duration', default='30s', help='Duração da medição (ex.: 30s, 5m)')
+    bench.add_argument('--warmup', default='5s', help='Aquecimento fora dos histogramas')
+    bench.add_argument('--connections', type=int, default=64, help='Conexões keep-alive no total')
+    bench.add_argument('--processes', type=int, default=max(1, min(os.cpu_count() or 1, 4)),
+                       help='Processos geradores (bench) ou de leitura (logs analyze)')
+    bench.add_argument('--timeout', type=float, default=10, help='Timeout por requisição (s)')
+    bench.add_argument('--mix', help="Pesos ('search=5,health=1') ou arquivo JSON com as rotas")
+    bench.add_argument('--scenarios', nargs='?', const='',
+                       help='Sessões de cenários em vez de rotas avulsas (arquivo JSON opcional)')
+    bench.add_argument('--output', help='Arquivo do resultado (padrão: bench-<data>.json)')
+    bench.add_argument('--compare', help='Resultado anterior para comparar')
+    
+    replay = parser.add_argument_group('replay')
+    replay.add_argument('--log', default=DEFAULT_LOG, help='Access log do nginx (texto ou .gz)')
+    replay.add_argument('--speed', type=float, default=1.0, help='Aceleração (ex.: 10 = 10x)')
+    replay.add_argument('--methods', default=','.join(DEFAULT_METHODS),
+                        help='Métodos reproduzidos (o log não guarda corpos)')
+    replay.add_argument('--prefix', help="Só caminhos com este prefixo (ex.: /api/)")
+    replay.add_argument('--log-duration', action='store_true',
+                        help='Limita o trecho do log reproduzido a --duration')
+    
+    logs = parser.add_argument_group('logs')
+    logs.add_argument('--lines', type=int, default=50, help='Linhas exibidas antes de acompanhar')
+    logs.add_argument('--level', choices=LEVELS, default='INFO', help='Nível mínimo exibido')
+    logs.add_argument('--no-follow', action='store_true', help='Só mostra as últimas linhas')
+    logs.add_argument('--files', help=f"Padrões glob separados por vírgula (padrão: {','.join(DEFAULT_PATTERNS)})")
+    logs.add_argument('--incremental', action='store_true',
+                      help='Só lê o que foi acrescentado desde a última análise')
+    logs.add_argument('--state', default=os.path.join(METRICS_DIR, 'logs-analyze.json'),
+                      help='Arquivo de estado do modo incremental')
+    logs.add_argument('--top', type=int, default=30, help='Rotas exibidas')
     
     args = parser.parse_args()
     
-    print(f"{Colors.BOLD}{Colors.CYAN}")
-    print("🚀 BookVerse - Gerenciador")
-    print("=" * 40)
-    print(f"{Colors.ENDC}")
+    # Saídas legíveis por máquina não levam o cabeçalho
+    if not (args.action in ('metrics', 'logs') and args.format != 'table'):
+        print(f"{Colors.BOLD}{Colors.CYAN}")
+        print("🚀 BookVerse - Gerenciador")
+        print("=" * 40)
+        print(f"{Colors.ENDC}")
     
     # Verificar se estamos no diretório correto
     if not os.path.exists('server/server.js'):
@@ -263,7 +543,11 @@ def main():
     elif args.action == 'status':
         status_app()
     elif args.action == 'logs':
-        logs_app()
+        if args.subaction == 'analyze':
+            if not logs_analyze_app(args):
+                sys.exit(1)
+        elif not logs_app(args):
+            sys.exit(1)
     elif args.action == 'install':
         install_deps()
     elif args.action == 'build':
@@ -274,6 +558,15 @@ def main():
         setup_pm2()
     elif args.action == 'monitor':
         monitor_app()
+    elif args.action == 'metrics':
+        if not metrics_app(args):
+            sys.exit(1)
+    elif args.action == 'bench':
+        if not bench_app(args):
+            sys.exit(1)
+    elif args.action == 'replay':
+        if not replay_app(args):
+            sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
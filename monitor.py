@@ -7,10 +7,19 @@ Painel de monitoramento estilo terminal com dados em tempo real
 import os
 import sys
 import time
-import random
-import subprocess
+import argparse
 from datetime import datetime, timedelta
-import psutil
+from urllib.parse import urlsplit
+
+from monitoring.dashboard import DEFAULT_URL, DashboardSampler
+from monitoring.logtail import DEFAULT_SOURCES
+from monitoring.fleet import FleetSampler, load_nodes
+from monitoring.selfstats import ProcessUsage, SamplingProfiler, Spans
+from monitoring.shm import SharedMetricsReader
+from monitoring.terminal import TerminalRenderer, display_width, truncate
+
+# Intervalo padrão de atualização da tela (segundos)
+REFRESH_INTERVAL = 3
 
 class Colors:
     GREEN = '\033[92m'
@@ -21,128 +30,148 @@ class Colors:
     WHITE = '\033[97m'
     RESET = '\033[0m'
 
+LEVEL_ICONS = {'INFO': '🟢', 'WARN': '🟡', 'ERROR': '🔴'}
+
+def pad(text, width):
+    """Ajusta o texto à largura exata, cortando com reticências se necessário"""
+    text = truncate(str(text), width)
+    return text + ' ' * (width - display_width(text))
+
+def row(*cells):
+    """Linha de painel com colunas de larguras fixas: row(('texto', 32), ('texto', 41))"""
+    return '│ ' + ' │ '.join(pad(text, width) for text, width in cells) + ' │'
+
+def panel(title, lines):
+    """Painel com título na largura padrão do monitor (80 colunas)"""
+    return '\n'.join([
+        '┌' + '─' * 78 + '┐', row((title, 76)), '├' + '─' * 78 + '┤',
+        *lines,
+        '└' + '─' * 78 + '┘',
+    ])
+
+def format_duration(seconds):
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+def format_ms(value):
+    return f"{value:.0f}ms" if value is not None else '—'
+
+def format_bytes(value):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024:
+            return f"{value:.0f}{unit}" if unit == 'B' else f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}TB"
+
+def format_number(value):
+    return f"{value:,}" if isinstance(value, int) else '—'
+
 class BookVerseMonitor:
-    def __init__(self):
+    def __init__(self, base_url=DEFAULT_URL, log_sources=DEFAULT_SOURCES, refresh=REFRESH_INTERVAL,
+                 plain=False, shared=True):
         self.start_time = datetime.now()
-        self.cpu_history = []
-        self.ram_history = []
-        self.network_history = []
-        self.logs = []
-        self.total_requests = 12847
-        self.active_connections = 47
-        self.online_users = 23
-        
-        # Inicializar históricos
-        for _ in range(30):
-            self.cpu_history.append(random.randint(20, 80))
-            self.ram_history.append(random.randint(30, 70))
-            self.network_history.append(random.randint(10, 90))
-        
-        # Logs iniciais
-        self.generate_initial_logs()
-    
-    def clear_screen(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
-    
-    def get_uptime(self):
-        uptime = datetime.now() - self.start_time
-        hours, remainder = divmod(int(uptime.total_seconds()), 3600)
-        minutes, seconds = divmod(remainder, 60)
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-    
-    def get_system_stats(self):
+        self.base_url = base_url.rstrip('/')
+        self.log_sources = log_sources
+        self.refresh = refresh
+        self.plain = plain
+        # Coletas abaixo de 1s não mudam nada visível e só aumentam o custo
+        self.sampler = DashboardSampler(
+            self.base_url, log_sources, interval=max(refresh, 1),
+            shared=self.attach_shared() if shared else None
+        )
+        self.track_overhead()
+
+    def track_overhead(self):
+        """Custo do próprio painel: CPU/RSS, tempo de coleta, renderização e escrita"""
+        self.spans = Spans()
+        self.usage = ProcessUsage()
+        self.overhead = self.usage.sample()
+        self.frame_bytes = 0
+        self.profiler = SamplingProfiler('monitor')
+
+    @staticmethod
+    def attach_shared():
+        """Anexa (somente leitura) às métricas do performance-monitor.py, se estiver rodando"""
+        if not SharedMetricsReader.exists():
+            return None
         try:
-            cpu_percent = psutil.cpu_percent()
-            ram_percent = psutil.virtual_memory().percent
-            return cpu_percent, ram_percent
-        except:
-            return random.randint(40, 80), random.randint(30, 70)
-    
-    def update_sparklines(self):
-        cpu, ram = self.get_system_stats()
-        
-        # Atualizar históricos
-        self.cpu_history.append(int(cpu))
-        self.ram_history.append(int(ram))
-        self.network_history.append(random.randint(20, 90))
-        
-        # Manter apenas últimos 30 valores
-        if len(self.cpu_history) > 30:
-            self.cpu_history.pop(0)
-        if len(self.ram_history) > 30:
-            self.ram_history.pop(0)
-        if len(self.network_history) > 30:
-            self.network_history.pop(0)
-    
+            reader = SharedMetricsReader()
+        except (OSError, ValueError):
+            return None
+        return reader if reader.writer_alive() else None
+
+    def get_uptime(self, server):
+        """Uptime do servidor (da API); sem ele, tempo desde o início do monitor"""
+        if server.get('uptime') is not None:
+            uptime = timedelta(seconds=int(server['uptime']))
+        else:
+            uptime = datetime.now() - self.start_time
+        return format_duration(uptime.total_seconds())
+
+    def format_rate(self, rate):
+        return f"{format_bytes(rate)}/s"
+
     def create_sparkline(self, data):
         chars = "▁▂▃▄▅▆▇█"
         if not data:
             return "▁" * 30
-        
+
         max_val = max(data) if max(data) > 0 else 1
         sparkline = ""
-        
+
         for value in data:
             index = min(int((value / max_val) * 7), 7)
             sparkline += chars[index]
-        
+
         return sparkline
-    
-    def generate_log_entry(self):
-        log_types = [
-            ("INFO", "🟢", [
-                "Usuário 'maria_silva' fez login com sucesso",
-                "Download iniciado: \"Dom Casmurro.pdf\" por joão123",
-                "Novo livro aprovado: \"1984\" por George Orwell",
-                "Backup automático concluído (2.3GB)",
-                "Usuário 'pedro_santos' cadastrou novo livro",
-                "Sistema de notificações funcionando normalmente"
-            ]),
-            ("WARN", "🟡", [
-                "Rate limit atingido para IP 192.168.1.45",
-                "Tentativa de login falhada para usuário 'admin'",
-                "Espaço em disco baixo (15% restante)",
-                "Conexão lenta detectada para usuário remoto"
-            ]),
-            ("ERROR", "🔴", [
-                "Falha temporária na conexão MongoDB (reconectando...)",
-                "Erro ao processar upload de arquivo",
-                "Timeout na conexão com serviço externo",
-                "Falha na verificação de SSL"
-            ])
-        ]
-        
-        log_type, emoji, messages = random.choice(log_types)
-        message = random.choice(messages)
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        
-        return f"[{timestamp}] {emoji} {log_type}  - {message}"
-    
-    def generate_initial_logs(self):
-        for _ in range(6):
-            self.logs.append(self.generate_log_entry())
-    
-    def update_logs(self):
-        if random.random() < 0.3:  # 30% chance de novo log
-            self.logs.append(self.generate_log_entry())
-            if len(self.logs) > 6:
-                self.logs.pop(0)
-    
-    def update_stats(self):
-        # Simular mudanças nas estatísticas
-        self.total_requests += random.randint(0, 5)
-        self.active_connections = max(1, self.active_connections + random.randint(-3, 5))
-        self.online_users = max(1, self.online_users + random.randint(-2, 3))
-    
+
+    def overhead_line(self):
+        """Rodapé com o custo do painel (ele divide a VPS com o servidor)"""
+        timings = ' '.join(
+            f"{label} {format_ms(spans.mean(name))}"
+            for label, spans, name in (('coleta', self.sampler.spans, 'sample'),
+                                       ('render', self.spans, 'render'),
+                                       ('escrita', self.spans, 'draw'))
+        )
+        line = truncate(f"Painel: CPU {self.overhead['cpu']:.1f}% RSS {format_bytes(self.overhead['rss'])} | "
+                        f"{timings} | {format_bytes(self.frame_bytes)}/quadro", 78)
+        if self.profiler.last_path:
+            line += f"\n  Perfil: {truncate(self.profiler.last_path, 70)}"
+        return line
+
+    def status_icon(self, state):
+        if state is None:
+            return '⚪'
+        return '🟢' if state else '🔴'
+
     def render_dashboard(self):
-        uptime = self.get_uptime()
-        cpu_current = self.cpu_history[-1] if self.cpu_history else 0
-        ram_current = self.ram_history[-1] if self.ram_history else 0
-        
-        cpu_sparkline = self.create_sparkline(self.cpu_history)
-        ram_sparkline = self.create_sparkline(self.ram_history)
-        network_sparkline = self.create_sparkline(self.network_history)
-        
+        snapshot = self.sampler.snapshot
+        if snapshot is None:
+            return f"{Colors.CYAN}Coletando dados de {self.base_url}...{Colors.RESET}"
+
+        server = snapshot['server']
+        stats = snapshot['stats'] or {}
+        services = snapshot['services']
+        url = urlsplit(self.base_url)
+
+        cpu_history = snapshot['cpu_history']
+        ram_history = snapshot['ram_history']
+        network_history = snapshot['network_history']
+        cpu_current = cpu_history[-1] if cpu_history else 0
+        ram_current = ram_history[-1] if ram_history else 0
+        network_current = network_history[-1] if network_history else 0
+
+        if server.get('online'):
+            status = f"🟢 Online ({server['latency']:.0f}ms)"
+        elif server.get('online') is None:
+            status = "⚪ Verificando..."
+        else:
+            status = f"🔴 Offline: {server.get('error') or 'sem resposta'}"
+
+        database = server.get('database')
+        database_ok = None if database is None else database not in ('disconnected', 'error')
+
         dashboard = f"""╔══════════════════════════════════════════════════════════════════════════════╗
 ║  ██████╗  ██████╗  ██████╗ ██╗  ██╗██╗   ██╗███████╗██████╗ ███████╗███████╗ ║
 ║  ██╔══██╗██╔═══██╗██╔═══██╗██║ ██╔╝██║   ██║██╔════╝██╔══██╗██╔════╝██╔════╝ ║
@@ -156,92 +185,194 @@ class BookVerseMonitor:
 ┌──────────────────────────────────────────────────────────────────────────────┐
 │ STATUS DO SERVIDOR                                                           │
 ├──────────────────────────────────────────────────────────────────────────────┤
-│ Host: vps-bookverse.com          │ Uptime: {uptime:<30} │
-│ Status: 🟢 Online                │ Conexões Ativas: {self.active_connections:<19} │
-│ Porta: 5000                      │ Total Requisições: {self.total_requests:<17} │
-│ Versão: v1.0.0                   │ Usuários Online: {self.online_users:<21} │
+{row((f"Host: {url.hostname}", 32), (f"Uptime: {self.get_uptime(server)}", 41))}
+{row((f"Status: {status}", 32), (f"Conexões Ativas: {snapshot['connections']}", 41))}
+{row((f"Porta: {url.port or ''}", 32), (f"Requisições (log): {format_number(snapshot['total_requests'])}", 41))}
+{row((f"Versão: {server.get('version', '—')}", 32), (f"Usuários Online (5min): {snapshot['online_users']}", 41))}
 └──────────────────────────────────────────────────────────────────────────────┘
 
 ┌──────────────────────────────────────────────────────────────────────────────┐
-│ MONITORAMENTO EM TEMPO REAL                                                 │
+│ MONITORAMENTO EM TEMPO REAL                                                  │
 ├──────────────────────────────────────────────────────────────────────────────┤
 │                                                                              │
-│ CPU Usage ({cpu_current:2d}%): {cpu_sparkline:<50} │
-│ RAM Usage ({ram_current:2d}%): {ram_sparkline:<50} │
-│ Network I/O:     {network_sparkline:<50} │
+{row((f"CPU Usage ({cpu_current:2.0f}%): {self.create_sparkline(cpu_history)}", 76))}
+{row((f"RAM Usage ({ram_current:2.0f}%): {self.create_sparkline(ram_history)}", 76))}
+{row((f"Rede ({self.format_rate(network_current):>8}): {self.create_sparkline(network_history)}", 76))}
 │                                                                              │
-│ MongoDB: 🟢 Conectado    │ Nginx: 🟢 Ativo     │ PM2: 🟢 Rodando           │
-│ SSL: 🟢 Válido           │ Firewall: 🟢 Ativo  │ Backup: 🟡 Pendente       │
+{row((f"Banco: {self.status_icon(database_ok)} {database or '—'}", 23),
+     (f"Nginx: {self.status_icon(services.get('nginx'))}", 22),
+     (f"PM2: {self.status_icon(services.get('pm2'))}", 25))}
+{row((f"Ambiente: {server.get('environment', '—')}", 23),
+     (f"Erros/min: {snapshot['errors_per_minute']}", 22),
+     (f"Buscas (log): {format_number(snapshot['total_searches'])}", 25))}
 └──────────────────────────────────────────────────────────────────────────────┘
 
 ┌──────────────────────────────────────────────────────────────────────────────┐
 │ LOGS RECENTES                                                                │
 ├──────────────────────────────────────────────────────────────────────────────┤"""
 
-        # Adicionar logs
-        for log in self.logs[-6:]:
-            dashboard += f"\n│ {log:<76} │"
-        
+        logs = snapshot['logs']
+        for clock, level, source, message in logs:
+            dashboard += f"\n{row((f'[{clock}] {LEVEL_ICONS[level]} {level:<5} {source:<7} {message}', 76))}"
+
         # Preencher linhas vazias se necessário
-        while len(self.logs) < 6:
+        if not logs:
+            sources = ', '.join(self.log_sources.values())
+            dashboard += f"\n{row((f'Sem entradas em {sources}', 76))}"
+        for _ in range(max(len(logs), 1), 6):
             dashboard += f"\n│{' ' * 78}│"
-        
+
+        disk = (f"{format_bytes(snapshot['disk_used'])} / {format_bytes(snapshot['disk_total'])}"
+                if snapshot['disk_total'] else '—')
         dashboard += f"""
 └──────────────────────────────────────────────────────────────────────────────┘
 
 ┌──────────────────────────────────────────────────────────────────────────────┐
 │ ESTATÍSTICAS RÁPIDAS                                                         │
 ├──────────────────────────────────────────────────────────────────────────────┤
-│ 📚 Total de Livros: 1,247        │ 👥 Usuários Registrados: 892             │
-│ 📥 Downloads Hoje: 156           │ 📊 Livros Pendentes: 8                   │
-│ 🔍 Buscas Realizadas: 2,341      │ 💾 Espaço Usado: 45.2GB / 100GB         │
+{row((f"📚 Total de Livros: {format_number(stats.get('totalBooks'))}", 32),
+     (f"👥 Usuários Registrados: {format_number(stats.get('totalUsers'))}", 41))}
+{row((f"📥 Downloads Totais: {format_number(stats.get('totalDownloads'))}", 32),
+     (f"📊 Livros Pendentes: {format_number(stats.get('pendingBooks'))}", 41))}
+{row((f"🔍 Buscas (log): {format_number(snapshot['total_searches'])}", 32),
+     (f"💾 Espaço Usado: {disk}", 41))}
 └──────────────────────────────────────────────────────────────────────────────┘
 
 ┌──────────────────────────────────────────────────────────────────────────────┐
 │ LINKS DE ACESSO                                                              │
 ├──────────────────────────────────────────────────────────────────────────────┤
-│ 🌐 Site Principal: https://vps-bookverse.com                                │
-│ ⚙️  Dashboard Admin: https://vps-bookverse.com/admin                        │
-│ 📊 API Status: https://vps-bookverse.com/api/status                         │
-│ 📋 Logs Completos: tail -f /var/www/bookverse/logs/combined.log             │
+{row((f"🌐 Site Principal: {self.base_url}", 76))}
+{row((f"⚙️  Dashboard Admin: {self.base_url}/admin", 76))}
+{row((f"📊 API Status: {self.base_url}/api/status", 76))}
+{row((f"📋 Logs Completos: python3 manage.py logs", 76))}
 └──────────────────────────────────────────────────────────────────────────────┘
 
 ┌──────────────────────────────────────────────────────────────────────────────┐
 │ COMANDOS ÚTEIS                                                               │
 ├──────────────────────────────────────────────────────────────────────────────┤
-│ Reiniciar: pm2 restart bookverse    │ Status: pm2 status                    │
-│ Logs: pm2 logs bookverse            │ Parar: pm2 stop bookverse            │
-│ Backup: python3 manage.py backup    │ Update: git pull && pm2 restart all  │
+│ Reiniciar: pm2 restart bookverse    │ Status: pm2 status                     │
+│ Logs: python3 manage.py logs        │ Parar: pm2 stop bookverse              │
+│ Backup: python3 manage.py backup    │ Update: git pull && pm2 restart all    │
 └──────────────────────────────────────────────────────────────────────────────┘
 
-                    Última atualização: {datetime.now().strftime('%H:%M:%S')} | Próxima em 3s...
+                    Última atualização: {datetime.fromtimestamp(snapshot['timestamp']).strftime('%H:%M:%S')} | Atualização a cada {self.refresh:g}s
+                    Fonte: {snapshot['source']}
+  {self.overhead_line()}
                          Pressione Ctrl+C para sair"""
-        
+
         return dashboard
-    
+
     def run(self):
+        self.sampler.start()
+        # kill -USR1 <pid>: grava um perfil por amostragem de 10s
+        self.profiler.install()
         try:
-            while True:
-                self.clear_screen()
-                self.update_sparklines()
-                self.update_logs()
-                self.update_stats()
-                
-                dashboard = self.render_dashboard()
-                print(dashboard)
-                
-                time.sleep(3)
-                
+            # Só as células alteradas são reescritas a cada quadro
+            with TerminalRenderer(force_plain=self.plain) as screen:
+                while True:
+                    self.overhead = self.usage.sample()
+                    with self.spans.span('render'):
+                        frame = self.render_dashboard()
+                    with self.spans.span('draw'):
+                        self.frame_bytes = screen.draw(frame)
+                    time.sleep(self.refresh)
+
         except KeyboardInterrupt:
-            print(f"\n\n{Colors.CYAN}Monitor BookVerse encerrado.{Colors.RESET}")
+            self.sampler.stop()
+            print(f"\n{Colors.CYAN}Monitor BookVerse encerrado.{Colors.RESET}")
             sys.exit(0)
 
+class FleetMonitor(BookVerseMonitor):
+    """Painel de vários nós: um painel por servidor e o resumo da frota"""
+
+    def __init__(self, nodes, refresh=REFRESH_INTERVAL, plain=False, timeout=None):
+        self.start_time = datetime.now()
+        self.nodes = nodes
+        self.refresh = refresh
+        self.plain = plain
+        interval = max(refresh, 1)
+        self.sampler = FleetSampler(nodes, interval=interval, timeout=timeout or interval * 0.75)
+        self.track_overhead()
+
+    def render_node(self, status):
+        if not status['online']:
+            return panel(f"🔴 {status['name']}", [
+                row((f"Offline: {status['error']}", 76)),
+                row((status['url'], 76)),
+            ])
+
+        memory = '—'
+        if status['rss'] is not None:
+            memory = f"{format_bytes(status['rss'])} ({status['memory_pressure'] * 100:.0f}% do limite)"
+        heap = '—'
+        if status['heap_used'] is not None and status['heap_total']:
+            heap = f"{format_bytes(status['heap_used'])} / {format_bytes(status['heap_total'])}"
+        rate = f"{status['request_rate']:.1f}" if status['request_rate'] is not None else '—'
+        uptime = format_duration(status['uptime']) if status['uptime'] is not None else '—'
+
+        return panel(f"🟢 {status['name']}  {status['url']}", [
+            row((f"Latência: {format_ms(status['latency'])}", 23),
+                (f"Uptime: {uptime}", 22),
+                (f"Banco: {status['database'] or '—'}", 25)),
+            row((f"Req/s: {rate}", 23),
+                (f"p99: {format_ms(status['p99'])}", 22),
+                (f"Em andamento: {status['in_flight'] if status['in_flight'] is not None else '—'}", 25)),
+            row((f"RSS: {memory}", 46), (f"Heap: {heap}", 25)),
+        ])
+
+    def render_dashboard(self):
+        snapshot = self.sampler.snapshot
+        if snapshot is None:
+            return f"{Colors.CYAN}Consultando {len(self.nodes)} nós...{Colors.RESET}"
+
+        summary = snapshot['summary']
+        rate = f"{summary['request_rate']:.1f} req/s" if summary['request_rate'] is not None else '—'
+        worst = (f"{format_ms(summary['worst_p99'])} ({summary['worst_p99_node']})"
+                 if summary['worst_p99'] is not None else '—')
+        memory = (f"{summary['memory_pressure'] * 100:.0f}% ({summary['memory_pressure_node']})"
+                  if summary['memory_pressure'] is not None else '—')
+        icon = '🟢' if summary['online'] == summary['nodes'] else ('🟡' if summary['online'] else '🔴')
+
+        sections = [panel("📚 BookVerse - Frota", [
+            row((f"Nós: {icon} {summary['online']}/{summary['nodes']} online", 32),
+                (f"Taxa total: {rate}", 41)),
+            row((f"Pior p99: {worst}", 32), (f"Maior pressão de memória: {memory}", 41)),
+        ])]
+        sections.extend(self.render_node(status) for status in snapshot['nodes'])
+        sections.append(
+            f"       Última atualização: {datetime.fromtimestamp(snapshot['timestamp']).strftime('%H:%M:%S')}"
+            f" | Atualização a cada {self.refresh:g}s | Ctrl+C para sair\n  {self.overhead_line()}"
+        )
+        return '\n\n'.join(sections)
+
 def main():
+    parser = argparse.ArgumentParser(description='BookVerse - Monitor de Servidor')
+    parser.add_argument('--url', default=os.environ.get('BOOKVERSE_URL', DEFAULT_URL),
+                        help='URL do servidor (padrão: BOOKVERSE_URL ou http://localhost:5000)')
+    parser.add_argument('--refresh', type=float, default=REFRESH_INTERVAL,
+                        help='Intervalo de atualização da tela em segundos (aceita frações)')
+    parser.add_argument('--plain', action='store_true',
+                        help='Sem tela alternativa nem cursor: imprime cada quadro inteiro')
+    parser.add_argument('--no-shared', action='store_true',
+                        help='Coleta própria mesmo com o performance-monitor.py publicando métricas')
+    parser.add_argument('--nodes', nargs='?', const='nodes.json',
+                        help='Modo multi-nó: arquivo JSON de nós ou URLs separadas por vírgula')
+    parser.add_argument('--timeout', type=float,
+                        help='Timeout por nó no modo multi-nó (segundos)')
+    args = parser.parse_args()
+
     print(f"{Colors.CYAN}Iniciando Monitor BookVerse...{Colors.RESET}")
-    time.sleep(1)
-    
-    monitor = BookVerseMonitor()
+
+    if args.nodes or os.environ.get('BOOKVERSE_NODES'):
+        nodes = load_nodes(args.nodes)
+        if not nodes:
+            print(f"{Colors.RED}Nenhum nó configurado em {args.nodes}{Colors.RESET}")
+            sys.exit(1)
+        monitor = FleetMonitor(nodes, refresh=args.refresh, plain=args.plain, timeout=args.timeout)
+    else:
+        monitor = BookVerseMonitor(args.url, refresh=args.refresh, plain=args.plain,
+                                   shared=not args.no_shared)
     monitor.run()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,94 @@
+"""
+BookVerse - Componentes de Monitoramento
+Estruturas compartilhadas por performance-monitor.py, monitor.py e manage.py
+
+Módulos que dependem do psutil (ex.: monitoring.workers) não são importados aqui,
+para que manage.py funcione sem ele.
+"""
+
+from .accesslog import LogEntry, arrivals, read_entries, route_key
+from .adaptive import AdaptiveInterval, Baselines, CpuBudget, TokenBucket
+from .anomaly import AnomalyDetector
+from .bench import LoadGenerator, Route, SessionGenerator, load_mix, run_bench
+from .aggregates import AggregateEngine, EwmaStats, HdrHistogram, OnlineStats, SeriesAggregate
+from .fleet import FleetSampler, Node, load_nodes
+from .http import PHASES, HttpClient, HttpError, HttpResponse
+from .leaks import LeakTracker, TrendFit
+from .loganalyze import LogAnalysis, analyze
+from .logtail import LogFollower, LogLine, LogTail
+from .probes import Probe, ProbeEngine, ProbeResult, load_probes
+from .replay import LogReplayer
+from .ringbuffer import RingBuffer
+from .push import PushAgent, PushAggregator
+from .rollup import DEFAULT_TIERS, RollupManager, Tier
+from .scenarios import Scenario, ScenarioProbes, ScenarioRunner, Step, load_scenarios
+from .scheduler import Job, Scheduler
+from .slo import SLO, SLOEngine, load_slos
+from .selfstats import ProcessUsage, SamplingProfiler, Spans
+from .shm import SharedMetricsReader, SharedMetricsWriter
+from .terminal import TerminalRenderer
+from .tsdb import TimeSeriesStore
+
+__all__ = [
+    'DEFAULT_TIERS',
+    'PHASES',
+    'AdaptiveInterval',
+    'AggregateEngine',
+    'AnomalyDetector',
+    'Baselines',
+    'CpuBudget',
+    'EwmaStats',
+    'FleetSampler',
+    'HdrHistogram',
+    'HttpClient',
+    'HttpError',
+    'HttpResponse',
+    'LeakTracker',
+    'LogAnalysis',
+    'LogEntry',
+    'LogFollower',
+    'LogLine',
+    'LogReplayer',
+    'LogTail',
+    'LoadGenerator',
+    'Job',
+    'Node',
+    'OnlineStats',
+    'Probe',
+    'ProcessUsage',
+    'ProbeEngine',
+    'ProbeResult',
+    'PushAgent',
+    'PushAggregator',
+    'RingBuffer',
+    'Route',
+    'RollupManager',
+    'SLO',
+    'SLOEngine',
+    'SamplingProfiler',
+    'Scenario',
+    'ScenarioProbes',
+    'ScenarioRunner',
+    'Scheduler',
+    'SeriesAggregate',
+    'SessionGenerator',
+    'SharedMetricsReader',
+    'SharedMetricsWriter',
+    'Spans',
+    'Step',
+    'TerminalRenderer',
+    'Tier',
+    'TimeSeriesStore',
+    'TokenBucket',
+    'TrendFit',
+    'analyze',
+    'arrivals',
+    'load_mix',
+    'load_nodes',
+    'load_probes',
+    'load_scenarios',
+    'load_slos',
+    'read_entries',
+    'route_key',
+    'run_bench',
+]
@@ -0,0 +1,182 @@
+"""
+Leitura em fluxo dos access logs do nginx (formato combined)
+Aceita também o formato bookverse_timed, que acrescenta $request_time,
+$upstream_response_time e $msec; arquivos .gz são lidos sem descompactar em disco
+"""
+
+import calendar
+import gzip
+import heapq
+import string
+
+DEFAULT_LOG = '/var/log/nginx/bookverse_access.log'
+
+# Linhas gravadas fora de ordem (o nginx grava ao fim da requisição) são reordenadas
+# por início dentro desta janela (segundos); memória limitada à janela
+REORDER_WINDOW = 5.0
+REORDER_LIMIT = 100000
+
+_MONTHS = {
+    month: index for index, month in enumerate(
+        ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1
+    )
+}
+_HEX = frozenset(string.hexdigits + '-')
+
+
+class LogEntry:
+    """Uma requisição do access log; tempos em epoch (s) e durações em ms"""
+
+    __slots__ = ('time', 'start', 'method', 'path', 'status', 'size',
+                 'request_time', 'upstream_time', 'precise')
+
+    def __init__(self, time, method, path, status, size, request_time=None,
+                 upstream_time=None, precise=False):
+        self.time = time
+        self.method = method
+        self.path = path
+        self.status = status
+        self.size = size
+        self.request_time = request_time
+        self.upstream_time = upstream_time
+        # Com $msec o horário tem milissegundos; no combined puro, só segundos
+        self.precise = precise
+        self.start = time - (request_time or 0) / 1000
+
+
+class TimeParser:
+    """'10/Oct/2024:13:55:36 -0300' -> epoch, com cache do último segundo"""
+
+    __slots__ = ('text', 'value')
+
+    def __init__(self):
+        self.text = None
+        self.value = None
+
+    def __call__(self, text):
+        if text != self.text:
+            day, month, year = int(text[0:2]), _MONTHS[text[3:6]], int(text[7:11])
+            hour, minute, second = int(text[12:14]), int(text[15:17]), int(text[18:20])
+            offset = text[21:26]
+            seconds = calendar.timegm((year, month, day, hour, minute, second))
+            if offset:
+                sign = -1 if offset[0] == '-' else 1
+                seconds -= sign * (int(offset[1:3]) * 3600 + int(offset[3:5]) * 60)
+            self.text, self.value = text, seconds
+        return self.value
+
+
+def _milliseconds(text):
+    # $upstream_response_time pode ter vários valores ('0.010, 0.012') ou '-'
+    text = text.rsplit(',', 1)[-1].strip()
+    if not text or text == '-':
+        return None
+    return float(text) * 1000
+
+
+def parse_line(line, parse_time=None):
+    """Converte uma linha do access log em LogEntry (None se não estiver no formato)"""
+    parse_time = parse_time or TimeParser()
+    try:
+        opening = line.index('[')
+        closing = line.index(']', opening)
+        quote = line.index('"', closing)
+        end_quote = line.index('"', quote + 1)
+        method, _, target = line[quote + 1:end_quote].partition(' ')
+        path = target.rsplit(' ', 1)[0] if target.endswith(('HTTP/1.0', 'HTTP/1.1', 'HTTP/2.0')) else target
+        fields = line[end_quote + 1:].split(None, 2)
+        status = int(fields[0])
+        size = int(fields[1]) if fields[1] != '-' else 0
+        timestamp = parse_time(line[opening + 1:closing])
+    except (ValueError, IndexError, KeyError):
+        return None
+
+    request_time = upstream_time = None
+    precise = False
+    # Campos depois do user agent (último trecho entre aspas): formato bookverse_timed
+    tail = line[line.rindex('"') + 1:].split() if len(fields) > 2 else []
+    if len(tail) >= 3:
+        try:
+            request_time = float(tail[0]) * 1000
+            upstream_time = _milliseconds(' '.join(tail[1:-1]))
+            timestamp = float(tail[-1])
+            precise = True
+        except ValueError:
+            request_time = upstream_time = None
+    return LogEntry(timestamp, method, path, status, size, request_time, upstream_time, precise)
+
+
+def open_log(path):
+    """Abre um log (texto ou .gz) para leitura em fluxo"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, encoding='utf-8', errors='replace')
+
+
+def read_entries(path, counts=None):
+    """LogEntry de cada linha válida, na ordem do arquivo; `counts` recebe linhas lidas e inválidas"""
+    counts = counts if counts is not None else {}
+    counts.setdefault('lines', 0)
+    counts.setdefault('invalid', 0)
+    parse_time = TimeParser()
+    with open_log(path) as f:
+        for line in f:
+            counts['lines'] += 1
+            entry = parse_line(line, parse_time)
+            if entry is None:
+                counts['invalid'] += 1
+                continue
+            yield entry
+
+
+def _spread(entries):
+    # Sem $msec, as requisições do mesmo segundo são distribuídas dentro dele
+    group = []
+    for entry in entries:
+        if entry.precise:
+            yield from _flush(group)
+            group = []
+            yield entry
+            continue
+        if group and group[0].time != entry.time:
+            yield from _flush(group)
+            group = []
+        group.append(entry)
+    yield from _flush(group)
+
+
+def _flush(group):
+    count = len(group)
+    for index, entry in enumerate(group):
+        entry.time += index / count
+        entry.start = entry.time - (entry.request_time or 0) / 1000
+        yield entry
+
+
+def arrivals(entries, window=REORDER_WINDOW, limit=REORDER_LIMIT):
+    """
+    Entradas em ordem de chegada (início da requisição), reordenadas numa janela
+    deslizante de `window` segundos (e no máximo `limit` entradas, se o log voltar no tempo)
+    """
+    heap = []
+    counter = 0
+    for entry in _spread(entries):
+        heapq.heappush(heap, (entry.start, counter, entry))
+        counter += 1
+        while heap and (heap[0][0] <= entry.start - window or len(heap) > limit):
+            yield heapq.heappop(heap)[2]
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+
+def route_key(path):
+    """
+    Rota normalizada para agrupar estatísticas: sem query string e com IDs
+    (números, ObjectIds, UUIDs) trocados por ':id'
+    """
+    path = path.split('?', 1)[0]
+    segments = path.split('/')
+    for index, segment in enumerate(segments):
+        if segment.isdigit() or (len(segment) >= 16 and _HEX.issuperset(segment)):
+            segments[index] = ':id'
+    return '/'.join(segments) or '/'
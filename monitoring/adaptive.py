@@ -0,0 +1,145 @@
+"""
+Amostragem adaptativa
+Intervalos que apertam quando uma série foge da linha de base (ou uma sonda falha)
+e relaxam aos poucos até a taxa base, com tetos de CPU do monitor e de QPS das sondas
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+
+from .aggregates import EwmaStats
+
+# Após apertar, o intervalo fica rápido por HOLD segundos e depois cresce DECAY vezes por execução
+HOLD = 30
+DECAY = 1.5
+
+# Desvio que aperta a amostragem: z-score acima de DEVIATION_Z e variação relativa acima
+# de DEVIATION_MIN (evita reagir a ruído em séries quase constantes)
+DEVIATION_Z = 3.0
+DEVIATION_MIN = 0.1
+WARMUP = 10
+
+# Tetos: CPU do próprio monitor (% de um núcleo) e requisições de sonda por segundo
+CPU_BUDGET = float(os.environ.get('BOOKVERSE_MONITOR_CPU', 5))
+PROBE_QPS = float(os.environ.get('BOOKVERSE_PROBE_QPS', 10))
+BUDGET_WINDOW = 10
+MAX_STRETCH = 4
+
+
+class AdaptiveInterval:
+    """Intervalo entre `fast` e `base`; tighten() aperta, relax() volta aos poucos"""
+
+    def __init__(self, base, fast=None, hold=HOLD, decay=DECAY):
+        self.base = base
+        self.fast = min(fast if fast is not None else base, base)
+        self.hold = hold
+        self.decay = decay
+        self.current = base
+        self.tightened = 0
+        self._hold_until = 0.0
+
+    def tighten(self, now=None):
+        """Passa ao intervalo rápido; True se ainda não estava nele"""
+        now = time.monotonic() if now is None else now
+        changed = self.current > self.fast
+        if changed:
+            self.tightened += 1
+        self.current = self.fast
+        self._hold_until = now + self.hold
+        return changed
+
+    def release(self):
+        """Volta direto ao intervalo base, sem esperar o tempo de permanência"""
+        self.current = self.base
+        self._hold_until = 0.0
+
+    def relax(self, now=None, stretch=1.0):
+        """Chamado após cada execução; `stretch` > 1 alonga a base (monitor acima do orçamento)"""
+        now = time.monotonic() if now is None else now
+        base = self.base * stretch
+        if stretch > 1:
+            self.current = base
+        elif now >= self._hold_until:
+            self.current = min(self.current * self.decay, base)
+        return self.current
+
+
+class CpuBudget:
+    """
+    Teto de CPU do próprio processo (% de um núcleo) medido numa janela deslizante.
+
+    Acima do teto, apertos são recusados e os intervalos base são alongados
+    proporcionalmente ao excesso (até MAX_STRETCH vezes).
+    """
+
+    def __init__(self, limit=CPU_BUDGET, window=BUDGET_WINDOW):
+        self.limit = limit
+        self.window = window
+        self.readings = deque([(time.monotonic(), time.process_time())])
+
+    def usage(self):
+        now, cpu = time.monotonic(), time.process_time()
+        self.readings.append((now, cpu))
+        while len(self.readings) > 2 and now - self.readings[1][0] >= self.window:
+            self.readings.popleft()
+        first_time, first_cpu = self.readings[0]
+        elapsed = now - first_time
+        # Janela ainda curta (início do monitor): a medida não é representativa
+        if elapsed < self.window / 2:
+            return None
+        return (cpu - first_cpu) / elapsed * 100
+
+    def stretch(self):
+        """1.0 dentro do orçamento; acima dele, fator de alongamento dos intervalos"""
+        usage = self.usage() if self.limit else None
+        if usage is None:
+            return 1.0
+        return min(max(usage / self.limit, 1.0), MAX_STRETCH)
+
+
+class TokenBucket:
+    """Limita a taxa (por segundo) com rajadas de até `burst` unidades"""
+
+    def __init__(self, rate=PROBE_QPS, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.waited = 0.0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            delay = (1 - self.tokens) / self.rate
+            self.waited += delay
+            await asyncio.sleep(delay)
+
+
+class Baselines:
+    """Linha de base EWMA por série para decidir quando apertar a amostragem"""
+
+    def __init__(self, z=DEVIATION_Z, minimum=DEVIATION_MIN, warmup=WARMUP):
+        self.z = z
+        self.minimum = minimum
+        self.warmup = warmup
+        self.series = {}
+
+    def deviates(self, name, value):
+        """Registra a amostra; True se ela foge da linha de base"""
+        stats = self.series.get(name)
+        if stats is None:
+            stats = self.series[name] = EwmaStats()
+        deviates = (
+            stats.count >= self.warmup
+            and abs(value - stats.mean) > self.minimum * abs(stats.mean)
+            and abs(stats.zscore(value, floor=1e-9)) > self.z
+        )
+        stats.record(value)
+        return deviates
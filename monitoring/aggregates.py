@@ -0,0 +1,318 @@
+"""
+Agregados incrementais para séries de métricas
+Média/variância/mín/máx online e histograma HDR mesclável para percentis
+"""
+
+import math
+import struct
+
+# Percentis reportados por padrão
+DEFAULT_PERCENTILES = (50, 90, 99, 99.9)
+
+# Estado serializado de OnlineStats: count, mean, m2, min, max
+_STATS = struct.Struct('<Qdddd')
+
+
+def write_varint(buffer, value):
+    """Acrescenta um inteiro não negativo em LEB128 a um bytearray"""
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data, offset):
+    """Lê um inteiro LEB128; retorna (valor, próximo offset)"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def percentile_key(percentile):
+    """Nome do campo de um percentil no snapshot (ex.: 99.9 -> 'p999')"""
+    return 'p' + f"{percentile:g}".replace('.', '')
+
+
+class OnlineStats:
+    """Contagem, média, variância, mínimo e máximo em O(1) por amostra (Welford)"""
+
+    __slots__ = ('count', 'mean', '_m2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def record(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def state(self):
+        """Estado completo (count, mean, m2, min, max) para persistência"""
+        return self.count, self.mean, self._m2, self.min, self.max
+
+    @classmethod
+    def from_state(cls, count, mean, m2, minimum, maximum):
+        stats = cls()
+        stats.count, stats.mean, stats._m2 = count, mean, m2
+        stats.min, stats.max = minimum, maximum
+        return stats
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+    def merge(self, other):
+        """Combina outro OnlineStats neste (algoritmo paralelo de Chan)"""
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.mean, self._m2 = other.count, other.mean, other._m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self._m2 += other._m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+
+class EwmaStats:
+    """
+    Média e variância com decaimento exponencial em O(1) por amostra.
+
+    `alpha` é o peso da amostra nova: 0.1 equivale a uma memória de ~10 amostras.
+    """
+
+    __slots__ = ('alpha', 'count', 'mean', 'variance')
+
+    def __init__(self, alpha=0.1):
+        self.alpha = alpha
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+
+    def record(self, value):
+        if not self.count:
+            self.mean = value
+        else:
+            delta = value - self.mean
+            increment = self.alpha * delta
+            self.mean += increment
+            self.variance = (1 - self.alpha) * (self.variance + delta * increment)
+        self.count += 1
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+    def zscore(self, value, floor=0.0):
+        """Desvios-padrão entre `value` e a média; `floor` evita divisões por ~0 em séries planas"""
+        spread = max(self.stddev, floor)
+        if not self.count or spread <= 0:
+            return 0.0
+        return (value - self.mean) / spread
+
+
+class HdrHistogram:
+    """
+    Histograma HDR (log-linear) com precisão relativa fixa.
+
+    Valores são convertidos para inteiros via `scale` (ex.: ms * 1000 = µs).
+    Cada registro é O(1); histogramas com a mesma configuração são mescláveis.
+    """
+
+    def __init__(self, significant_figures=2, scale=1000):
+        largest_sub_bucket = 2 * 10 ** significant_figures
+        self.significant_figures = significant_figures
+        self.scale = scale
+        self._sub_bucket_bits = (largest_sub_bucket - 1).bit_length()
+        self._half_bits = self._sub_bucket_bits - 1
+        self.counts = {}
+        self.total = 0
+
+    def _index(self, units):
+        bucket = units.bit_length() - self._sub_bucket_bits
+        if bucket < 0:
+            bucket = 0
+        return (bucket << self._half_bits) + (units >> bucket)
+
+    def _highest_equivalent(self, index):
+        bucket = max(0, (index >> self._half_bits) - 1)
+        sub_bucket = index - (bucket << self._half_bits)
+        return ((sub_bucket + 1) << bucket) - 1
+
+    def record(self, value, count=1):
+        units = int(value * self.scale)
+        if units < 0:
+            units = 0
+        index = self._index(units)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+
+    def merge(self, other):
+        """Soma as contagens de outro histograma com a mesma configuração"""
+        if (other.significant_figures, other.scale) != (self.significant_figures, self.scale):
+            raise ValueError("Histogramas com configurações diferentes")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        return self
+
+    def percentiles(self, percentiles=DEFAULT_PERCENTILES):
+        """Calcula vários percentis em uma única passada pelos buckets"""
+        result = {p: 0.0 for p in percentiles}
+        if not self.total:
+            return result
+
+        targets = sorted(
+            (max(1, math.ceil(p / 100 * self.total)), p) for p in percentiles
+        )
+        position = 0
+        cumulative = 0
+        for index in sorted(self.counts):
+            cumulative += self.counts[index]
+            while position < len(targets) and cumulative >= targets[position][0]:
+                result[targets[position][1]] = self._highest_equivalent(index) / self.scale
+                position += 1
+            if position == len(targets):
+                break
+        return result
+
+    def percentile(self, percentile):
+        return self.percentiles((percentile,))[percentile]
+
+    def encode(self, buffer=None):
+        """Serializa os buckets não vazios (índices em delta + contagens, varint)"""
+        buffer = bytearray() if buffer is None else buffer
+        write_varint(buffer, len(self.counts))
+        previous = 0
+        for index in sorted(self.counts):
+            write_varint(buffer, index - previous)
+            write_varint(buffer, self.counts[index])
+            previous = index
+        return buffer
+
+    def decode(self, data, offset=0):
+        """Soma a este histograma os buckets serializados; retorna o próximo offset"""
+        size, offset = read_varint(data, offset)
+        index = 0
+        for _ in range(size):
+            delta, offset = read_varint(data, offset)
+            count, offset = read_varint(data, offset)
+            index += delta
+            self.counts[index] = self.counts.get(index, 0) + count
+            self.total += count
+        return offset
+
+
+class SeriesAggregate:
+    """Estatísticas online e histograma de percentis de uma série"""
+
+    def __init__(self, significant_figures=2, scale=1000):
+        self.stats = OnlineStats()
+        self.histogram = HdrHistogram(significant_figures, scale)
+
+    def record(self, value):
+        self.stats.record(value)
+        self.histogram.record(value)
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        self.histogram.merge(other.histogram)
+        return self
+
+    def encode(self, buffer=None):
+        """Serializa estatísticas e histograma em formato binário compacto"""
+        buffer = bytearray() if buffer is None else buffer
+        buffer += _STATS.pack(*self.stats.state())
+        return self.histogram.encode(buffer)
+
+    @classmethod
+    def decode(cls, data, offset=0, significant_figures=2, scale=1000):
+        """Reconstrói um agregado serializado; retorna (agregado, próximo offset)"""
+        aggregate = cls(significant_figures, scale)
+        aggregate.stats = OnlineStats.from_state(*_STATS.unpack_from(data, offset))
+        offset = aggregate.histogram.decode(data, offset + _STATS.size)
+        return aggregate, offset
+
+    @property
+    def count(self):
+        return self.stats.count
+
+    @property
+    def mean(self):
+        return self.stats.mean
+
+    def snapshot(self, percentiles=DEFAULT_PERCENTILES):
+        """Resumo serializável: count, mean, stddev, min, max e percentis"""
+        stats = self.stats
+        summary = {
+            'count': stats.count,
+            'mean': stats.mean,
+            'stddev': stats.stddev,
+            'min': stats.min if stats.count else 0.0,
+            'max': stats.max if stats.count else 0.0,
+        }
+        for percentile, value in self.histogram.percentiles(percentiles).items():
+            summary[percentile_key(percentile)] = value
+        return summary
+
+
+class AggregateEngine:
+    """Conjunto de agregados por nome de série"""
+
+    def __init__(self, significant_figures=2, scale=1000):
+        self.significant_figures = significant_figures
+        self.scale = scale
+        self.series = {}
+
+    def get(self, name):
+        aggregate = self.series.get(name)
+        if aggregate is None:
+            aggregate = SeriesAggregate(self.significant_figures, self.scale)
+            self.series[name] = aggregate
+        return aggregate
+
+    def record(self, name, value):
+        self.get(name).record(value)
+
+    def mean(self, name):
+        aggregate = self.series.get(name)
+        return aggregate.mean if aggregate else 0
+
+    def snapshot(self, name, percentiles=DEFAULT_PERCENTILES):
+        return self.get(name).snapshot(percentiles)
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES):
+        return {
+            name: aggregate.snapshot(percentiles)
+            for name, aggregate in self.series.items()
+        }
+
+    def merge(self, other):
+        for name, aggregate in other.series.items():
+            self.get(name).merge(aggregate)
+        return self
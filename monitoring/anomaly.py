@@ -0,0 +1,248 @@
+"""
+Detecção de anomalias por série, em fluxo
+Cada série compara a amostra com uma linha de base EWMA (média/variância com
+decaimento no tempo) e, quando já há histórico, com a linha de base da mesma
+hora da semana; o estado por série tem tamanho fixo
+"""
+
+import json
+import math
+import os
+import time
+from collections import deque
+
+from .aggregates import EwmaStats
+
+# Meia-vida da linha de base EWMA (segundos): independe da taxa de amostragem
+HALF_LIFE = 600
+WARMUP = 20
+STALE = 10 * HALF_LIFE
+
+# Anomalia: |z| acima de THRESHOLD por CONFIRM amostras seguidas; termina abaixo de CLEAR
+THRESHOLD = 4.0
+CLEAR = 2.0
+CONFIRM = 3
+
+# Durante uma anomalia (ou enquanto ela se confirma) a linha de base aprende 10x mais
+# devagar: ela não absorve o desvio de imediato, mas uma mudança de patamar permanente
+# acaba virando o normal
+ANOMALY_DAMPING = 0.1
+
+# Linha de base sazonal: 168 horas da semana; cada semana entra com peso SEASONAL_ALPHA
+HOURS_PER_WEEK = 168
+SEASONAL_ALPHA = 0.3
+SEASONAL_WEEKS = 1
+
+RECENT_EVENTS = 100
+
+
+def _hour_of_week(timestamp):
+    local = time.localtime(timestamp)
+    # Dia (desde a época) em que começou a semana local da amostra: identifica a semana
+    week = (int(timestamp) + local.tm_gmtoff) // 86400 - local.tm_wday
+    return local.tm_wday * 24 + local.tm_hour, week
+
+
+class SeasonalBaseline:
+    """
+    Média e dispersão de cada hora da semana, aprendidas semana a semana.
+
+    Na hora corrente acumula média/variância da semana (Welford); na virada da
+    semana, o resumo entra nas médias móveis daquela hora.
+    """
+
+    __slots__ = ('buckets',)
+
+    def __init__(self, buckets=None):
+        # Por hora: [semanas, média, variância entre semanas, variância interna,
+        #            semana corrente, n, média corrente, m2 corrente]
+        self.buckets = buckets or [None] * HOURS_PER_WEEK
+
+    def _fold(self, bucket):
+        weeks, mean, spread, within, _, count, current_mean, m2 = bucket
+        if count < 2:
+            return
+        variance = m2 / (count - 1)
+        if not weeks:
+            mean, spread, within = current_mean, 0.0, variance
+        else:
+            delta = current_mean - mean
+            mean += SEASONAL_ALPHA * delta
+            spread = (1 - SEASONAL_ALPHA) * (spread + SEASONAL_ALPHA * delta * delta)
+            within += SEASONAL_ALPHA * (variance - within)
+        bucket[:4] = [weeks + 1, mean, spread, within]
+
+    def record(self, timestamp, value):
+        hour, week = _hour_of_week(timestamp)
+        bucket = self.buckets[hour]
+        if bucket is None:
+            bucket = self.buckets[hour] = [0, 0.0, 0.0, 0.0, week, 0, 0.0, 0.0]
+        if bucket[4] != week:
+            self._fold(bucket)
+            bucket[4:] = [week, 0, 0.0, 0.0]
+        count = bucket[5] + 1
+        delta = value - bucket[6]
+        bucket[6] += delta / count
+        bucket[7] += delta * (value - bucket[6])
+        bucket[5] = count
+
+    def expected(self, timestamp):
+        """(média, desvio) esperados para esta hora da semana, ou None sem histórico"""
+        bucket = self.buckets[_hour_of_week(timestamp)[0]]
+        if bucket is None or bucket[0] < SEASONAL_WEEKS:
+            return None
+        return bucket[1], math.sqrt(bucket[2] + bucket[3])
+
+
+class SeriesDetector:
+    """Estado de uma série: linha de base EWMA, sazonal opcional e anomalia em curso"""
+
+    __slots__ = ('ewma', 'seasonal', 'last', 'streak', 'active')
+
+    def __init__(self, seasonal=True):
+        self.ewma = EwmaStats()
+        self.seasonal = SeasonalBaseline() if seasonal else None
+        self.last = None
+        self.streak = 0
+        self.active = None
+
+    def score(self, timestamp, value, floor):
+        """z-score da amostra; com histórico sazonal, o menor dos dois (os dois precisam estranhar)"""
+        if self.ewma.count < WARMUP:
+            return 0.0, None
+        deviation = value - self.ewma.mean
+        if abs(deviation) < floor:
+            return 0.0, self.ewma.mean
+        z = self.ewma.zscore(value, floor=floor / THRESHOLD)
+        expected = self.ewma.mean
+
+        seasonal = self.seasonal.expected(timestamp) if self.seasonal else None
+        if seasonal is not None:
+            mean, stddev = seasonal
+            if abs(value - mean) < floor:
+                return 0.0, mean
+            seasonal_z = (value - mean) / max(stddev, floor / THRESHOLD)
+            if abs(seasonal_z) < abs(z):
+                z, expected = seasonal_z, mean
+        return z, expected
+
+    def learn(self, timestamp, value):
+        alpha = None
+        if self.last is not None and timestamp - self.last > STALE:
+            # Monitor parado por muito tempo: a linha de base EWMA recomeça do zero
+            self.ewma = EwmaStats()
+            self.last = None
+        if self.last is not None:
+            alpha = 1 - 0.5 ** (max(timestamp - self.last, 0) / HALF_LIFE)
+            if self.active or self.streak:
+                alpha *= ANOMALY_DAMPING
+        self.ewma.alpha = alpha if alpha is not None else self.ewma.alpha
+        self.ewma.record(value)
+        self.last = timestamp
+        if self.seasonal:
+            self.seasonal.record(timestamp, value)
+
+
+class AnomalyDetector:
+    """
+    Detector de anomalias para várias séries.
+
+    `rules` define, por série ('cpu'), por métrica e campo ('workers.rss') ou por métrica
+    ('response_times'), a direção observada ('high', 'low' ou 'both'), o desvio absoluto
+    mínimo (`floor`) e se há linha de base sazonal (`seasonal`, padrão True).
+    observe() retorna um evento ao começar ou terminar uma anomalia.
+    """
+
+    def __init__(self, rules=None, path=None):
+        self.rules = rules or {}
+        self.path = path
+        self.series = {}
+        self.recent = deque(maxlen=RECENT_EVENTS)
+        if path:
+            self.load()
+
+    def rule(self, name):
+        metric = name.partition(':')[0].partition('.')[0]
+        candidates = [name, metric]
+        if '.' in name:
+            candidates.insert(1, f"{metric}.{name.rsplit('.', 1)[1]}")
+        for candidate in candidates:
+            if candidate in self.rules:
+                return self.rules[candidate]
+        return {}
+
+    def observe(self, name, value, timestamp=None):
+        """Registra uma amostra; retorna {'type': 'start'|'end', ...} ou None"""
+        timestamp = time.time() if timestamp is None else timestamp
+        rule = self.rule(name)
+        detector = self.series.get(name)
+        if detector is None:
+            detector = self.series[name] = SeriesDetector(rule.get('seasonal', True))
+
+        z, expected = detector.score(timestamp, value, rule.get('floor', 0.0))
+        direction = rule.get('direction', 'high')
+        signed = z if direction == 'high' else -z if direction == 'low' else abs(z)
+        event = None
+
+        if detector.active is None:
+            detector.streak = detector.streak + 1 if signed >= THRESHOLD else 0
+            if detector.streak >= CONFIRM:
+                detector.active = {
+                    'type': 'start', 'series': name, 'started': timestamp, 'value': value,
+                    'expected': expected, 'zscore': z, 'peak': value,
+                    'seasonal': bool(detector.seasonal and detector.seasonal.expected(timestamp)),
+                }
+                event = dict(detector.active)
+        else:
+            active = detector.active
+            if abs(value - active['expected']) > abs(active['peak'] - active['expected']):
+                active['peak'] = value
+            if signed < CLEAR:
+                event = dict(active, type='end', ended=timestamp, value=value,
+                             duration=timestamp - active['started'])
+                detector.active = None
+                detector.streak = 0
+
+        detector.learn(timestamp, value)
+        if event:
+            self.recent.append(event)
+        return event
+
+    def active(self):
+        return [dict(detector.active) for detector in self.series.values() if detector.active]
+
+    def summary(self):
+        return {'active': self.active(), 'recent': list(self.recent)}
+
+    def state(self):
+        """Estado serializável das linhas de base (para sobreviver a reinícios)"""
+        return {
+            name: {
+                'ewma': [detector.ewma.count, detector.ewma.mean, detector.ewma.variance],
+                'last': detector.last,
+                'seasonal': detector.seasonal.buckets if detector.seasonal else None,
+            }
+            for name, detector in self.series.items()
+        }
+
+    def save(self):
+        if not self.path:
+            return
+        temp_file = f'{self.path}.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(self.state(), f)
+        os.replace(temp_file, self.path)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        for name, saved in state.items():
+            detector = SeriesDetector(saved.get('seasonal') is not None)
+            detector.ewma.count, detector.ewma.mean, detector.ewma.variance = saved['ewma']
+            detector.last = saved.get('last')
+            if saved.get('seasonal') is not None:
+                detector.seasonal = SeasonalBaseline(saved['seasonal'])
+            self.series[name] = detector
@@ -0,0 +1,511 @@
+"""
+Gerador de carga HTTP em malha aberta para o `manage.py bench`
+As requisições partem em taxa constante, no horário previsto, quer as anteriores
+tenham respondido ou não; a latência é medida a partir do horário previsto, o que
+corrige a omissão coordenada (um servidor travado não "freia" o gerador)
+"""
+
+import asyncio
+import base64
+import bisect
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+from datetime import datetime
+
+from .aggregates import HdrHistogram
+from .http import HttpClient, HttpError
+from .scenarios import ScenarioRunner, variables_from_env
+
+# Rotas exercitadas por padrão e seus pesos na mistura; {book_id} vem de uma busca inicial
+DEFAULT_MIX = [
+    {'name': 'search', 'path': '/api/books/search?query=dom', 'weight': 50},
+    {'name': 'health', 'path': '/api/health', 'weight': 30},
+    {'name': 'login', 'method': 'POST', 'path': '/api/auth/login', 'weight': 10, 'body': 'credentials'},
+    {'name': 'download', 'method': 'POST', 'path': '/api/books/download/{book_id}', 'weight': 10},
+]
+
+# Usado em /download/:id quando a busca inicial não retorna livros (o servidor responde 404)
+PLACEHOLDER_ID = '000000000000000000000000'
+
+PERCENTILES = (50, 90, 99, 99.9, 99.99, 100)
+
+# Atraso do próprio gerador (p99, ms) acima do qual a taxa pedida não foi realmente aplicada
+GENERATOR_LAG_WARNING = 10
+
+# Segundos entre o disparo dos processos e o início sincronizado da carga
+START_DELAY = 1.0
+
+
+class Route:
+    """Uma rota da mistura: método, caminho, corpo JSON e peso"""
+
+    def __init__(self, name, path, method='GET', weight=1, body=None, headers=None):
+        self.name = name
+        self.path = path
+        self.method = method.upper()
+        self.weight = weight
+        self.body = body
+        self.headers = headers or {}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+def load_mix(spec=None):
+    """
+    Mistura de rotas: arquivo JSON (lista de rotas) ou pesos 'search=5,health=1'
+    sobre as rotas padrão
+    """
+    if not spec:
+        return [Route.from_dict(route) for route in DEFAULT_MIX]
+    if os.path.exists(spec):
+        with open(spec) as f:
+            return [Route.from_dict(route) for route in json.load(f)]
+
+    defaults = {route['name']: route for route in DEFAULT_MIX}
+    routes = []
+    for item in spec.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in defaults:
+            raise ValueError(f"Rota desconhecida: {name!r} (disponíveis: {', '.join(defaults)})")
+        routes.append(Route.from_dict(dict(defaults[name], weight=float(weight or 1))))
+    return routes
+
+
+def credentials_from_env():
+    """Credenciais do login: BOOKVERSE_EMAIL/BOOKVERSE_PASSWORD ou um usuário inexistente"""
+    return {
+        'email': os.environ.get('BOOKVERSE_EMAIL', 'bench@bookverse.invalid'),
+        'password': os.environ.get('BOOKVERSE_PASSWORD', 'bench'),
+    }
+
+
+async def discover_book_ids(base_url, limit=100):
+    """IDs de livros para /download/:id, obtidos de uma busca sem filtro"""
+    client = HttpClient(max_connections=1)
+    try:
+        response = await client.get(f"{base_url}/api/books/search", timeout=10)
+        books = response.json() if response.status == 200 else []
+    except (OSError, ValueError, asyncio.TimeoutError, HttpError):
+        books = []
+    finally:
+        await client.close()
+    ids = [str(book.get('_id') or book.get('id')) for book in books
+           if isinstance(book, dict) and (book.get('_id') or book.get('id'))]
+    return ids[:limit] or [PLACEHOLDER_ID]
+
+
+class RouteStats:
+    """Contadores e histogramas de uma rota em um processo gerador"""
+
+    __slots__ = ('sent', 'latency', 'service', 'status', 'errors', 'timeouts', 'unfinished')
+
+    def __init__(self):
+        self.sent = 0
+        # Latência corrigida: do horário previsto até a resposta (ou até o timeout)
+        self.latency = HdrHistogram()
+        # Tempo de serviço: do envio até a resposta (o que um gerador em malha fechada mediria)
+        self.service = HdrHistogram()
+        self.status = {}
+        self.errors = {}
+        # Requisições que estouraram o timeout (estão em `latency`, mas não responderam)
+        self.timeouts = 0
+        # Ainda em andamento quando a carga terminou: canceladas e registradas em `latency`
+        # com a espera até o fim da execução
+        self.unfinished = 0
+
+    def state(self):
+        return {
+            'sent': self.sent,
+            'timeouts': self.timeouts,
+            'unfinished': self.unfinished,
+            'latency': bytes(self.latency.encode()),
+            'service': bytes(self.service.encode()),
+            'status': self.status,
+            'errors': self.errors,
+        }
+
+    def merge_state(self, state):
+        self.sent += state['sent']
+        self.timeouts += state['timeouts']
+        self.unfinished += state['unfinished']
+        self.latency.decode(state['latency'])
+        self.service.decode(state['service'])
+        for field in ('status', 'errors'):
+            counts = getattr(self, field)
+            for key, count in state[field].items():
+                counts[key] = counts.get(key, 0) + count
+
+
+class LoadGenerator:
+    """
+    Dispara requisições em taxa constante (`rate` por segundo) durante `duration`.
+
+    Cada requisição tem um horário previsto fixo (início + i / rate). Quando o
+    event loop se atrasa, todas as requisições já vencidas partem de uma vez, e o
+    atraso do próprio gerador é medido à parte. Respostas durante `warmup` não
+    entram nos histogramas.
+    """
+
+    def __init__(self, base_url, routes, rate, duration, connections=64, timeout=10,
+                 warmup=0.0, context=None, seed=None):
+        self.base_url = base_url.rstrip('/')
+        self.choices = routes
+        self.rate = rate
+        self.duration = duration
+        self.connections = connections
+        self.timeout = timeout
+        self.warmup = warmup
+        self.context = context or {}
+        self.random = random.Random(seed)
+        self.stats = {}
+        self.dispatch_lag = HdrHistogram()
+        # Espera máxima pelas requisições em andamento quando a carga termina
+        self.drain = timeout + 1
+        self._cumulative = list(itertools.accumulate(choice.weight for choice in routes))
+        self._client = None
+        self._measure_from = 0.0
+
+    def _pick(self):
+        point = self.random.random() * self._cumulative[-1]
+        return self.choices[bisect.bisect_right(self._cumulative, point)]
+
+    def _stats(self, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = RouteStats()
+        return stats
+
+    @staticmethod
+    def _record(stats, intended, finished, status, elapsed, error=None, timed_out=False):
+        if error:
+            stats.errors[error] = stats.errors.get(error, 0) + 1
+            if timed_out:
+                # Quem esperou o timeout inteiro entra na latência corrigida; sem isso, um
+                # servidor travado mostraria percentis melhores (só os rápidos contariam)
+                stats.timeouts += 1
+                stats.latency.record((finished - intended) * 1000)
+            return
+        stats.latency.record((finished - intended) * 1000)
+        stats.service.record(elapsed)
+        status = str(status)
+        stats.status[status] = stats.status.get(status, 0) + 1
+
+    def _prepare(self, route):
+        path = route.path
+        if '{book_id}' in path:
+            path = path.replace('{book_id}', self.random.choice(self.context.get('book_ids') or [PLACEHOLDER_ID]))
+        body = self.context.get(route.body) if isinstance(route.body, str) else route.body
+        return self.base_url + path, body
+
+    def _dispatch(self, intended, loop, measured):
+        """
+        Próxima chegada (uma requisição de uma rota sorteada): retorna as estatísticas
+        onde ela conta (None fora da medição) e a corrotina
+        """
+        route = self._pick()
+        stats = None
+        if measured:
+            stats = self._stats(route.name)
+            stats.sent += 1
+        return stats, self._request(route, intended, loop, measured)
+
+    async def _request(self, route, intended, loop, measured):
+        url, body = self._prepare(route)
+        response = None
+        try:
+            response = await self._client.request(
+                route.method, url, headers=route.headers, json_body=body, timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            error = 'timeout'
+        except (OSError, ValueError, EOFError, HttpError) as e:
+            error = e.__class__.__name__
+        else:
+            error = None
+        if measured:
+            self._record(self._stats(route.name), intended, loop.time(),
+                         response and response.status, response and response.elapsed, error,
+                         timed_out=error == 'timeout')
+
+    async def run(self, start_at=None, offset=0.0):
+        """Executa a carga; `start_at` (epoch) sincroniza vários processos geradores"""
+        loop = asyncio.get_running_loop()
+        if self._client is None:
+            self._client = HttpClient(max_connections=self.connections, idle_timeout=self.timeout * 2)
+        start = loop.time() + max((start_at or time.time()) - time.time(), 0) + offset
+        self._measure_from = start + self.warmup
+        end = start + self.warmup + self.duration
+        interval = 1 / self.rate
+        # Tarefas em andamento -> (estatísticas, horário previsto)
+        pending = {}
+        sent = 0
+        try:
+            while True:
+                intended = start + sent * interval
+                if intended >= end:
+                    break
+                delay = intended - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                now = loop.time()
+                # Dispara tudo o que já venceu: o atraso do loop não reduz a taxa
+                while intended <= now and intended < end:
+                    measured = intended >= self._measure_from
+                    if measured:
+                        self.dispatch_lag.record((now - intended) * 1000)
+                    stats, coroutine = self._dispatch(intended, loop, measured)
+                    task = asyncio.create_task(coroutine)
+                    pending[task] = (stats, intended)
+                    task.add_done_callback(pending.pop)
+                    sent += 1
+                    intended = start + sent * interval
+            if pending:
+                await asyncio.wait(list(pending), timeout=self.drain)
+            # O que não terminou no prazo também é amostra: sem isso, justamente as
+            # requisições mais lentas sumiriam dos histogramas
+            finished = loop.time()
+            for stats, intended in pending.values():
+                if stats is not None:
+                    stats.unfinished += 1
+                    stats.latency.record((finished - intended) * 1000)
+        finally:
+            for task in list(pending):
+                task.cancel()
+            await self._client.close()
+
+    def state(self):
+        return {
+            'routes': {name: stats.state() for name, stats in self.stats.items()},
+            'dispatch_lag': bytes(self.dispatch_lag.encode()),
+        }
+
+
+class SessionGenerator(LoadGenerator):
+    """
+    Chegadas de sessões (cenários) em taxa constante: `rate` é em sessões por segundo.
+
+    A primeira etapa de cada sessão é medida a partir do horário previsto da chegada;
+    as seguintes, a partir do fim do tempo de pensar (o usuário espera a resposta
+    anterior). Cada etapa tem estatísticas '<cenário>-<etapa>'; a sessão inteira
+    (etapas e pausas) fica em `sessions`.
+    """
+
+    def __init__(self, base_url, scenarios, rate, duration, connections=64, timeout=10,
+                 warmup=0.0, context=None, seed=None):
+        super().__init__(base_url, scenarios, rate, duration, connections, timeout,
+                         warmup, context, seed)
+        self.sessions = {scenario.name: RouteStats() for scenario in scenarios}
+        self.drain = max(
+            sum(step.repeat * (max(step.think if isinstance(step.think, (list, tuple))
+                                   else [step.think]) + step.timeout)
+                for step in scenario.steps)
+            for scenario in scenarios
+        ) + 1
+        self.runner = None
+        self._seed = seed
+
+    def _dispatch(self, intended, loop, measured):
+        scenario = self._pick()
+        stats = None
+        if measured:
+            stats = self.sessions[scenario.name]
+            stats.sent += 1
+        return stats, self._session(scenario, intended, loop, measured)
+
+    async def _session(self, scenario, intended, loop, measured):
+        def on_step(step, result, due, finished):
+            if measured:
+                stats = self._stats(step.probe.name)
+                stats.sent += 1
+                self._record(stats, due, finished, result.status_code,
+                             result.response_time, result.error,
+                             timed_out=bool(result.error) and result.error.startswith('Timeout'))
+
+        completed = await self.runner.run(scenario, on_step, due=intended)
+        if measured:
+            finished = loop.time()
+            self._record(self.sessions[scenario.name], intended, finished,
+                         'completed', (finished - intended) * 1000, None if completed else 'aborted')
+
+    async def run(self, start_at=None, offset=0.0):
+        self._client = HttpClient(max_connections=self.connections, idle_timeout=self.timeout * 2)
+        self.runner = ScenarioRunner(self.base_url, self._client, self.context.get('variables'),
+                                     seed=self._seed)
+        await super().run(start_at, offset)
+
+    def state(self):
+        state = super().state()
+        state['sessions'] = {name: stats.state() for name, stats in self.sessions.items()}
+        return state
+
+
+def _worker(generator, start_at, offset, queue):
+    try:
+        asyncio.run(generator.run(start_at, offset))
+        queue.put(generator.state())
+    except BaseException as e:
+        queue.put({'error': f"{e.__class__.__name__}: {e}"})
+
+
+def run_bench(base_url, routes, rate, duration, connections=64, processes=1,
+              timeout=10, warmup=0.0, seed=None, scenarios=None):
+    """
+    Executa a carga em `processes` processos (cada um com rate/processes e
+    connections/processes) e retorna o resultado consolidado em dict serializável.
+
+    Com `scenarios`, as chegadas são sessões de cenários (`rate` em sessões/s) em vez
+    de requisições avulsas às rotas.
+    """
+    base_url = base_url.rstrip('/')
+    if scenarios:
+        context = {'variables': {**credentials_from_env(), **variables_from_env()}}
+    else:
+        context = {
+            'credentials': credentials_from_env(),
+            'book_ids': asyncio.run(discover_book_ids(base_url))
+                if any('{book_id}' in route.path for route in routes) else [],
+        }
+    started = datetime.now().isoformat()
+    start_at = time.time() + START_DELAY
+    per_process = rate / processes
+    connections_each = max(1, connections // processes)
+
+    queue = multiprocessing.Queue()
+    workers = []
+    for index in range(processes):
+        worker_seed = None if seed is None else seed + index
+        if scenarios:
+            generator = SessionGenerator(base_url, scenarios, per_process, duration, connections_each,
+                                         timeout, warmup, context, worker_seed)
+        else:
+            generator = LoadGenerator(base_url, routes, per_process, duration, connections_each,
+                                      timeout, warmup, context, worker_seed)
+        # Processos defasados dentro do intervalo: as chegadas somadas continuam uniformes
+        offset = index / rate
+        worker = multiprocessing.Process(target=_worker, args=(generator, start_at, offset, queue),
+                                         daemon=True)
+        worker.start()
+        workers.append(worker)
+
+    totals = {}
+    sessions = {}
+    dispatch_lag = HdrHistogram()
+    failures = []
+    for _ in workers:
+        state = queue.get()
+        if 'error' in state:
+            failures.append(state['error'])
+            continue
+        for target, key in ((totals, 'routes'), (sessions, 'sessions')):
+            for name, route_state in state.get(key, {}).items():
+                target.setdefault(name, RouteStats()).merge_state(route_state)
+        dispatch_lag.decode(state['dispatch_lag'])
+    for worker in workers:
+        worker.join()
+    if failures and len(failures) == processes:
+        raise RuntimeError(failures[0])
+
+    result = build_result(base_url, started, rate, duration, connections, processes,
+                          warmup, totals, dispatch_lag, failures)
+    if scenarios:
+        result['scenarios'] = {name: _route_result(stats, duration) for name, stats in sessions.items()}
+    return result
+
+
+def _percentiles(histogram):
+    values = histogram.percentiles(PERCENTILES)
+    return {('max' if p == 100 else f'p{p:g}'): values[p] for p in PERCENTILES}
+
+
+def _route_result(stats, duration):
+    # sent = completed + erros (timeouts inclusos) + unfinished
+    completed = stats.latency.total - stats.timeouts - stats.unfinished
+    errors = sum(stats.errors.values())
+    return {
+        'sent': stats.sent,
+        'completed': completed,
+        'timeouts': stats.timeouts,
+        'unfinished': stats.unfinished,
+        'throughput': completed / duration if duration else 0.0,
+        'errors': dict(stats.errors),
+        'status': dict(sorted(stats.status.items())),
+        'latency': _percentiles(stats.latency),
+        'service_time': _percentiles(stats.service),
+        'error_rate': (errors + stats.unfinished) / stats.sent if stats.sent else 0.0,
+        'histogram': base64.b64encode(bytes(stats.latency.encode())).decode('ascii'),
+    }
+
+
+def build_result(base_url, started, rate, duration, connections, processes,
+                 warmup, totals, dispatch_lag, failures=()):
+    overall = RouteStats()
+    for stats in totals.values():
+        overall.merge_state(stats.state())
+    lag = _percentiles(dispatch_lag)
+    return {
+        'target': base_url,
+        'started': started,
+        'rate': rate,
+        'duration': duration,
+        'warmup': warmup,
+        'connections': connections,
+        'processes': processes,
+        'generator': {
+            'dispatch_lag': lag,
+            'saturated': lag['p99'] > GENERATOR_LAG_WARNING,
+            'failures': list(failures),
+        },
+        'total': _route_result(overall, duration),
+        'routes': {name: _route_result(stats, duration) for name, stats in totals.items()},
+    }
+
+
+def load_histogram(result, route='total'):
+    """Reconstrói o HdrHistogram de latência corrigida salvo num resultado"""
+    section = result['total'] if route == 'total' else result['routes'][route]
+    histogram = HdrHistogram()
+    histogram.decode(base64.b64decode(section['histogram']))
+    return histogram
+
+
+def result_rows(result, section='routes'):
+    """Linhas (rota, vazão, erros e percentis) para format_rows; `section='scenarios'` para as sessões"""
+    rows = []
+    items = sorted(result.get(section, {}).items())
+    if section == 'routes':
+        items.insert(0, ('total', result['total']))
+    for name, data in items:
+        rows.append({
+            'route': name,
+            'req/s': data['throughput'],
+            'errors': sum(data['errors'].values()),
+            **data['latency'],
+        })
+    return rows
+
+
+def compare_rows(baseline, current, metrics=('p50', 'p99', 'p99.9', 'max')):
+    """Diferença entre dois resultados, por rota: valor anterior, atual e variação (%)"""
+    rows = []
+    names = ['total'] + sorted(set(baseline['routes']) & set(current['routes']))
+    for name in names:
+        before = baseline['total'] if name == 'total' else baseline['routes'][name]
+        after = current['total'] if name == 'total' else current['routes'][name]
+        pairs = [('req/s', before['throughput'], after['throughput']),
+                 ('error_rate', before['error_rate'] * 100, after['error_rate'] * 100)]
+        pairs += [(metric, before['latency'][metric], after['latency'][metric]) for metric in metrics]
+        for metric, old, new in pairs:
+            rows.append({
+                'route': name,
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'change_%': (new - old) / old * 100 if old else 0.0,
+            })
+    return rows
@@ -0,0 +1,330 @@
+"""
+Coleta dos dados exibidos pelo painel monitor.py
+Um único amostrador em segundo plano consulta a API, o psutil e os logs;
+a renderização só lê o último snapshot e nunca espera por I/O
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import psutil
+
+from .http import HttpClient, HttpError
+from .logtail import DEFAULT_SOURCES, LogFollower
+from .netstats import NetworkRateCollector, port_states
+from .selfstats import Spans
+from .shm import SharedMetricsReader
+from .workers import find_services
+
+DEFAULT_URL = 'http://localhost:5000'
+SAMPLE_INTERVAL = 3
+HISTORY_SIZE = 30
+LOG_LINES = 6
+
+# Consultas à API e buscas de processos são mais caras: rodam a cada N segundos
+API_INTERVAL = 10
+SERVICES_INTERVAL = 30
+
+# Sem amostra da sonda de saúde há mais que isso, o servidor é dado como fora do ar
+HEALTH_STALE = 30
+
+# Janela usada para "usuários online" (IPs distintos no log de acesso)
+ONLINE_WINDOW = 300
+
+# Log de acesso do middleware de firewall ("🔍 GET /api/books - IP: 1.2.3.4")
+_ACCESS = re.compile(r'🔍 (\w+) (\S+) - IP: (\S+)')
+
+
+def _is_access(entry):
+    # Linhas do access log do middleware (BOOKVERSE_ACCESS_LOG) e do firewall ficam fora
+    # de LOGS RECENTES e das taxas por nível
+    return entry.access or (entry.source == 'out' and _ACCESS.search(entry.message) is not None)
+
+
+class DashboardSampler:
+    """
+    Amostrador em segundo plano do painel.
+
+    O último estado fica em `snapshot`, um dicionário substituído inteiro a cada
+    ciclo; leitores nunca veem uma atualização pela metade e não precisam de lock.
+    """
+
+    def __init__(self, base_url=DEFAULT_URL, log_sources=DEFAULT_SOURCES, interval=SAMPLE_INTERVAL,
+                 token=None, credentials=None, shared=None):
+        self.base_url = base_url.rstrip('/')
+        url = urlsplit(self.base_url)
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.interval = interval
+        self.spans = Spans()
+        self.token = token or os.environ.get('BOOKVERSE_TOKEN')
+        self.credentials = credentials
+        if credentials is None and os.environ.get('BOOKVERSE_EMAIL') and os.environ.get('BOOKVERSE_PASSWORD'):
+            self.credentials = {
+                'email': os.environ['BOOKVERSE_EMAIL'],
+                'password': os.environ['BOOKVERSE_PASSWORD'],
+            }
+
+        self.log_follower = LogFollower(log_sources, skip=_is_access)
+        self.network_collector = NetworkRateCollector()
+        self.cpu_history = deque(maxlen=HISTORY_SIZE)
+        self.ram_history = deque(maxlen=HISTORY_SIZE)
+        self.network_history = deque(maxlen=HISTORY_SIZE)
+        self.client_seen = {}
+        self.total_requests = 0
+        self.total_searches = 0
+        self.connections = 0
+        self.disk = None
+
+        self.server = {'online': None}
+        self.stats = None
+        self.services = {}
+        self._last_api = None
+        self._last_services = None
+
+        # Com o performance-monitor.py publicando em memória compartilhada, CPU, memória,
+        # rede, conexões e saúde vêm do segmento em vez de uma coleta própria
+        self.shared = shared
+        self.source = 'local'
+
+        self.snapshot = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Inicia a thread de amostragem"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.log_follower.close()
+
+    def _run(self):
+        asyncio.run(self._loop())
+
+    async def _loop(self):
+        client = HttpClient(max_connections=4)
+        try:
+            while not self._stopped.is_set():
+                started = time.monotonic()
+                with self.spans.span('sample'):
+                    await self.sample_once(client)
+                delay = self.interval - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, self._stopped.wait, delay
+                    )
+        finally:
+            await client.close()
+
+    async def sample_once(self, client):
+        """Executa um ciclo de coleta e publica um novo snapshot"""
+        now = time.monotonic()
+        shared = self.sample_shared()
+        if self._last_api is None or now - self._last_api >= API_INTERVAL:
+            self._last_api = now
+            if shared:
+                self.stats = await self.fetch_stats(client)
+            else:
+                self.server, self.stats = await asyncio.gather(
+                    self.fetch_server(client), self.fetch_stats(client)
+                )
+        # Com o segmento, serviços e disco também vêm do performance-monitor.py
+        if not shared and (self._last_services is None or now - self._last_services >= SERVICES_INTERVAL):
+            self._last_services = now
+            self.services = find_services()
+
+        if not shared:
+            self.sample_system()
+        self.sample_logs()
+        self.publish()
+
+    async def _get_json(self, client, path, headers=None):
+        try:
+            response = await client.get(self.base_url + path, headers=headers, timeout=5)
+        except (asyncio.TimeoutError, OSError, ValueError, EOFError, HttpError) as e:
+            return None, None, str(e) or e.__class__.__name__
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response, body if isinstance(body, dict) else None, None
+
+    async def fetch_server(self, client):
+        """Estado do servidor a partir de /api/health e /api/status"""
+        # Uptime e memória em /api/health só aparecem com token de administrador
+        # (ou BOOKVERSE_HEALTH_DETAILS=1 no servidor)
+        headers = {'x-auth-token': self.token} if self.token else None
+        (health, health_body, error), (status, status_body, _) = await asyncio.gather(
+            self._get_json(client, '/api/health', headers), self._get_json(client, '/api/status')
+        )
+        server = {
+            'online': health is not None and health.status == 200,
+            'latency': health.elapsed if health is not None else None,
+            'error': error or (f"HTTP {health.status}" if health is not None and health.status != 200 else None),
+        }
+        for body in (health_body, status_body if status and status.status == 200 else None):
+            if not body:
+                continue
+            for key in ('uptime', 'version', 'database', 'environment'):
+                if body.get(key) is not None:
+                    server[key] = body[key]
+            memory = body.get('memory') or (body.get('performance') or {}).get('memory')
+            if memory:
+                server['memory'] = memory
+        return server
+
+    async def fetch_stats(self, client):
+        """Contagens de /api/admin/dashboard (requer token de administrador)"""
+        if not self.token and self.credentials:
+            response, body, _ = await self._login(client)
+            if body:
+                self.token = body.get('token')
+        if not self.token:
+            return None
+
+        response, body, _ = await self._get_json(
+            client, '/api/admin/dashboard', headers={'x-auth-token': self.token}
+        )
+        if response is not None and response.status == 401 and self.credentials:
+            self.token = None
+        return body if response is not None and response.status == 200 else None
+
+    async def _login(self, client):
+        try:
+            response = await client.post(
+                self.base_url + '/api/auth/login', json_body=self.credentials, timeout=5
+            )
+            return response, response.json(), None
+        except (asyncio.TimeoutError, OSError, ValueError, EOFError, HttpError) as e:
+            return None, None, str(e)
+
+    def sample_system(self):
+        self.cpu_history.append(psutil.cpu_percent(None))
+        self.ram_history.append(psutil.virtual_memory().percent)
+        rates = self.network_collector.sample()
+        self.network_history.append(sum(
+            nic_rates['bytes_recv'] + nic_rates['bytes_sent']
+            for nic, nic_rates in rates.items()
+            if not nic.startswith('lo')
+        ))
+        states = port_states((self.port,))[self.port]
+        self.connections = states[psutil.CONN_ESTABLISHED]
+        disk = psutil.disk_usage(os.path.abspath(os.sep))
+        self.disk = (disk.used, disk.total)
+
+    def sample_shared(self):
+        """Lê as séries publicadas pelo performance-monitor.py; False se não houver"""
+        if self.shared is None:
+            return False
+        if not self.shared.writer_alive():
+            # Escritor encerrado: tenta um segmento novo ou volta à coleta própria
+            self.shared.close()
+            self.shared = None
+            if SharedMetricsReader.exists():
+                try:
+                    self.shared = SharedMetricsReader()
+                except (OSError, ValueError):
+                    pass
+            if self.shared is None or not self.shared.writer_alive():
+                self.shared = None
+                self.source = 'local'
+                self._last_api = None
+                self._last_services = None
+                return False
+
+        try:
+            _, series = self.shared.snapshot()
+        except TimeoutError:
+            # Escritor ocupado demais para uma cópia consistente: mantém o último
+            # estado e tenta de novo no próximo ciclo
+            return True
+        self.source = f'performance-monitor (pid {self.shared.pid})'
+
+        def values(name):
+            return [value for _, value in series.get(name, ())][-HISTORY_SIZE:]
+
+        self.cpu_history = deque(values('cpu.value'), maxlen=HISTORY_SIZE)
+        self.ram_history = deque(values('memory.percent'), maxlen=HISTORY_SIZE)
+
+        # Soma entrada + saída de todas as interfaces (exceto loopback) por instante
+        totals = {}
+        for name, points in series.items():
+            nic, _, field = name[len('network:'):].rpartition('.')
+            if (name.startswith('network:') and field in ('bytes_recv', 'bytes_sent')
+                    and not nic.startswith('lo')):
+                for timestamp, value in points:
+                    totals[timestamp] = totals.get(timestamp, 0.0) + value
+        self.network_history = deque(
+            (totals[timestamp] for timestamp in sorted(totals)[-HISTORY_SIZE:]), maxlen=HISTORY_SIZE
+        )
+
+        established = values(f'connections:{self.port}.established')
+        self.connections = int(established[-1]) if established else 0
+        disk_used, disk_total = values('host.disk_used'), values('host.disk_total')
+        self.disk = (disk_used[-1], disk_total[-1]) if disk_used and disk_total else None
+        self.services = {
+            service: bool(states[-1])
+            for service, states in (('nginx', values('host.nginx')), ('pm2', values('host.pm2')))
+            if states
+        }
+
+        status = series.get('response_times:health.status_code')
+        latency = series.get('response_times:health.response_time')
+        if status:
+            timestamp, code = status[-1]
+            fresh = time.time() - timestamp < HEALTH_STALE
+            self.server = {
+                'online': fresh and code == 200,
+                'latency': latency[-1][1] if latency else 0.0,
+                'error': None if fresh else 'sem resposta recente',
+            }
+            if fresh and code != 200:
+                self.server['error'] = f'HTTP {code:.0f}'
+        else:
+            self.server = {'online': None}
+        return True
+
+    def sample_logs(self):
+        now = time.time()
+        for entry in self.log_follower.poll(now):
+            access = _ACCESS.search(entry.message) if entry.source == 'out' else None
+            if access:
+                self.total_requests += 1
+                if '/search' in access.group(2):
+                    self.total_searches += 1
+                self.client_seen[access.group(3)] = now
+
+        for address, seen in list(self.client_seen.items()):
+            if now - seen > ONLINE_WINDOW:
+                del self.client_seen[address]
+
+    def publish(self):
+        rates = self.log_follower.rates()
+        self.snapshot = {
+            'timestamp': time.time(),
+            'source': self.source,
+            'server': self.server,
+            'stats': self.stats,
+            'services': self.services,
+            'cpu_history': tuple(self.cpu_history),
+            'ram_history': tuple(self.ram_history),
+            'network_history': tuple(self.network_history),
+            'connections': self.connections,
+            'online_users': len(self.client_seen),
+            'total_requests': self.total_requests,
+            'total_searches': self.total_searches,
+            'errors_per_minute': rates['ERROR'],
+            'warnings_per_minute': rates['WARN'],
+            'disk_used': self.disk[0] if self.disk else 0,
+            'disk_total': self.disk[1] if self.disk else 0,
+            'logs': tuple((entry.clock, entry.level, entry.source, entry.message)
+                          for entry in self.log_follower.recent(LOG_LINES)),
+        }
@@ -0,0 +1,229 @@
+"""
+Coleta concorrente de vários nós do BookVerse para o painel multi-nó
+Cada nó é consultado em /api/health com timeout próprio: um nó fora do ar
+não atrasa a atualização dos demais
+"""
+
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from .http import HttpClient, HttpError
+from .selfstats import Spans
+
+POLL_INTERVAL = 2
+NODE_TIMEOUT = 1.5
+
+# Janela usada para taxa de requisições e p99 (diferença entre leituras cumulativas)
+RATE_WINDOW = 60
+
+# Limite de memória por processo (max_memory_restart do PM2 em manage.py setup-pm2)
+MEMORY_LIMIT = 1024 ** 3
+
+
+class Node:
+    """Um servidor BookVerse acompanhado pelo painel"""
+
+    def __init__(self, name, url, memory_limit=MEMORY_LIMIT, token=None):
+        self.name = name
+        self.url = url.rstrip('/')
+        self.memory_limit = memory_limit
+        # Token de administrador: sem ele (ou BOOKVERSE_HEALTH_DETAILS=1 no nó),
+        # /api/health não traz memória, PID nem contadores de requisições
+        self.token = token or os.environ.get('BOOKVERSE_TOKEN')
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    @classmethod
+    def from_url(cls, url):
+        if '://' not in url:
+            url = f'http://{url}'
+        return cls(urlsplit(url).netloc, url)
+
+
+def load_nodes(spec=None):
+    """
+    Carrega os nós de um arquivo JSON ([{"name": ..., "url": ..., "token": ...}],
+    token opcional) ou de uma lista de URLs separadas por vírgula.
+    """
+    spec = spec or os.environ.get('BOOKVERSE_NODES', 'nodes.json')
+    if os.path.exists(spec):
+        with open(spec) as f:
+            return [Node.from_dict(definition) for definition in json.load(f)]
+    return [Node.from_url(url.strip()) for url in spec.split(',') if url.strip()]
+
+
+def bucket_percentile(bounds, counts, percentile):
+    """Percentil aproximado (limite superior do bucket) a partir de contagens por bucket"""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = math.ceil(total * percentile / 100)
+    seen = 0
+    for index, count in enumerate(counts):
+        seen += count
+        if seen >= rank:
+            return float(bounds[min(index, len(bounds) - 1)])
+    return float(bounds[-1])
+
+
+class NodeState:
+    """Histórico recente de um nó para calcular taxa e p99 entre leituras"""
+
+    def __init__(self, node):
+        self.node = node
+        self.readings = deque()
+
+    def update(self, health, elapsed):
+        now = time.monotonic()
+        status = {
+            'name': self.node.name,
+            'url': self.node.url,
+            'online': True,
+            'latency': elapsed,
+            'error': None,
+            'uptime': health.get('uptime'),
+            'database': health.get('database'),
+            'pid': health.get('pid'),
+            'rss': None,
+            'heap_used': None,
+            'heap_total': None,
+            'memory_pressure': None,
+            'request_rate': None,
+            'in_flight': None,
+            'p99': None,
+        }
+
+        memory = health.get('memory') or {}
+        if memory.get('rss'):
+            status['rss'] = memory['rss']
+            status['heap_used'] = memory.get('heapUsed')
+            status['heap_total'] = memory.get('heapTotal')
+            status['memory_pressure'] = memory['rss'] / self.node.memory_limit
+
+        requests = health.get('requests')
+        if requests:
+            # Contador menor que o anterior: o processo reiniciou, o histórico não vale mais
+            if self.readings and requests['total'] < self.readings[-1][1]:
+                self.readings.clear()
+            self.readings.append((now, requests['total'], requests['latency']))
+            while len(self.readings) > 2 and now - self.readings[1][0] >= RATE_WINDOW:
+                self.readings.popleft()
+
+            status['in_flight'] = requests.get('inFlight')
+            if len(self.readings) > 1:
+                first_time, first_total, first_latency = self.readings[0]
+                status['request_rate'] = (requests['total'] - first_total) / max(now - first_time, 1e-6)
+                window = [current - previous for current, previous in zip(requests['latency'], first_latency)]
+                status['p99'] = bucket_percentile(requests['buckets'], window, 99)
+        return status
+
+    def failed(self, error):
+        return {
+            'name': self.node.name,
+            'url': self.node.url,
+            'online': False,
+            'error': error,
+        }
+
+
+class FleetSampler:
+    """
+    Consulta todos os nós concorrentemente em uma thread de fundo.
+
+    Como no DashboardSampler, o último estado fica em `snapshot` e é substituído
+    inteiro a cada ciclo.
+    """
+
+    def __init__(self, nodes, interval=POLL_INTERVAL, timeout=NODE_TIMEOUT):
+        self.nodes = list(nodes)
+        self.interval = interval
+        self.timeout = min(timeout, interval)
+        self.states = {node.name: NodeState(node) for node in self.nodes}
+        self.spans = Spans()
+        self.snapshot = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Inicia a thread de coleta"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        asyncio.run(self._loop())
+
+    async def _loop(self):
+        client = HttpClient(max_connections=2)
+        try:
+            while not self._stopped.is_set():
+                started = time.monotonic()
+                with self.spans.span('sample'):
+                    self.snapshot = await self.poll(client)
+                delay = self.interval - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, self._stopped.wait, delay
+                    )
+        finally:
+            await client.close()
+
+    async def poll_node(self, client, node):
+        state = self.states[node.name]
+        try:
+            # Timeout por nó cobre DNS, conexão e leitura da resposta
+            headers = {'x-auth-token': node.token} if node.token else None
+            response = await client.get(f'{node.url}/api/health', headers=headers, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            return state.failed(f'timeout ({self.timeout:g}s)')
+        except (OSError, ValueError, EOFError, HttpError) as e:
+            return state.failed(str(e) or e.__class__.__name__)
+
+        if response.status != 200:
+            return state.failed(f'HTTP {response.status}')
+        try:
+            health = response.json()
+        except ValueError:
+            return state.failed('resposta inválida')
+        return state.update(health if isinstance(health, dict) else {}, response.elapsed)
+
+    async def poll(self, client):
+        """Consulta todos os nós e monta o snapshot com o resumo da frota"""
+        statuses = await asyncio.gather(*(self.poll_node(client, node) for node in self.nodes))
+        return {
+            'timestamp': time.time(),
+            'nodes': statuses,
+            'summary': fleet_summary(statuses),
+        }
+
+
+def fleet_summary(statuses):
+    """Taxa total de requisições, pior p99 e nó com maior pressão de memória"""
+    online = [status for status in statuses if status['online']]
+    rates = [status['request_rate'] for status in online if status['request_rate'] is not None]
+    with_p99 = [status for status in online if status['p99'] is not None]
+    with_memory = [status for status in online if status['memory_pressure'] is not None]
+
+    worst_p99 = max(with_p99, key=lambda status: status['p99'], default=None)
+    most_memory = max(with_memory, key=lambda status: status['memory_pressure'], default=None)
+    return {
+        'nodes': len(statuses),
+        'online': len(online),
+        'request_rate': sum(rates) if rates else None,
+        'worst_p99': worst_p99['p99'] if worst_p99 else None,
+        'worst_p99_node': worst_p99['name'] if worst_p99 else None,
+        'memory_pressure': most_memory['memory_pressure'] if most_memory else None,
+        'memory_pressure_node': most_memory['name'] if most_memory else None,
+    }
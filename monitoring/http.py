@@ -0,0 +1,245 @@
+"""
+Cliente HTTP/1.1 assíncrono mínimo com pool de conexões keep-alive
+Usado pelas sondas do PerformanceMonitor sem depender de bibliotecas externas
+Mede separadamente as fases DNS, conexão TCP, handshake TLS, TTFB e transferência
+"""
+
+import asyncio
+import json
+import socket
+import ssl
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+USER_AGENT = 'BookVerse-Monitor/1.0'
+
+# Fases medidas em cada requisição (ms)
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'transfer')
+
+
+class HttpError(Exception):
+    """Resposta HTTP malformada ou conexão encerrada inesperadamente"""
+
+
+class HttpResponse:
+    """Resposta HTTP já lida por completo"""
+
+    __slots__ = ('status', 'reason', 'headers', 'body', 'elapsed', 'timings', 'reused')
+
+    def __init__(self, status, reason, headers, body, elapsed):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+        self.timings = {}
+        self.reused = False
+
+    def json(self):
+        return json.loads(self.body or b'null')
+
+
+class _Connection:
+    __slots__ = ('reader', 'writer', 'last_used', 'setup_timings')
+
+    def __init__(self, reader, writer, setup_timings):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+        self.setup_timings = setup_timings
+
+    def is_usable(self, idle_timeout):
+        return (
+            not self.reader.at_eof()
+            and not self.writer.is_closing()
+            and time.monotonic() - self.last_used < idle_timeout
+        )
+
+    def close(self):
+        self.writer.close()
+
+
+class HttpClient:
+    """Cliente HTTP/1.1 com conexões persistentes reaproveitadas por host"""
+
+    def __init__(self, max_connections=32, idle_timeout=30, ssl_context=None):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.ssl_context = ssl_context
+        self._idle = {}
+        self._limits = {}
+
+    async def request(self, method, url, headers=None, body=None, json_body=None, timeout=10):
+        """Executa uma requisição e retorna um HttpResponse"""
+        parts = urlsplit(url)
+        secure = parts.scheme == 'https'
+        host = parts.hostname
+        port = parts.port or (443 if secure else 80)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+
+        request_headers = {'Host': parts.netloc, 'User-Agent': USER_AGENT, 'Connection': 'keep-alive'}
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            request_headers['Content-Type'] = 'application/json'
+        if headers:
+            request_headers.update(headers)
+        if body is not None:
+            request_headers['Content-Length'] = str(len(body))
+
+        head = f"{method} {target} HTTP/1.1\r\n"
+        head += ''.join(f"{name}: {value}\r\n" for name, value in request_headers.items())
+        payload = (head + "\r\n").encode('latin-1') + (body or b'')
+
+        key = (host, port, secure)
+        limit = self._limits.get(key)
+        if limit is None:
+            limit = self._limits[key] = asyncio.Semaphore(self.max_connections)
+
+        # A espera por uma conexão livre do pool conta no timeout: sob sobrecarga, a
+        # requisição estoura o prazo em vez de ficar na fila indefinidamente
+        return await asyncio.wait_for(self._limited(limit, key, method, payload), timeout)
+
+    async def _limited(self, limit, key, method, payload):
+        async with limit:
+            return await self._send(key, method, payload)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def _send(self, key, method, payload):
+        for attempt in range(2):
+            acquire_started = time.perf_counter()
+            connection, reused = await self._acquire(key)
+            try:
+                started = time.perf_counter()
+                connection.writer.write(payload)
+                await connection.writer.drain()
+                response, keep_alive = await self._read_response(
+                    connection.reader, method, started
+                )
+                finished = time.perf_counter()
+                response.elapsed = (finished - acquire_started) * 1000
+                response.reused = reused
+                if not reused:
+                    response.timings.update(connection.setup_timings)
+            except (ConnectionError, asyncio.IncompleteReadError, HttpError):
+                connection.close()
+                # Conexões reaproveitadas podem ter sido fechadas pelo servidor
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+
+            if keep_alive:
+                self._release(key, connection)
+            else:
+                connection.close()
+            return response
+
+    async def _acquire(self, key):
+        idle = self._idle.get(key)
+        while idle:
+            connection = idle.pop()
+            if connection.is_usable(self.idle_timeout):
+                return connection, True
+            connection.close()
+
+        host, port, secure = key
+        loop = asyncio.get_running_loop()
+        timings = {}
+
+        started = time.perf_counter()
+        addresses = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+        timings['dns'] = (resolved - started) * 1000
+
+        family, _, _, _, address = addresses[0]
+        reader, writer = await asyncio.open_connection(address[0], port, family=family)
+        connected = time.perf_counter()
+        timings['connect'] = (connected - resolved) * 1000
+
+        if secure:
+            context = self.ssl_context or ssl.create_default_context()
+            try:
+                await writer.start_tls(context, server_hostname=host)
+            except BaseException:
+                writer.close()
+                raise
+            timings['tls'] = (time.perf_counter() - connected) * 1000
+
+        return _Connection(reader, writer, timings), False
+
+    def _release(self, key, connection):
+        connection.last_used = time.monotonic()
+        idle = self._idle.get(key)
+        if idle is None:
+            idle = self._idle[key] = deque()
+        idle.append(connection)
+
+    async def _read_response(self, reader, method, started):
+        status_line = await reader.readline()
+        if not status_line:
+            raise HttpError("Conexão encerrada antes da resposta")
+        first_byte = time.perf_counter()
+
+        try:
+            _, status, *reason = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+            status = int(status)
+        except ValueError:
+            raise HttpError(f"Linha de status inválida: {status_line!r}")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n'):
+                break
+            if not line:
+                raise HttpError("Conexão encerrada durante os cabeçalhos")
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif 'chunked' in headers.get('transfer-encoding', '').lower():
+            body = await self._read_chunked(reader)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            keep_alive = False
+
+        response = HttpResponse(status, reason[0] if reason else '', headers, body, 0.0)
+        response.timings['ttfb'] = (first_byte - started) * 1000
+        response.timings['transfer'] = (time.perf_counter() - first_byte) * 1000
+        return response, keep_alive
+
+    async def _read_chunked(self, reader):
+        chunks = []
+        while True:
+            size_line = await reader.readline()
+            if not size_line:
+                raise HttpError("Conexão encerrada durante o corpo chunked")
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # Descarta trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def close(self):
+        """Fecha todas as conexões ociosas"""
+        for idle in self._idle.values():
+            while idle:
+                idle.pop().close()
+        self._idle.clear()
@@ -0,0 +1,213 @@
+"""
+Tendência de memória dos workers Node para prever reinícios do PM2
+Ajusta uma regressão linear incremental de RSS (e heapUsed, quando disponível) por
+worker, recomeçando a cada reinício, e projeta quando o worker chega ao limite de
+max_memory_restart
+"""
+
+import json
+import math
+import re
+from collections import deque
+
+from .fleet import MEMORY_LIMIT
+
+# Meia-vida dos pesos da regressão: a tendência reflete as últimas horas, não o dia todo
+HALF_LIFE = 2 * 3600
+
+# Mínimos para confiar na projeção: duração do segmento, amostras e qualidade do ajuste
+MIN_SEGMENT = 30 * 60
+MIN_SAMPLES = 30
+MIN_R2 = 0.5
+
+# Avisos quando o tempo projetado até o limite cruza cada um destes valores (horas)
+WARN_HOURS = (6, 1)
+
+# Queda de RSS que indica reinício mesmo sem troca de PID (ex.: worker substituído no mesmo PID)
+RESTART_DROP = 0.5
+RESTART_HISTORY = 50
+
+_SIZE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?)B?\s*$', re.IGNORECASE)
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_memory_limit(text):
+    """'1G', '512M', '300000K' ou bytes -> bytes (formato do max_memory_restart)"""
+    match = _SIZE.match(str(text))
+    if not match:
+        raise ValueError(f"Limite de memória inválido: {text}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+def pm2_memory_limit(path='ecosystem.config.json', default=MEMORY_LIMIT):
+    """Menor max_memory_restart do ecosystem gerado por manage.py setup-pm2"""
+    try:
+        with open(path) as f:
+            apps = json.load(f).get('apps', [])
+        limits = [parse_memory_limit(app['max_memory_restart'])
+                  for app in apps if app.get('max_memory_restart')]
+    except (OSError, ValueError, AttributeError):
+        return default
+    return min(limits) if limits else default
+
+
+class TrendFit:
+    """
+    Regressão linear ponderada incremental (y = a + b·t), O(1) por amostra.
+
+    Os pesos decaem com meia-vida `half_life`: as somas são multiplicadas pelo
+    fator de decaimento antes de cada amostra nova.
+    """
+
+    __slots__ = ('half_life', 'origin', 'last', 'weight', 'st', 'sy', 'stt', 'sty', 'syy', 'count')
+
+    def __init__(self, origin, half_life=HALF_LIFE):
+        self.half_life = half_life
+        self.origin = origin
+        self.last = origin
+        self.weight = self.st = self.sy = self.stt = self.sty = self.syy = 0.0
+        self.count = 0
+
+    def add(self, timestamp, value):
+        decay = 0.5 ** (max(timestamp - self.last, 0) / self.half_life)
+        self.last = timestamp
+        # Tempo em horas a partir do início do segmento (evita perda de precisão)
+        t = (timestamp - self.origin) / 3600
+        self.weight = self.weight * decay + 1
+        self.st = self.st * decay + t
+        self.sy = self.sy * decay + value
+        self.stt = self.stt * decay + t * t
+        self.sty = self.sty * decay + t * value
+        self.syy = self.syy * decay + value * value
+        self.count += 1
+
+    def _variances(self):
+        w = self.weight
+        var_t = self.stt / w - (self.st / w) ** 2
+        cov = self.sty / w - (self.st / w) * (self.sy / w)
+        var_y = self.syy / w - (self.sy / w) ** 2
+        return var_t, cov, var_y
+
+    @property
+    def slope(self):
+        """Inclinação por hora (None sem amostras suficientes)"""
+        if self.count < 2:
+            return None
+        var_t, cov, _ = self._variances()
+        return cov / var_t if var_t > 1e-12 else None
+
+    def r2(self):
+        var_t, cov, var_y = self._variances()
+        if var_t <= 1e-12 or var_y <= 0:
+            return 0.0
+        return min(cov * cov / (var_t * var_y), 1.0)
+
+    def at(self, timestamp):
+        """Valor ajustado no instante dado"""
+        slope = self.slope or 0.0
+        t = (timestamp - self.origin) / 3600
+        return self.sy / self.weight + slope * (t - self.st / self.weight)
+
+
+class _Segment:
+    __slots__ = ('pid', 'started', 'rss', 'heap', 'last_rss', 'warned')
+
+    def __init__(self, pid, started):
+        self.pid = pid
+        self.started = started
+        self.rss = TrendFit(started)
+        self.heap = None
+        self.last_rss = None
+        self.warned = set()
+
+
+class LeakTracker:
+    """
+    Acompanha a memória de cada worker e projeta o tempo até `limit`.
+
+    Um segmento dura enquanto o processo for o mesmo: troca de PID ou queda brusca
+    de RSS abre um segmento novo e conta um reinício. observe() retorna a lista de
+    avisos novos (cada limite de WARN_HOURS avisa uma vez por segmento).
+    """
+
+    def __init__(self, limit=MEMORY_LIMIT):
+        self.limit = limit
+        self.segments = {}
+        self.restarts = {}
+
+    def _segment(self, label, pid, timestamp, rss=None):
+        segment = self.segments.get(label)
+        restarted = segment is not None and (
+            segment.pid != pid
+            or (rss is not None and segment.last_rss and rss < segment.last_rss * RESTART_DROP)
+        )
+        if segment is None or restarted:
+            if restarted:
+                self.restarts.setdefault(label, deque(maxlen=RESTART_HISTORY)).append(timestamp)
+            segment = self.segments[label] = _Segment(pid, timestamp)
+        return segment
+
+    def observe(self, label, pid, timestamp, rss):
+        """Registra o RSS de um worker; retorna avisos [{'label', 'hours', 'status'}]"""
+        segment = self._segment(label, pid, timestamp, rss)
+        segment.rss.add(timestamp, rss)
+        segment.last_rss = rss
+
+        status = self.status(label, timestamp)
+        warnings = []
+        hours = status['time_to_limit']
+        if hours is not None:
+            for threshold in WARN_HOURS:
+                if hours <= threshold and threshold not in segment.warned:
+                    segment.warned.add(threshold)
+                    warnings.append({'label': label, 'hours': hours, 'threshold': threshold,
+                                     'status': status})
+        return warnings
+
+    def observe_heap(self, label, pid, timestamp, heap_used):
+        """Registra o heapUsed (de /api/health) do worker com este PID"""
+        segment = self.segments.get(label)
+        if segment is None or segment.pid != pid:
+            return
+        if segment.heap is None:
+            segment.heap = TrendFit(segment.started)
+        segment.heap.add(timestamp, heap_used)
+
+    def status(self, label, now):
+        """Tendência atual: inclinação (bytes/h), RSS ajustado e horas até o limite"""
+        segment = self.segments[label]
+        fit = segment.rss
+        slope = fit.slope
+        age = now - segment.started
+        reliable = (fit.count >= MIN_SAMPLES and age >= MIN_SEGMENT and slope is not None
+                    and slope > 0 and fit.r2() >= MIN_R2)
+        current = fit.at(now)
+        time_to_limit = None
+        if reliable:
+            time_to_limit = max(self.limit - current, 0) / slope
+
+        heap_slope = segment.heap.slope if segment.heap and segment.heap.count >= MIN_SAMPLES else None
+        restarts = self.restarts.get(label, ())
+        return {
+            'pid': segment.pid,
+            'segment_age': age,
+            'samples': fit.count,
+            'rss': segment.last_rss,
+            'rss_slope': slope,
+            'r2': fit.r2(),
+            'heap_slope': heap_slope,
+            'limit': self.limit,
+            'time_to_limit': time_to_limit,
+            'restarts_24h': sum(1 for when in restarts if now - when <= 86400),
+        }
+
+    def summary(self, now):
+        return {label: self.status(label, now) for label in sorted(self.segments)}
+
+
+def format_hours(hours):
+    if hours is None or math.isinf(hours):
+        return '—'
+    if hours < 1:
+        return f"{hours * 60:.0f}min"
+    return f"{hours:.1f}h"
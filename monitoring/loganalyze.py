@@ -0,0 +1,317 @@
+"""
+Análise em paralelo de access logs (nginx e logs/combined.log do PM2)
+Arquivos grandes são divididos em faixas de bytes alinhadas a quebras de linha e
+processados num pool de processos; cada processo devolve contadores e histogramas
+que o processo principal soma. O modo incremental lembra offset e inode de cada
+arquivo e só lê o que foi acrescentado desde a execução anterior
+"""
+
+import glob
+import gzip
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .accesslog import DEFAULT_LOG, TimeParser, route_key
+from .aggregates import HdrHistogram
+
+DEFAULT_PATTERNS = (DEFAULT_LOG + '*', 'logs/combined.log*')
+
+# Tamanho das faixas de bytes de cada tarefa do pool
+CHUNK_SIZE = 64 * 1024 * 1024
+
+# Rotas distintas guardadas; as demais (ex.: varreduras de caminhos aleatórios) vão para OTHER
+MAX_ROUTES = 1000
+OTHER = '(outras)'
+
+# Campos de cada rota: requisições, 1xx..5xx, bytes, primeira e última requisição
+_COUNT, _STATUS, _BYTES, _FIRST, _LAST = 0, 1, 6, 7, 8
+
+_ROUTE_CACHE_LIMIT = 100000
+
+
+def _new_route():
+    return [0, 0, 0, 0, 0, 0, 0, None, None, HdrHistogram()]
+
+
+def _merge_route(target, source):
+    for index in range(_COUNT, _BYTES + 1):
+        target[index] += source[index]
+    if source[_FIRST] is not None:
+        target[_FIRST] = source[_FIRST] if target[_FIRST] is None else min(target[_FIRST], source[_FIRST])
+        target[_LAST] = source[_LAST] if target[_LAST] is None else max(target[_LAST], source[_LAST])
+    target[9].merge(source[9])
+
+
+def parse_chunk(path, start, end):
+    """
+    Analisa as linhas que começam em [start, end) de um arquivo (end None = até o fim).
+
+    Divisão rápida por posição de aspas e colchetes, sem expressões regulares.
+    Retorna {'lines', 'invalid', 'routes': {rota: campos}} com histogramas codificados.
+    """
+    routes = {}
+    keys = {}
+    parse_time = TimeParser()
+    last_time_text = last_time = None
+    lines = invalid = 0
+
+    compressed = path.endswith('.gz')
+    with (gzip.open(path, 'rb') if compressed else open(path, 'rb')) as f:
+        position = start
+        if start:
+            # A linha que cruza o início pertence à faixa anterior
+            f.seek(start - 1)
+            position = start - 1 + len(f.readline())
+        for line in f:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            lines += 1
+            try:
+                quote = line.index(b'"')
+                end_quote = line.index(b'"', quote + 1)
+                request = line[quote + 1:end_quote]
+                first_space = request.index(b' ')
+                last_space = request.rfind(b' ')
+                path_bytes = request[first_space + 1:last_space] if last_space > first_space else request[first_space + 1:]
+                status, size, rest = (line[end_quote + 2:].split(b' ', 2) + [b''])[:3]
+                status_class = int(status) // 100
+                opening = line.index(b'[')
+                time_text = line[opening + 1:line.index(b']', opening)]
+            except ValueError:
+                invalid += 1
+                continue
+
+            if time_text != last_time_text:
+                try:
+                    last_time = parse_time(time_text.decode('ascii'))
+                except (ValueError, KeyError, UnicodeDecodeError):
+                    invalid += 1
+                    continue
+                last_time_text = time_text
+
+            key = keys.get(path_bytes)
+            if key is None:
+                if len(keys) > _ROUTE_CACHE_LIMIT:
+                    keys.clear()
+                key = keys[path_bytes] = route_key(path_bytes.decode('latin-1'))
+            route = routes.get(key)
+            if route is None:
+                route = routes[key] = _new_route()
+
+            route[_COUNT] += 1
+            if 1 <= status_class <= 5:
+                route[_STATUS + status_class - 1] += 1
+            if size.isdigit():
+                route[_BYTES] += int(size)
+            if route[_FIRST] is None or last_time < route[_FIRST]:
+                route[_FIRST] = last_time
+            if route[_LAST] is None or last_time > route[_LAST]:
+                route[_LAST] = last_time
+
+            # $request_time logo após o user agent (formato bookverse_timed)
+            if rest:
+                tail = rest[rest.rfind(b'"') + 1:].split(None, 1)
+                if tail:
+                    try:
+                        route[9].record(float(tail[0]) * 1000)
+                    except ValueError:
+                        pass
+
+    return {
+        'lines': lines,
+        'invalid': invalid,
+        'routes': {key: route[:9] + [bytes(route[9].encode())] for key, route in routes.items()},
+    }
+
+
+def _parse_task(task):
+    return parse_chunk(*task)
+
+
+class LogAnalysis:
+    """Estatísticas por rota acumuladas de vários arquivos e execuções"""
+
+    def __init__(self):
+        self.routes = {}
+        self.lines = 0
+        self.invalid = 0
+
+    def merge(self, partial):
+        self.lines += partial['lines']
+        self.invalid += partial['invalid']
+        for key, fields in partial['routes'].items():
+            if key not in self.routes and len(self.routes) >= MAX_ROUTES:
+                key = OTHER
+            route = self.routes.get(key)
+            if route is None:
+                route = self.routes[key] = _new_route()
+            source = fields[:9] + [HdrHistogram()]
+            source[9].decode(fields[9])
+            _merge_route(route, source)
+
+    def state(self):
+        return {
+            'lines': self.lines,
+            'invalid': self.invalid,
+            'routes': {key: route[:9] + [bytes(route[9].encode()).hex()]
+                       for key, route in self.routes.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        analysis = cls()
+        analysis.merge({
+            'lines': state.get('lines', 0),
+            'invalid': state.get('invalid', 0),
+            'routes': {key: fields[:9] + [bytes.fromhex(fields[9])]
+                       for key, fields in state.get('routes', {}).items()},
+        })
+        return analysis
+
+    def summary(self):
+        """Por rota: requisições, taxa média, classes de status, bytes e percentis de latência"""
+        result = {}
+        for key, route in sorted(self.routes.items(), key=lambda item: -item[1][_COUNT]):
+            span = (route[_LAST] - route[_FIRST]) if route[_FIRST] is not None else 0
+            histogram = route[9]
+            latency = None
+            if histogram.total:
+                values = histogram.percentiles((50, 90, 99, 99.9))
+                latency = {f'p{p:g}': value for p, value in values.items()}
+            result[key] = {
+                'requests': route[_COUNT],
+                'rate': route[_COUNT] / span if span > 0 else None,
+                'status': {f'{index + 1}xx': route[_STATUS + index] for index in range(5)
+                           if route[_STATUS + index]},
+                'bytes': route[_BYTES],
+                'first': route[_FIRST],
+                'last': route[_LAST],
+                'latency': latency,
+            }
+        return result
+
+
+def _file_id(stat):
+    return f'{stat.st_dev}:{stat.st_ino}'
+
+
+def expand(patterns):
+    """Arquivos dos padrões glob, sem repetir o mesmo inode"""
+    files = []
+    seen = set()
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if os.path.isfile(path) and _file_id(stat) not in seen:
+                seen.add(_file_id(stat))
+                files.append((path, stat))
+    return files
+
+
+def plan(files, state=None, chunk_size=CHUNK_SIZE):
+    """
+    Tarefas (caminho, início, fim) para o pool e o novo estado dos arquivos.
+
+    Com `state` (execução incremental), cada arquivo continua do offset salvo para o
+    mesmo inode; um inode novo é lido do início. Um .gz novo numa execução
+    incremental é uma cópia rotacionada de dados já lidos e só é registrado.
+    """
+    known = state.get('files', {}) if state else {}
+    incremental = bool(state)
+    tasks = []
+    files_state = {}
+    for path, stat in files:
+        file_id = _file_id(stat)
+        compressed = path.endswith('.gz')
+        previous = known.get(file_id)
+        files_state[file_id] = {'path': path, 'offset': stat.st_size}
+        if compressed:
+            if previous is None and not incremental:
+                tasks.append((path, 0, None))
+            continue
+        offset = previous['offset'] if previous else 0
+        if offset > stat.st_size:
+            # Arquivo truncado (copytruncate): recomeça
+            offset = 0
+        for start in range(offset, stat.st_size, chunk_size):
+            tasks.append((path, start, min(start + chunk_size, stat.st_size)))
+    return tasks, files_state
+
+
+def load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_state(path, state):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_file = f'{path}.tmp'
+    with open(temp_file, 'w') as f:
+        json.dump(state, f)
+    os.replace(temp_file, path)
+
+
+def analyze(patterns=DEFAULT_PATTERNS, processes=None, state_path=None, chunk_size=CHUNK_SIZE):
+    """
+    Analisa os logs dos padrões em paralelo; com `state_path`, em modo incremental.
+    Retorna (LogAnalysis, informações da execução).
+    """
+    started = time.time()
+    state = load_state(state_path) if state_path else None
+    files = expand(patterns)
+    tasks, files_state = plan(files, state, chunk_size)
+    analysis = LogAnalysis.from_state(state['analysis']) if state else LogAnalysis()
+    before = analysis.lines
+
+    read = sum((end if end is not None else os.path.getsize(path)) - start for path, start, end in tasks)
+    if len(tasks) > 1 and processes != 1:
+        with ProcessPoolExecutor(processes) as pool:
+            for partial in pool.map(_parse_task, tasks):
+                analysis.merge(partial)
+    else:
+        for task in tasks:
+            analysis.merge(_parse_task(task))
+
+    if state_path:
+        save_state(state_path, {'files': files_state, 'analysis': analysis.state(),
+                                'updated': time.time()})
+    info = {
+        'files': [path for path, _ in files],
+        'tasks': len(tasks),
+        'bytes': read,
+        'lines': analysis.lines - before,
+        'elapsed': time.time() - started,
+        'incremental': bool(state),
+    }
+    return analysis, info
+
+
+def summary_rows(summary, top=30):
+    """Linhas por rota para format_rows"""
+    rows = []
+    for key, route in list(summary.items())[:top]:
+        latency = route['latency'] or {}
+        rows.append({
+            'route': key,
+            'requests': route['requests'],
+            'req/s': route['rate'] if route['rate'] is not None else '-',
+            '2xx': route['status'].get('2xx', 0),
+            '3xx': route['status'].get('3xx', 0),
+            '4xx': route['status'].get('4xx', 0),
+            '5xx': route['status'].get('5xx', 0),
+            'MB': route['bytes'] / 1024 / 1024,
+            'p50': latency.get('p50', '-'),
+            'p99': latency.get('p99', '-'),
+        })
+    return rows
@@ -0,0 +1,288 @@
+"""
+Acompanhamento em tempo real dos logs da aplicação e do monitor
+Cada arquivo fica aberto e é lido a partir do fim; a rotação é seguida pelo inode
+(o arquivo antigo é drenado pelo descritor aberto antes da troca) e o truncamento
+recomeça a leitura. As linhas viram entradas com nível, guardadas num buffer
+circular limitado, com contadores por segundo para as taxas por nível
+"""
+
+import os
+import re
+import time
+from collections import deque
+from datetime import datetime
+
+from .accesslog import TimeParser, parse_line as parse_access_line
+
+# Origens acompanhadas por padrão: saídas do PM2 e o log do performance-monitor.py
+DEFAULT_SOURCES = {
+    'err': os.path.join('logs', 'err.log'),
+    'out': os.path.join('logs', 'out.log'),
+    'monitor': 'performance.log',
+}
+
+# Nível mínimo por origem: o que o Node escreve em stderr é no mínimo um aviso
+SOURCE_LEVELS = {'err': 'WARN'}
+
+LEVELS = ('INFO', 'WARN', 'ERROR')
+
+# Bytes lidos por arquivo a cada chamada: uma rajada de log não estoura a memória
+READ_LIMIT = 1024 * 1024
+
+# Janela das taxas por nível (segundos)
+RATE_WINDOW = 60
+
+# Prefixo de data do PM2 com "time": true ("2024-05-01T14:00:00: mensagem")
+_PM2_TIME = re.compile(r'^(\d{4}-\d{2}-\d{2})T(\d{2}:\d{2}:\d{2})[^:\s]*:\s?')
+# Formato do logging do Python no performance.log ("2024-05-01 14:00:00,123 - ERROR - mensagem")
+_LOGGING = re.compile(r'^(\d{4}-\d{2}-\d{2}) (\d{2}:\d{2}:\d{2}),\d+ - ([A-Z]+) - ')
+_LOGGING_LEVELS = {'DEBUG': 'INFO', 'INFO': 'INFO', 'WARNING': 'WARN', 'ERROR': 'ERROR',
+                   'CRITICAL': 'ERROR'}
+
+_ERROR_MARKERS = ('❌', '🚨')
+_WARN_MARKERS = ('⚠️', '🚫')
+# Palavras só no início ("terror" não é erro); classes como TypeError em qualquer posição
+_ERROR_WORDS = re.compile(r'(?<![a-z])(?:erro|falha|exception|unhandled)')
+_ERROR_CLASSES = re.compile(r'[a-z](?:Error|Exception)\b')
+_WARN_WORDS = re.compile(r'(?<![a-z])(?:warn|aviso|timeout|deprecat)')
+# Trechos entre aspas (URL, user agent, valores citados) não definem o nível
+_QUOTED = re.compile(r'"[^"]*"')
+
+_access_time = TimeParser()
+
+
+def classify_line(line):
+    """Nível aproximado de uma linha de log: ERROR, WARN ou INFO"""
+    if '"' in line:
+        line = _QUOTED.sub('', line)
+    lowered = line.lower()
+    if (any(marker in line for marker in _ERROR_MARKERS) or _ERROR_WORDS.search(lowered)
+            or _ERROR_CLASSES.search(line)):
+        return 'ERROR'
+    if any(marker in line for marker in _WARN_MARKERS) or _WARN_WORDS.search(lowered):
+        return 'WARN'
+    return 'INFO'
+
+
+def status_level(status):
+    """Nível de uma linha de acesso pelo status: 5xx ERROR, 4xx WARN"""
+    if status >= 500:
+        return 'ERROR'
+    if status >= 400:
+        return 'WARN'
+    return 'INFO'
+
+
+def _timestamp(date, clock):
+    try:
+        return datetime.strptime(f'{date} {clock}', '%Y-%m-%d %H:%M:%S').timestamp()
+    except ValueError:
+        return None
+
+
+class LogLine:
+    """
+    Uma linha de log: horário (epoch), origem, nível e mensagem sem o prefixo de data.
+    `status` só existe em linhas de acesso (combined/bookverse_timed)
+    """
+
+    __slots__ = ('time', 'source', 'level', 'message', 'status')
+
+    def __init__(self, time, source, level, message, status=None):
+        self.time = time
+        self.source = source
+        self.level = level
+        self.message = message
+        self.status = status
+
+    @property
+    def access(self):
+        return self.status is not None
+
+    @property
+    def clock(self):
+        return datetime.fromtimestamp(self.time).strftime('%H:%M:%S')
+
+
+def parse_line(line, source, now=None):
+    """
+    Converte uma linha em LogLine. O horário vem do prefixo do PM2 ou do logging;
+    sem prefixo, vale `now` (o momento da leitura). Linhas de acesso recebem o nível
+    do status da resposta
+    """
+    timestamp = level = status = None
+    message = line
+    match = _LOGGING.match(line)
+    if match:
+        timestamp = _timestamp(match.group(1), match.group(2))
+        level = _LOGGING_LEVELS.get(match.group(3))
+        message = line[match.end():]
+    else:
+        match = _PM2_TIME.match(line)
+        if match:
+            timestamp = _timestamp(match.group(1), match.group(2))
+            message = line[match.end():]
+
+    if level is None and '"' in message:
+        entry = parse_access_line(message, _access_time)
+        if entry is not None:
+            status = entry.status
+            level = status_level(status)
+    if level is None:
+        level = classify_line(message)
+        floor = SOURCE_LEVELS.get(source)
+        if floor and LEVELS.index(level) < LEVELS.index(floor):
+            level = floor
+    if timestamp is None:
+        timestamp = time.time() if now is None else now
+    return LogLine(timestamp, source, level, message.strip(), status)
+
+
+class LogTail:
+    """Lê as linhas novas de um arquivo de log, acompanhando truncamento e rotação"""
+
+    def __init__(self, path, initial_bytes=8192, read_limit=READ_LIMIT):
+        self.path = path
+        self.initial_bytes = initial_bytes
+        self.read_limit = read_limit
+        self._file = None
+        self._inode = None
+        self._partial = b''
+        self._skip_partial = False
+        self._started = False
+
+    def _open(self):
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return False
+        stat = os.fstat(f.fileno())
+        if not self._started:
+            # Primeira abertura: só o final do arquivo, para preencher o painel.
+            # Arquivos que aparecem depois (rotação) são lidos desde o início
+            offset = max(0, stat.st_size - self.initial_bytes)
+            f.seek(offset)
+            self._skip_partial = offset > 0
+            self._started = True
+        self._file, self._inode = f, stat.st_ino
+        return True
+
+    def _replaced(self):
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return True
+
+    def _read(self, limit):
+        fileno = self._file.fileno()
+        if self._file.tell() > os.fstat(fileno).st_size:
+            # Truncado (copytruncate): recomeça do início
+            self._file.seek(0)
+            self._partial = b''
+        return self._file.read(limit)
+
+    def read_new(self):
+        """Retorna as linhas completas escritas desde a última chamada (até read_limit bytes)"""
+        data = b''
+        if self._file is not None:
+            data = self._read(self.read_limit)
+            if len(data) < self.read_limit and self._replaced():
+                # Arquivo antigo drenado: a última linha sem quebra também está completa
+                if (self._partial or data) and not data.endswith(b'\n'):
+                    data += b'\n'
+                self.close()
+        if self._file is None and len(data) < self.read_limit and self._open():
+            data += self._read(self.read_limit - len(data))
+        if not data:
+            return []
+
+        skip_first = self._skip_partial
+        self._skip_partial = False
+        chunks = (self._partial + data).split(b'\n')
+        self._partial = chunks.pop()
+        if skip_first and chunks:
+            # Começou no meio do arquivo: a primeira linha provavelmente está cortada
+            chunks.pop(0)
+        return [chunk.decode('utf-8', 'replace').rstrip('\r') for chunk in chunks if chunk.strip()]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class LogFollower:
+    """
+    Acompanha vários arquivos de log ao mesmo tempo.
+
+    `poll()` lê o que foi escrito em todas as origens; as entradas ficam num buffer
+    circular de `capacity` linhas e em contadores por segundo, de onde saem as taxas
+    por nível sem reler os arquivos. `skip(entry)` exclui entradas do buffer e das
+    taxas (ex.: linhas de acesso), mas elas continuam no retorno de `poll()`.
+    """
+
+    def __init__(self, sources=None, capacity=500, initial_bytes=8192, skip=None):
+        sources = DEFAULT_SOURCES if sources is None else sources
+        self.tails = {name: LogTail(path, initial_bytes) for name, path in sources.items()}
+        self.entries = deque(maxlen=capacity)
+        self.skip = skip
+        self.totals = dict.fromkeys(LEVELS, 0)
+        self._seconds = {}
+
+    @property
+    def paths(self):
+        return [tail.path for tail in self.tails.values()]
+
+    def poll(self, now=None):
+        """Lê as linhas novas de todas as origens; retorna as entradas em ordem de horário"""
+        now = time.time() if now is None else now
+        new = []
+        for source, tail in self.tails.items():
+            new.extend(parse_line(line, source, now) for line in tail.read_new())
+        new.sort(key=lambda entry: entry.time)
+
+        for entry in new:
+            if self.skip and self.skip(entry):
+                continue
+            self.entries.append(entry)
+            self.totals[entry.level] += 1
+            if entry.time > now - RATE_WINDOW:
+                second = int(entry.time)
+                counts = self._seconds.get(second)
+                if counts is None:
+                    counts = self._seconds[second] = dict.fromkeys(LEVELS, 0)
+                counts[entry.level] += 1
+        self._prune(now)
+        return new
+
+    def _prune(self, now):
+        limit = now - RATE_WINDOW
+        for second in [second for second in self._seconds if second <= limit]:
+            del self._seconds[second]
+
+    def rates(self, now=None):
+        """Entradas por nível na última janela (por minuto, com a janela padrão)"""
+        self._prune(time.time() if now is None else now)
+        rates = dict.fromkeys(LEVELS, 0)
+        for counts in self._seconds.values():
+            for level, count in counts.items():
+                rates[level] += count
+        return rates
+
+    def recent(self, count, level='INFO'):
+        """Últimas `count` entradas com nível igual ou acima de `level`"""
+        minimum = LEVELS.index(level)
+        selected = []
+        if count <= 0:
+            return selected
+        for entry in reversed(self.entries):
+            if LEVELS.index(entry.level) >= minimum:
+                selected.append(entry)
+                if len(selected) == count:
+                    break
+        selected.reverse()
+        return selected
+
+    def close(self):
+        for tail in self.tails.values():
+            tail.close()
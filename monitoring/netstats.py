@@ -0,0 +1,123 @@
+"""
+Taxas de rede por interface e estados de conexão TCP por porta
+Converte os contadores cumulativos do psutil em taxas por segundo
+"""
+
+import os
+import time
+
+import psutil
+
+# Contadores convertidos em taxa (por segundo)
+NIC_COUNTERS = ('bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv',
+                'errin', 'errout', 'dropin', 'dropout')
+
+# Portas acompanhadas: servidor Node e nginx
+DEFAULT_PORTS = (5000, 80, 443)
+
+# Estados TCP reportados por porta
+TCP_STATES = (
+    psutil.CONN_ESTABLISHED, psutil.CONN_SYN_RECV, psutil.CONN_TIME_WAIT,
+    psutil.CONN_CLOSE_WAIT, psutil.CONN_FIN_WAIT1, psutil.CONN_FIN_WAIT2,
+    psutil.CONN_LAST_ACK, psutil.CONN_LISTEN,
+)
+
+# Códigos de estado de /proc/net/tcp (Linux)
+_PROC_TCP_STATES = {
+    '01': psutil.CONN_ESTABLISHED, '02': psutil.CONN_SYN_SENT, '03': psutil.CONN_SYN_RECV,
+    '04': psutil.CONN_FIN_WAIT1, '05': psutil.CONN_FIN_WAIT2, '06': psutil.CONN_TIME_WAIT,
+    '07': psutil.CONN_CLOSE, '08': psutil.CONN_CLOSE_WAIT, '09': psutil.CONN_LAST_ACK,
+    '0A': psutil.CONN_LISTEN, '0B': psutil.CONN_CLOSING,
+}
+_PROC_TCP_FILES = ('/proc/net/tcp', '/proc/net/tcp6')
+
+# Alguns kernels/plataformas expõem contadores de 32 bits
+_WRAP_32 = 1 << 32
+_WRAP_64 = 1 << 64
+
+
+def counter_delta(current, previous):
+    """Diferença entre leituras de um contador monotônico, tratando o estouro"""
+    if current >= previous:
+        return current - previous
+    wrap = _WRAP_32 if previous < _WRAP_32 else _WRAP_64
+    delta = current + wrap - previous
+    # Queda grande demais para ser estouro: o contador foi zerado (ex.: interface recriada)
+    return delta if delta < wrap // 2 else current
+
+
+class NetworkRateCollector:
+    """Calcula bytes/s, pacotes/s, erros/s e drops/s de cada interface"""
+
+    def __init__(self, interfaces=None):
+        self.interfaces = interfaces
+        self._previous = None
+
+    def sample(self):
+        """Retorna {interface: {contador: taxa}}; vazio na primeira chamada"""
+        now = time.monotonic()
+        counters = psutil.net_io_counters(pernic=True)
+        if self.interfaces:
+            counters = {nic: value for nic, value in counters.items() if nic in self.interfaces}
+
+        rates = {}
+        if self._previous is not None:
+            previous_time, previous_counters = self._previous
+            elapsed = max(now - previous_time, 1e-6)
+            for nic, value in counters.items():
+                previous = previous_counters.get(nic)
+                if previous is None:
+                    continue
+                rates[nic] = {
+                    name: counter_delta(getattr(value, name), getattr(previous, name)) / elapsed
+                    for name in NIC_COUNTERS
+                }
+
+        self._previous = (now, counters)
+        return rates
+
+
+def _proc_port_states(breakdown):
+    # Leitura direta de /proc/net/tcp*: evita o mapeamento conexão -> PID do psutil,
+    # que percorre /proc/*/fd e é caro demais para amostrar a cada segundo
+    suffixes = {f":{port:04X}": port for port in breakdown}
+    for path in _PROC_TCP_FILES:
+        try:
+            with open(path) as f:
+                next(f, None)
+                for line in f:
+                    fields = line.split(None, 4)
+                    port = suffixes.get(fields[1][-5:])
+                    if port is None:
+                        continue
+                    state = _PROC_TCP_STATES.get(fields[3])
+                    if state in breakdown[port]:
+                        breakdown[port][state] += 1
+        except FileNotFoundError:
+            continue
+    return breakdown
+
+
+def port_states(ports=DEFAULT_PORTS):
+    """
+    Contagem de conexões TCP por porta local e estado.
+
+    Retorna {porta: {estado: quantidade}}; só conta conexões cuja porta local
+    é uma das acompanhadas (lado servidor).
+    """
+    breakdown = {port: dict.fromkeys(TCP_STATES, 0) for port in ports}
+    if os.path.exists(_PROC_TCP_FILES[0]):
+        return _proc_port_states(breakdown)
+
+    try:
+        connections = psutil.net_connections(kind='tcp')
+    except psutil.AccessDenied:
+        return breakdown
+
+    for connection in connections:
+        if not connection.laddr:
+            continue
+        states = breakdown.get(connection.laddr.port)
+        if states is not None and connection.status in states:
+            states[connection.status] += 1
+    return breakdown
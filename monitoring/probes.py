@@ -0,0 +1,231 @@
+"""
+Motor de sondas HTTP assíncronas para as rotas do BookVerse
+Cada rota tem intervalo, timeout e série de latência próprios
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+from .adaptive import PROBE_QPS, AdaptiveInterval, TokenBucket
+from .http import HttpClient, HttpError
+
+DEFAULT_PROBES = [
+    {'name': 'health', 'path': '/api/health', 'interval': 10, 'timeout': 5},
+    {'name': 'status', 'path': '/api/status', 'interval': 30, 'timeout': 5},
+    {'name': 'search', 'path': '/api/books/search?query=dom', 'interval': 30, 'timeout': 10},
+    {'name': 'notifications', 'path': '/api/notifications', 'interval': 60, 'timeout': 10, 'auth': True},
+]
+
+# Intervalo de uma sonda após falha ou latência fora da linha de base
+FAST_INTERVAL = 0.5
+
+# Falhas seguidas que ainda apertam o intervalo; uma falha persistente (servidor fora
+# do ar) volta ao intervalo normal em vez de sondar a cada FAST_INTERVAL para sempre
+TIGHTEN_FAILURES = 10
+
+
+class Probe:
+    """Definição de uma sonda HTTP"""
+
+    def __init__(self, name, path, interval=10, timeout=5, method='GET',
+                 headers=None, body=None, auth=False, expect_status=200,
+                 fast_interval=FAST_INTERVAL):
+        self.name = name
+        self.path = path
+        self.interval = interval
+        self.fast_interval = fast_interval
+        self.timeout = timeout
+        self.method = method.upper()
+        self.headers = headers or {}
+        self.body = body
+        self.auth = auth
+        self.expect_status = expect_status
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class ProbeResult:
+    """Resultado de uma execução de sonda"""
+
+    __slots__ = ('probe', 'timestamp', 'status_code', 'response_time', 'size', 'error',
+                 'phases', 'reused', 'body', 'weight')
+
+    def __init__(self, probe, timestamp, status_code=0, response_time=0.0, size=0, error=None,
+                 phases=None, reused=False, body=b''):
+        self.probe = probe
+        self.timestamp = timestamp
+        self.status_code = status_code
+        self.response_time = response_time
+        self.size = size
+        self.error = error
+        self.phases = phases or {}
+        self.reused = reused
+        self.body = body
+        # Fração do intervalo base que a amostra representa (< 1 com a sonda apertada)
+        self.weight = 1.0
+
+    @property
+    def ok(self):
+        return self.error is None and self.status_code == self.probe.expect_status
+
+
+def load_probes(path=None):
+    """Carrega as sondas de um arquivo JSON ou usa as padrão"""
+    path = path or os.environ.get('BOOKVERSE_PROBES', 'probes.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            definitions = json.load(f)
+    else:
+        definitions = DEFAULT_PROBES
+    return [Probe.from_dict(definition) for definition in definitions]
+
+
+class ProbeEngine:
+    """
+    Executa várias sondas concorrentemente em um único event loop.
+
+    O intervalo de cada sonda é adaptativo: uma falha (ou tighten()) passa a sondar
+    a cada `fast_interval`, voltando aos poucos ao intervalo normal. Respostas 4xx são
+    determinísticas e não apertam, e só as primeiras TIGHTEN_FAILURES falhas seguidas
+    apertam. `max_qps` limita as requisições de todas as sondas juntas.
+    Sondas autenticadas ficam de fora sem token nem credenciais.
+    """
+
+    def __init__(self, base_url, probes, on_result=None, client=None,
+                 token=None, credentials=None, max_qps=PROBE_QPS):
+        self.base_url = base_url.rstrip('/')
+        self.token = token or os.environ.get('BOOKVERSE_TOKEN')
+        self.credentials = credentials or self._credentials_from_env()
+        self.probes = []
+        for probe in probes:
+            if probe.auth and not (self.token or self.credentials):
+                logging.info(f"ℹ️ Sonda {probe.name} não será executada: defina BOOKVERSE_TOKEN "
+                             "ou BOOKVERSE_EMAIL/BOOKVERSE_PASSWORD")
+                continue
+            self.probes.append(probe)
+        self.intervals = {
+            probe.name: AdaptiveInterval(probe.interval, probe.fast_interval)
+            for probe in self.probes
+        }
+        self.failures = dict.fromkeys(self.intervals, 0)
+        self.limiter = TokenBucket(max_qps) if max_qps else None
+        self.on_result = on_result
+        self.client = client or HttpClient()
+        self._stopped = None
+        self._loop = None
+
+    @staticmethod
+    def _credentials_from_env():
+        email = os.environ.get('BOOKVERSE_EMAIL')
+        password = os.environ.get('BOOKVERSE_PASSWORD')
+        if email and password:
+            return {'email': email, 'password': password}
+        return None
+
+    async def login(self):
+        """Obtém um token via /api/auth/login para sondas autenticadas"""
+        if not self.credentials:
+            return None
+        response = await self.client.post(
+            f"{self.base_url}/api/auth/login", json_body=self.credentials, timeout=10
+        )
+        if response.status == 200:
+            self.token = response.json().get('token')
+        else:
+            logging.warning(f"⚠️ Login das sondas falhou: HTTP {response.status}")
+        return self.token
+
+    async def probe_once(self, probe):
+        """Executa uma sonda e retorna o ProbeResult"""
+        timestamp = time.time()
+        headers = dict(probe.headers)
+        try:
+            if probe.auth:
+                if not self.token:
+                    await self.login()
+                if self.token:
+                    headers['x-auth-token'] = self.token
+            elif self.token:
+                # Com token de administrador, /api/health inclui memória e PID do worker
+                headers['x-auth-token'] = self.token
+
+            response = await self.client.request(
+                probe.method, self.base_url + probe.path, headers=headers,
+                json_body=probe.body, timeout=probe.timeout
+            )
+        except asyncio.TimeoutError:
+            return ProbeResult(probe, timestamp, error=f"Timeout após {probe.timeout}s")
+        except (OSError, ValueError, EOFError, HttpError) as e:
+            return ProbeResult(probe, timestamp, error=str(e) or e.__class__.__name__)
+
+        if probe.auth and response.status == 401 and self.credentials:
+            self.token = None
+
+        return ProbeResult(
+            probe, timestamp, response.status, response.elapsed, len(response.body),
+            phases=response.timings, reused=response.reused, body=response.body
+        )
+
+    def tighten(self, name):
+        """Sonda mais rápido por um tempo (ex.: latência fora da linha de base)"""
+        interval = self.intervals[name]
+        if interval.tighten():
+            logging.info(f"🔎 Sonda {name}: sondando a cada {interval.fast:g}s")
+
+    async def _run_probe(self, probe):
+        interval = self.intervals[probe.name]
+        next_run = self._loop.time()
+        while not self._stopped.is_set():
+            if self.limiter:
+                await self.limiter.acquire()
+            # Espaçamento que levou a esta execução, antes de um possível tighten()
+            spacing = interval.current
+            result = await self.probe_once(probe)
+            result.weight = spacing / interval.base
+            if result.ok:
+                self.failures[probe.name] = 0
+            else:
+                self.failures[probe.name] += 1
+                failures = self.failures[probe.name]
+                if failures <= TIGHTEN_FAILURES:
+                    if not 400 <= result.status_code < 500:
+                        self.tighten(probe.name)
+                elif failures == TIGHTEN_FAILURES + 1 and interval.current < interval.base:
+                    interval.release()
+                    logging.info(f"🔎 Sonda {probe.name}: falha persistente, "
+                                 f"voltando a cada {interval.base:g}s")
+            if self.on_result:
+                try:
+                    self.on_result(result)
+                except Exception as e:
+                    logging.error(f"Erro ao processar resultado da sonda {probe.name}: {e}")
+
+            # Ticks em taxa fixa: o atraso de uma execução não se acumula
+            next_run += interval.relax()
+            delay = next_run - self._loop.time()
+            if delay < 0:
+                next_run = self._loop.time()
+                delay = 0
+            try:
+                await asyncio.wait_for(self._stopped.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        """Executa todas as sondas até stop() ser chamado"""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        try:
+            await asyncio.gather(*(self._run_probe(probe) for probe in self.probes))
+        finally:
+            await self.client.close()
+
+    def stop(self):
+        """Interrompe as sondas (seguro para chamar de outra thread)"""
+        if self._loop and self._stopped:
+            self._loop.call_soon_threadsafe(self._stopped.set)
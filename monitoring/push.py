@@ -0,0 +1,519 @@
+"""
+Envio de métricas por push: agentes nos nós e um agregador central
+Cada agente resume as amostras de uma janela em agregados (estatísticas + histograma)
+e os envia em quadros binários; o agregador funde os histogramas de todos os nós
+para obter percentis da frota inteira
+"""
+
+import asyncio
+import logging
+import random
+import socket
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+from .aggregates import SeriesAggregate, read_varint, write_varint
+
+DEFAULT_PORT = 9105
+FLUSH_INTERVAL = 5
+FLEET_WINDOW = 60
+# Envios perdidos seguidos (em intervalos de FLUSH_INTERVAL) até o nó sair da frota
+EXPIRE_INTERVALS = 12
+
+# Limite do spool local (quadros não confirmados) e de quadros em voo sem ACK
+SPOOL_LIMIT = 8 * 1024 * 1024
+MAX_IN_FLIGHT = 32
+MAX_BACKOFF = 30
+DRAIN_TIMEOUT = 5
+
+# Quadros UDP precisam caber em um datagrama
+MAX_DATAGRAM = 60000
+UDP_RECEIVE_BUFFER = 4 * 1024 * 1024
+MAX_FRAME = 16 * 1024 * 1024
+
+MAGIC = 0x46505642  # 'BVPF'
+FRAME_VERSION = 1
+
+# magic, versão, reservado, tamanho do nome do nó, tamanho do payload, crc32,
+# sessão do agente, sequência, início da janela
+_FRAME = struct.Struct('<IBBHIIIQd')
+_ACK = struct.Struct('<Q')
+
+
+def encode_frames(node, session, seq, window_start, aggregates, limit=MAX_FRAME):
+    """
+    Serializa os agregados em um ou mais quadros de até `limit` bytes.
+
+    Retorna a lista de (sequência, quadro); a sequência avança um por quadro.
+    """
+    node_bytes = node.encode('utf-8')
+    frames = []
+    entries = []
+    size = 0
+    budget = limit - _FRAME.size - len(node_bytes) - 10
+
+    def emit():
+        nonlocal seq
+        payload = bytearray()
+        write_varint(payload, len(entries))
+        for entry in entries:
+            payload += entry
+        crc = zlib.crc32(payload, zlib.crc32(node_bytes))
+        header = _FRAME.pack(MAGIC, FRAME_VERSION, 0, len(node_bytes), len(payload), crc,
+                             session, seq, window_start)
+        frames.append((seq, header + node_bytes + bytes(payload)))
+        seq += 1
+
+    for name, aggregate in aggregates.items():
+        entry = bytearray()
+        name_bytes = name.encode('utf-8')
+        write_varint(entry, len(name_bytes))
+        entry += name_bytes
+        aggregate.encode(entry)
+        if entries and size + len(entry) > budget:
+            emit()
+            entries, size = [], 0
+        entries.append(entry)
+        size += len(entry)
+    if entries:
+        emit()
+    return frames
+
+
+def decode_header(data):
+    """Valida o cabeçalho; retorna (tamanho do nome, tamanho do payload, crc, sessão, seq, janela)"""
+    magic, version, _, node_length, payload_length, crc, session, seq, window_start = \
+        _FRAME.unpack_from(data, 0)
+    if magic != MAGIC or version != FRAME_VERSION:
+        raise ValueError("Quadro com cabeçalho inválido")
+    if payload_length > MAX_FRAME:
+        raise ValueError("Quadro grande demais")
+    return node_length, payload_length, crc, session, seq, window_start
+
+
+def decode_frame(data):
+    """Decodifica um quadro completo; retorna (nó, sessão, seq, janela, {série: agregado})"""
+    node_length, payload_length, crc, session, seq, window_start = decode_header(data)
+    body = memoryview(data)[_FRAME.size:_FRAME.size + node_length + payload_length]
+    if len(body) != node_length + payload_length:
+        raise ValueError("Quadro truncado")
+    node_bytes = bytes(body[:node_length])
+    payload = bytes(body[node_length:])
+    if zlib.crc32(payload, zlib.crc32(node_bytes)) != crc:
+        raise ValueError("CRC inválido")
+
+    count, offset = read_varint(payload, 0)
+    aggregates = {}
+    for _ in range(count):
+        length, offset = read_varint(payload, offset)
+        name = payload[offset:offset + length].decode('utf-8')
+        aggregate, offset = SeriesAggregate.decode(payload, offset + length)
+        aggregates[name] = aggregate
+    return node_bytes.decode('utf-8'), session, seq, window_start, aggregates
+
+
+async def _wait_either(task, event):
+    # Espera a tarefa terminar ou o evento disparar, sem deixar a espera pendurada
+    waiter = asyncio.ensure_future(event.wait())
+    try:
+        await asyncio.wait([task, waiter], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        waiter.cancel()
+
+
+class PushAgent:
+    """
+    Agente de um nó: agrega amostras por janela e envia ao agregador.
+
+    Quadros ficam no spool até o ACK do agregador (TCP); com o agregador fora do ar
+    o spool cresce até `spool_limit` bytes e descarta os quadros mais antigos.
+    No máximo `max_in_flight` quadros ficam sem confirmação: além disso o envio espera.
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT, node=None, transport='tcp',
+                 flush_interval=FLUSH_INTERVAL, spool_limit=SPOOL_LIMIT,
+                 max_in_flight=MAX_IN_FLIGHT):
+        if transport not in ('tcp', 'udp'):
+            raise ValueError(f"Transporte inválido: {transport}")
+        self.host = host
+        self.port = port
+        self.node = node or socket.gethostname()
+        self.transport = transport
+        self.flush_interval = flush_interval
+        self.spool_limit = spool_limit
+        self.max_in_flight = max_in_flight
+        self.session = random.getrandbits(32)
+        self.seq = 0
+        self.spool = deque()
+        self.spool_bytes = 0
+        self.stats = {
+            'samples': 0, 'frames_sent': 0, 'frames_acked': 0, 'frames_dropped': 0,
+            'bytes_sent': 0, 'reconnects': 0,
+        }
+        self._batch = {}
+        self._batch_start = time.time()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._stopped = None
+        self._wakeup = None
+
+    def record(self, name, value):
+        """Registra uma amostra na janela atual (seguro entre threads)"""
+        with self._lock:
+            aggregate = self._batch.get(name)
+            if aggregate is None:
+                aggregate = self._batch[name] = SeriesAggregate()
+            aggregate.record(value)
+            self.stats['samples'] += 1
+
+    def flush(self):
+        """Fecha a janela atual e coloca seus quadros no spool"""
+        with self._lock:
+            batch, self._batch = self._batch, {}
+            window_start, self._batch_start = self._batch_start, time.time()
+        if not batch:
+            return 0
+
+        limit = MAX_DATAGRAM if self.transport == 'udp' else MAX_FRAME
+        frames = encode_frames(self.node, self.session, self.seq, window_start, batch, limit)
+        self.seq += len(frames)
+        for seq, frame in frames:
+            self.spool.append((seq, frame))
+            self.spool_bytes += len(frame)
+        while self.spool_bytes > self.spool_limit and self.spool:
+            _, dropped = self.spool.popleft()
+            self.spool_bytes -= len(dropped)
+            self.stats['frames_dropped'] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return len(frames)
+
+    def _acknowledge(self, acked):
+        while self.spool and self.spool[0][0] <= acked:
+            _, frame = self.spool.popleft()
+            self.spool_bytes -= len(frame)
+            self.stats['frames_acked'] += 1
+
+    async def run(self):
+        """Agrega e envia até stop() ser chamado; ao parar, tenta esvaziar o spool"""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        sender = asyncio.create_task(
+            self._send_tcp() if self.transport == 'tcp' else self._send_udp()
+        )
+        try:
+            while not self._stopped.is_set():
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self.flush()
+        finally:
+            self.flush()
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._drained(), DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logging.warning(f"⚠️ Agente {self.node}: {len(self.spool)} quadros não enviados")
+            sender.cancel()
+            try:
+                await sender
+            except asyncio.CancelledError:
+                pass
+
+    async def _drained(self):
+        while self.spool:
+            await asyncio.sleep(0.01)
+
+    def stop(self):
+        """Interrompe o agente (seguro para chamar de outra thread)"""
+        if self._loop and self._stopped:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    async def _send_tcp(self):
+        backoff = 0.5
+        while True:
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), 5
+                )
+            except (OSError, asyncio.TimeoutError):
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+
+            backoff = 0.5
+            acked = asyncio.Event()
+            acks = asyncio.create_task(self._read_acks(reader, acked))
+            try:
+                # Reconexão: reenvia tudo que ainda não foi confirmado
+                next_seq = self.spool[0][0] if self.spool else self.seq
+                while not acks.done():
+                    pending = [(seq, frame) for seq, frame in self.spool if seq >= next_seq]
+                    if not pending:
+                        self._wakeup.clear()
+                        await _wait_either(acks, self._wakeup)
+                        continue
+                    for seq, frame in pending:
+                        while self.spool and seq - self.spool[0][0] >= self.max_in_flight:
+                            acked.clear()
+                            await _wait_either(acks, acked)
+                            if acks.done():
+                                break
+                        if acks.done():
+                            break
+                        writer.write(frame)
+                        # Backpressure do TCP: espera o buffer de envio esvaziar
+                        await writer.drain()
+                        self.stats['frames_sent'] += 1
+                        self.stats['bytes_sent'] += len(frame)
+                        next_seq = seq + 1
+            except (ConnectionError, OSError):
+                pass
+            finally:
+                acks.cancel()
+                writer.close()
+                self.stats['reconnects'] += 1
+
+    async def _read_acks(self, reader, acked):
+        try:
+            while True:
+                data = await reader.readexactly(_ACK.size)
+                self._acknowledge(_ACK.unpack(data)[0])
+                acked.set()
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            return
+
+    async def _send_udp(self):
+        transport, _ = await self._loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol, remote_addr=(self.host, self.port)
+        )
+        try:
+            while True:
+                while self.spool:
+                    seq, frame = self.spool[0]
+                    try:
+                        transport.sendto(frame)
+                    except OSError:
+                        await asyncio.sleep(0.1)
+                        break
+                    self._acknowledge(seq)
+                    self.stats['frames_sent'] += 1
+                    self.stats['bytes_sent'] += len(frame)
+                    # Sem ACK no UDP: cede o loop para não estourar o buffer do kernel
+                    await asyncio.sleep(0)
+                self._wakeup.clear()
+                await self._wakeup.wait()
+        finally:
+            transport.close()
+
+
+class _NodeState:
+    __slots__ = ('session', 'seq', 'last_seen', 'series')
+
+    def __init__(self, session):
+        self.session = session
+        self.seq = -1
+        self.last_seen = 0.0
+        self.series = {}
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, aggregator):
+        self.aggregator = aggregator
+
+    def datagram_received(self, data, address):
+        # UDP não reenvia e pode reordenar: sem descarte por sequência
+        self.aggregator.ingest(data, dedupe=False)
+
+
+class PushAggregator:
+    """
+    Recebe quadros dos agentes (TCP e UDP na mesma porta) e mantém, por nó e série,
+    os agregados das janelas recentes. Percentis da frota vêm da fusão dos histogramas.
+    Nós sem envios há `expire_after` segundos saem da frota (e dos totais).
+    """
+
+    def __init__(self, host='0.0.0.0', port=DEFAULT_PORT, window=FLEET_WINDOW,
+                 expire_after=FLUSH_INTERVAL * EXPIRE_INTERVALS):
+        self.host = host
+        self.port = port
+        self.window = window
+        self.expire_after = expire_after
+        self.nodes = {}
+        self.stats = {'frames': 0, 'bytes': 0, 'samples': 0, 'duplicates': 0, 'invalid': 0}
+        self._server = None
+        self._udp = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._udp, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _DatagramProtocol(self), local_addr=(self.host, self.port)
+        )
+        # Rajadas de vários agentes: buffer de recepção maior reduz perdas no UDP
+        try:
+            self._udp.get_extra_info('socket').setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECEIVE_BUFFER
+            )
+        except OSError:
+            pass
+        return self
+
+    async def close(self):
+        if self._udp is not None:
+            self._udp.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(_FRAME.size)
+                node_length, payload_length, *_ = decode_header(header)
+                body = await reader.readexactly(node_length + payload_length)
+                seq = self.ingest(header + body)
+                if seq is not None:
+                    writer.write(_ACK.pack(seq))
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def ingest(self, data, dedupe=True):
+        """Processa um quadro; retorna a sequência a confirmar (None se inválido)"""
+        try:
+            node, session, seq, window_start, aggregates = decode_frame(data)
+        except (ValueError, struct.error, UnicodeDecodeError, IndexError):
+            self.stats['invalid'] += 1
+            return None
+
+        now = time.monotonic()
+        state = self.nodes.get(node)
+        if state is None or state.session != session:
+            # Nó novo ou agente reiniciado: a sequência recomeça
+            previous = state.series if state else {}
+            state = self.nodes[node] = _NodeState(session)
+            state.series = previous
+        state.last_seen = now
+        if dedupe and seq <= state.seq:
+            # Reenvio após reconexão de um quadro já processado
+            self.stats['duplicates'] += 1
+            return seq
+        state.seq = max(state.seq, seq)
+
+        self.stats['frames'] += 1
+        self.stats['bytes'] += len(data)
+        for name, aggregate in aggregates.items():
+            windows = state.series.get(name)
+            if windows is None:
+                windows = state.series[name] = deque()
+            windows.append((now, aggregate))
+            self.stats['samples'] += aggregate.count
+            while windows and now - windows[0][0] > self.window:
+                windows.popleft()
+        return seq
+
+    def _recent(self, windows, now):
+        return [aggregate for received, aggregate in windows if now - received <= self.window]
+
+    def expire(self, now=None):
+        """Remove nós sem envios há `expire_after` segundos e séries sem janelas recentes"""
+        now = time.monotonic() if now is None else now
+        for node, state in list(self.nodes.items()):
+            silent = now - state.last_seen
+            if silent > self.expire_after:
+                del self.nodes[node]
+                logging.info(f"🔌 Nó {node} sem envios há {silent:.0f}s: removido da frota")
+                continue
+            for name in [name for name, windows in state.series.items()
+                         if not windows or now - windows[-1][0] > self.window]:
+                del state.series[name]
+
+    def fleet(self, pattern=None):
+        """Funde as janelas recentes de todos os nós: {série: snapshot}"""
+        now = time.monotonic()
+        self.expire(now)
+        merged = {}
+        for state in self.nodes.values():
+            for name, windows in state.series.items():
+                if pattern and pattern not in name:
+                    continue
+                for aggregate in self._recent(windows, now):
+                    merged.setdefault(name, SeriesAggregate()).merge(aggregate)
+        return {name: aggregate.snapshot() for name, aggregate in sorted(merged.items())}
+
+    def node_summary(self):
+        """Último contato e número de séries de cada nó"""
+        now = time.monotonic()
+        self.expire(now)
+        return {
+            node: {'last_seen': now - state.last_seen, 'series': len(state.series)}
+            for node, state in sorted(self.nodes.items())
+        }
+
+
+async def throughput_test(agents=50, duration=5.0, series=20, transport='tcp'):
+    """
+    Simula `agents` agentes em localhost enviando ao mesmo agregador.
+
+    Cada agente grava amostras continuamente e envia quadros a cada 100 ms; ao fim,
+    confere se o agregador contou exatamente as amostras gravadas (sem perdas no TCP).
+    """
+    aggregator = await PushAggregator('127.0.0.1', 0, window=duration * 10).start()
+    pool = [
+        PushAgent('127.0.0.1', aggregator.port, node=f'node-{index:02d}', transport=transport,
+                  flush_interval=0.1)
+        for index in range(agents)
+    ]
+    runners = [asyncio.create_task(agent.run()) for agent in pool]
+    names = [f'response_times:probe{index}.response_time' for index in range(series)]
+
+    async def produce(agent):
+        while not stopped.is_set():
+            for name in names:
+                for _ in range(10):
+                    agent.record(name, random.lognormvariate(3, 0.6))
+            await asyncio.sleep(0.005)
+
+    stopped = asyncio.Event()
+    started = time.perf_counter()
+    producers = [asyncio.create_task(produce(agent)) for agent in pool]
+    await asyncio.sleep(duration)
+    stopped.set()
+    await asyncio.gather(*producers)
+    for agent in pool:
+        agent.stop()
+    await asyncio.gather(*runners)
+    elapsed = time.perf_counter() - started
+    await aggregator.close()
+
+    recorded = sum(agent.stats['samples'] for agent in pool)
+    return {
+        'agents': agents,
+        'transport': transport,
+        'seconds': elapsed,
+        'samples_recorded': recorded,
+        'samples_received': aggregator.stats['samples'],
+        'frames': aggregator.stats['frames'],
+        'bytes': aggregator.stats['bytes'],
+        'frames_per_second': aggregator.stats['frames'] / elapsed,
+        'samples_per_second': aggregator.stats['samples'] / elapsed,
+        'dropped_frames': sum(agent.stats['frames_dropped'] for agent in pool),
+        'duplicates': aggregator.stats['duplicates'],
+        'fleet_p99': aggregator.fleet(names[0]).get(names[0], {}).get('p99'),
+        'lossless': aggregator.stats['samples'] == recorded,
+    }
+
+
+def parse_address(text, default_host='127.0.0.1'):
+    """'host:porta', ':porta' ou 'porta' -> (host, porta)"""
+    host, _, port = text.rpartition(':')
+    return host or default_host, int(port or DEFAULT_PORT)
+
@@ -0,0 +1,167 @@
+"""
+Consultas de intervalo e agregação sobre as métricas armazenadas
+Base do comando `manage.py metrics query`
+"""
+
+import csv
+import fnmatch
+import io
+import json
+import re
+import time
+from datetime import datetime, timedelta
+
+from .aggregates import SeriesAggregate
+from .probes import load_probes
+from .rollup import RollupManager
+from .tsdb import TimeSeriesStore
+
+AGGREGATES = ('count', 'mean', 'stddev', 'min', 'max', 'p50', 'p90', 'p99', 'p999')
+DEFAULT_AGGREGATES = ('count', 'mean', 'p50', 'p99', 'max')
+GROUP_BY = ('series', 'endpoint', 'none')
+FORMATS = ('table', 'csv', 'json')
+
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+_DURATION = re.compile(r'^(\d+(?:\.\d+)?)([smhdw])$')
+
+
+def parse_duration(text):
+    """Converte '30s', '1m', '2h', '7d' em segundos"""
+    match = _DURATION.match(text.strip().lower())
+    if not match:
+        raise ValueError(f"Duração inválida: {text!r} (use ex.: 30s, 1m, 2h, 7d)")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def parse_time(text, now=None):
+    """
+    Converte uma referência de tempo em epoch (segundos).
+
+    Aceita 'now', durações relativas ('2h' = 2 horas atrás), 'HH:MM' (hoje),
+    'yesterday HH:MM' / 'ontem HH:MM', datas ISO ('2024-05-01T14:00') e epoch.
+    """
+    now = time.time() if now is None else now
+    text = text.strip().lower()
+    if text in ('now', 'agora'):
+        return now
+    if _DURATION.match(text.lstrip('-')):
+        return now - parse_duration(text.lstrip('-'))
+
+    day = datetime.fromtimestamp(now)
+    for prefix in ('yesterday', 'ontem'):
+        if text.startswith(prefix):
+            day -= timedelta(days=1)
+            text = text[len(prefix):].strip() or '00:00'
+            break
+
+    if re.match(r'^\d{1,2}:\d{2}(:\d{2})?$', text):
+        clock = datetime.strptime(text, '%H:%M:%S' if text.count(':') == 2 else '%H:%M')
+        moment = day.replace(hour=clock.hour, minute=clock.minute,
+                             second=clock.second, microsecond=0)
+        return moment.timestamp()
+
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text.upper().replace(' ', 'T')).timestamp()
+    except ValueError:
+        raise ValueError(f"Horário inválido: {text!r}")
+
+
+def endpoint_label(series, paths=None):
+    """Rótulo de endpoint de uma série ('response_times:search.ttfb' -> 'search')"""
+    metric, _, rest = series.partition(':')
+    label = rest.rsplit('.', 1)[0] if rest else metric
+    return (paths or {}).get(label, label)
+
+
+def match_series(names, pattern):
+    """Filtra séries por glob; sem curingas, aceita também correspondência por sufixo"""
+    if any(char in pattern for char in '*?['):
+        return [name for name in names if fnmatch.fnmatchcase(name, pattern)]
+    return [name for name in names if name == pattern or name.endswith('.' + pattern)]
+
+
+def run_query(path, series, since, until, step=None, aggregates=DEFAULT_AGGREGATES,
+              group_by='series'):
+    """
+    Executa uma consulta sobre a base em `path`.
+
+    Retorna (camadas usadas, linhas) onde cada linha é um dicionário com
+    'time', 'group' e os agregados pedidos.
+    """
+    store = TimeSeriesStore(path, readonly=True)
+    rollups = RollupManager(store)
+    names = match_series(store.series_names(), series)
+    paths = {}
+    if group_by == 'endpoint':
+        paths = {probe.name: probe.path.split('?', 1)[0] for probe in load_probes()}
+
+    # Sem passo, cada grupo vira um único bucket cobrindo o intervalo inteiro
+    query_step = step if step else until - since
+    groups = {}
+    tiers = set()
+    for name in names:
+        if group_by == 'endpoint':
+            group = endpoint_label(name, paths)
+        elif group_by == 'none':
+            group = series
+        else:
+            group = name
+
+        used, buckets = rollups.query(name, since, until, query_step)
+        tiers.update(tier.name for tier in used)
+        merged = groups.setdefault(group, {})
+        for bucket_start, aggregate in buckets:
+            merged.setdefault(bucket_start, SeriesAggregate()).merge(aggregate)
+    store.close()
+
+    rows = []
+    for group in sorted(groups):
+        for bucket_start, aggregate in sorted(groups[group].items()):
+            snapshot = aggregate.snapshot()
+            row = {
+                'time': datetime.fromtimestamp(bucket_start).isoformat(timespec='seconds'),
+                'group': group,
+            }
+            for name in aggregates:
+                row[name] = snapshot[name]
+            rows.append(row)
+    return sorted(tiers), rows
+
+
+def format_rows(rows, output='table'):
+    """Formata as linhas da consulta como tabela, CSV ou JSON"""
+    if output == 'json':
+        return json.dumps(rows, indent=2)
+    if not rows:
+        return ''
+
+    columns = list(rows[0])
+    if output == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue()
+
+    def cell(value):
+        if isinstance(value, float):
+            return f"{value:.2f}"
+        return str(value)
+
+    table = [[cell(row[column]) for column in columns] for row in rows]
+    widths = [
+        max(len(column), *(len(line[index]) for line in table))
+        for index, column in enumerate(columns)
+    ]
+    lines = ['  '.join(column.ljust(width) for column, width in zip(columns, widths))]
+    lines.append('  '.join('-' * width for width in widths))
+    for line in table:
+        lines.append('  '.join(
+            value.ljust(width) if index < 2 else value.rjust(width)
+            for index, (value, width) in enumerate(zip(line, widths))
+        ))
+    return '\n'.join(lines)
@@ -0,0 +1,203 @@
+"""
+Replay de access logs do nginx contra um servidor
+Reenvia as requisições com os intervalos originais entre chegadas, divididos por
+um fator de aceleração, e compara a latência de agora com a registrada no log.
+O log é lido em fluxo: a memória não cresce com o tamanho do arquivo
+"""
+
+import asyncio
+from datetime import datetime
+
+from .accesslog import arrivals, read_entries, route_key
+from .aggregates import HdrHistogram
+from .bench import PERCENTILES
+from .http import HttpClient, HttpError
+
+# Requisições em andamento no máximo; acima disso a leitura do log espera (e o atraso é medido)
+MAX_INFLIGHT = 2000
+
+# Métodos reenviados por padrão: o log não guarda corpos, então POST/PUT não são reproduzíveis
+DEFAULT_METHODS = ('GET', 'HEAD')
+
+# Rotas distintas com histogramas próprios; as demais (ex.: varreduras) vão para OTHER
+MAX_ROUTES = 1000
+OTHER = '(outras)'
+
+
+class RouteReplay:
+    """Latências registradas e reproduzidas de uma rota"""
+
+    __slots__ = ('sent', 'captured', 'replayed', 'errors', 'status_changed', 'timeouts')
+
+    def __init__(self):
+        self.sent = 0
+        self.captured = HdrHistogram()
+        self.replayed = HdrHistogram()
+        self.errors = {}
+        # Respostas com classe de status diferente da registrada (ex.: 200 no log, 500 agora)
+        self.status_changed = 0
+        # Timeouts e requisições sem resposta no fim do replay: estão em `replayed` com a
+        # espera que tiveram, para que o p99 não perca justamente as mais lentas
+        self.timeouts = 0
+
+    def timed_out(self, waited):
+        self.errors['timeout'] = self.errors.get('timeout', 0) + 1
+        self.timeouts += 1
+        self.replayed.record(waited * 1000)
+
+
+class LogReplayer:
+    """
+    Reproduz as requisições de um access log em `speed` vezes a velocidade original.
+
+    A chegada de cada requisição é o horário do log menos o $request_time; a primeira
+    define a origem. Como no bench, a latência é medida do horário previsto até a
+    resposta. `duration` limita o trecho do log (em segundos de log) reproduzido.
+    """
+
+    def __init__(self, base_url, speed=1.0, connections=64, timeout=10, methods=DEFAULT_METHODS,
+                 prefix=None, duration=None, max_inflight=MAX_INFLIGHT):
+        self.base_url = base_url.rstrip('/')
+        self.speed = speed
+        self.connections = connections
+        self.timeout = timeout
+        self.methods = {method.upper() for method in methods}
+        self.prefix = prefix
+        self.duration = duration
+        self.max_inflight = max_inflight
+        self.routes = {}
+        self.counts = {'lines': 0, 'invalid': 0, 'skipped': 0, 'replayed': 0}
+        self.lag = HdrHistogram()
+        self.log_span = 0.0
+
+    def _route(self, key):
+        route = self.routes.get(key)
+        if route is None:
+            if len(self.routes) >= MAX_ROUTES:
+                key = OTHER
+                route = self.routes.get(key)
+            if route is None:
+                route = self.routes[key] = RouteReplay()
+        return route
+
+    def _accepts(self, entry):
+        return (entry.method in self.methods
+                and (not self.prefix or entry.path.startswith(self.prefix)))
+
+    async def _replay(self, client, entry, route, intended, loop):
+        try:
+            response = await client.request(entry.method, self.base_url + entry.path,
+                                            timeout=self.timeout)
+        except asyncio.TimeoutError:
+            route.timed_out(loop.time() - intended)
+            return
+        except (OSError, ValueError, EOFError, HttpError) as e:
+            name = e.__class__.__name__
+            route.errors[name] = route.errors.get(name, 0) + 1
+            return
+        route.replayed.record((loop.time() - intended) * 1000)
+        if response.status // 100 != entry.status // 100:
+            route.status_changed += 1
+
+    async def run(self, path):
+        """Reproduz o log; retorna o resultado consolidado (dict serializável)"""
+        loop = asyncio.get_running_loop()
+        client = HttpClient(max_connections=self.connections, idle_timeout=self.timeout * 2)
+        started = datetime.now().isoformat()
+        # Tarefas em andamento -> (rota, horário previsto)
+        pending = {}
+        origin = start = None
+        try:
+            for entry in arrivals(read_entries(path, self.counts)):
+                if not self._accepts(entry):
+                    self.counts['skipped'] += 1
+                    continue
+                if origin is None:
+                    origin, start = entry.start, loop.time()
+                offset = entry.start - origin
+                if self.duration and offset > self.duration:
+                    break
+                self.log_span = offset
+
+                intended = start + offset / self.speed
+                delay = intended - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # Limite de requisições em andamento: mantém a memória constante
+                while len(pending) >= self.max_inflight:
+                    await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                self.lag.record(max(loop.time() - intended, 0) * 1000)
+
+                route = self._route(route_key(entry.path))
+                route.sent += 1
+                if entry.request_time is not None:
+                    route.captured.record(entry.request_time)
+                task = asyncio.create_task(self._replay(client, entry, route, intended, loop))
+                pending[task] = (route, intended)
+                task.add_done_callback(pending.pop)
+                self.counts['replayed'] += 1
+            if pending:
+                await asyncio.wait(list(pending), timeout=self.timeout + 1)
+            # Sem resposta até o fim do prazo: conta como timeout da rota
+            finished = loop.time()
+            for route, intended in pending.values():
+                route.timed_out(finished - intended)
+        finally:
+            for task in list(pending):
+                task.cancel()
+            await client.close()
+        return self.result(path, started)
+
+    def result(self, path, started):
+        def percentiles(histogram):
+            if not histogram.total:
+                return None
+            values = histogram.percentiles(PERCENTILES)
+            return {('max' if p == 100 else f'p{p:g}'): values[p] for p in PERCENTILES}
+
+        routes = {}
+        for key, route in sorted(self.routes.items(), key=lambda item: -item[1].sent):
+            captured, replayed = percentiles(route.captured), percentiles(route.replayed)
+            routes[key] = {
+                'sent': route.sent,
+                'completed': route.replayed.total - route.timeouts,
+                'timeouts': route.timeouts,
+                'errors': route.errors,
+                'status_changed': route.status_changed,
+                'captured': captured,
+                'replayed': replayed,
+                # Razão reproduzido / registrado: > 1 ficou mais lento que em produção
+                'ratio': {
+                    metric: replayed[metric] / captured[metric] if captured[metric] else None
+                    for metric in ('p50', 'p99')
+                } if captured and replayed else None,
+            }
+        lag = percentiles(self.lag)
+        return {
+            'log': path,
+            'target': self.base_url,
+            'started': started,
+            'speed': self.speed,
+            'log_span': self.log_span,
+            'counts': dict(self.counts),
+            'generator': {'lag': lag},
+            'routes': routes,
+        }
+
+
+def replay_rows(result, limit=20):
+    """Linhas por rota para format_rows: latência registrada x reproduzida (ms)"""
+    rows = []
+    for key, route in list(result['routes'].items())[:limit]:
+        captured = route['captured'] or {}
+        replayed = route['replayed'] or {}
+        rows.append({
+            'route': key,
+            'requests': route['sent'],
+            'errors': sum(route['errors'].values()),
+            'log_p50': captured.get('p50', '-'),
+            'replay_p50': replayed.get('p50', '-'),
+            'log_p99': captured.get('p99', '-'),
+            'replay_p99': replayed.get('p99', '-'),
+        })
+    return rows
@@ -0,0 +1,94 @@
+"""
+Buffers circulares colunares para séries de métricas
+Capacidade fixa: o uso de memória não cresce com o tempo de execução
+"""
+
+import time
+from array import array
+
+
+class RingBuffer:
+    """Buffer circular colunar de capacidade fixa para uma série de métricas"""
+
+    def __init__(self, capacity, fields=('value',), typecode='d'):
+        if capacity <= 0:
+            raise ValueError("capacity deve ser maior que zero")
+
+        self.capacity = int(capacity)
+        self.fields = tuple(fields)
+        self.timestamps = array('q', [0]) * self.capacity
+        self.columns = {
+            field: array(typecode, [0]) * self.capacity
+            for field in self.fields
+        }
+        self._head = 0
+        self._size = 0
+
+    @classmethod
+    def for_retention(cls, retention, interval, fields=('value',), typecode='d'):
+        """Cria um buffer dimensionado para reter `retention` segundos de amostras"""
+        capacity = max(1, int(retention // max(interval, 1e-3)))
+        return cls(capacity, fields, typecode)
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp=None, **values):
+        """Adiciona uma amostra, sobrescrevendo a mais antiga se estiver cheio"""
+        if timestamp is None:
+            timestamp = time.time()
+
+        index = self._head
+        self.timestamps[index] = int(timestamp)
+        for field in self.fields:
+            self.columns[field][index] = values.get(field, 0)
+
+        self._head = (index + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def clear(self):
+        """Descarta todas as amostras"""
+        self._head = 0
+        self._size = 0
+
+    def _ordered(self, data):
+        if self._size < self.capacity:
+            return data[:self._size]
+        return data[self._head:] + data[:self._head]
+
+    def column(self, field='value'):
+        """Retorna os valores de um campo em ordem cronológica"""
+        return self._ordered(self.columns[field])
+
+    def times(self):
+        """Retorna os timestamps (epoch em segundos) em ordem cronológica"""
+        return self._ordered(self.timestamps)
+
+    def latest(self):
+        """Retorna a amostra mais recente como dicionário"""
+        if not self._size:
+            return None
+
+        index = (self._head - 1) % self.capacity
+        sample = {'timestamp': self.timestamps[index]}
+        for field in self.fields:
+            sample[field] = self.columns[field][index]
+        return sample
+
+    def rows(self):
+        """Itera sobre as amostras em ordem cronológica"""
+        start = (self._head - self._size) % self.capacity
+        for offset in range(self._size):
+            index = (start + offset) % self.capacity
+            sample = {'timestamp': self.timestamps[index]}
+            for field in self.fields:
+                sample[field] = self.columns[field][index]
+            yield sample
+
+    def to_dict(self):
+        """Exporta o buffer em formato colunar (serializável em JSON)"""
+        data = {'timestamp': self.times().tolist()}
+        for field in self.fields:
+            data[field] = self.column(field).tolist()
+        return data
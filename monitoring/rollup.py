@@ -0,0 +1,266 @@
+"""
+Rollups (downsampling) em camadas com retenção por camada
+Amostras brutas -> buckets de 1 min -> buckets de 1 h, sem reler os dados brutos
+"""
+
+import bisect
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+from urllib.parse import quote
+
+from .aggregates import SeriesAggregate
+
+RECORD_HEADER = struct.Struct('<qII')  # início do bucket (s), crc32, tamanho
+ROLLUP_SUFFIX = '.rup'
+
+# Retenção dos dados brutos na TimeSeriesStore (segundos)
+RAW_RETENTION = 24 * 3600
+
+# Pontos desejados por consulta quando nenhum passo é informado
+DEFAULT_QUERY_POINTS = 300
+
+
+class Tier:
+    """Camada de rollup: resolução, retenção e duração dos segmentos (segundos)"""
+
+    def __init__(self, name, resolution, retention, segment_duration):
+        self.name = name
+        self.resolution = resolution
+        self.retention = retention
+        self.segment_duration = segment_duration
+
+
+DEFAULT_TIERS = (
+    Tier('1m', 60, 30 * 24 * 3600, 24 * 3600),
+    Tier('1h', 3600, 365 * 24 * 3600, 30 * 24 * 3600),
+)
+
+
+def _read_records(path, first=None, last=None):
+    """
+    Lê os buckets válidos de um arquivo de rollup; retorna (buckets, tamanho válido).
+
+    Com `first`/`last`, só decodifica buckets com início em (first, last); os demais
+    são pulados pelo cabeçalho, sem validar CRC nem decodificar o histograma.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    records = []
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        start, crc, length = RECORD_HEADER.unpack_from(data, offset)
+        body_start = offset + RECORD_HEADER.size
+        end = body_start + length
+        if end > len(data):
+            break
+        if first is not None and not first < start < last:
+            offset = end
+            continue
+        if zlib.crc32(data[body_start:end]) != crc:
+            break
+        aggregate, _ = SeriesAggregate.decode(data, body_start)
+        records.append((start, aggregate))
+        offset = end
+    return records, offset
+
+
+class RollupManager:
+    """
+    Mantém buckets abertos por camada e série e grava os buckets fechados.
+
+    Cada amostra entra no bucket de 1 min em O(1); ao fechar, o bucket é gravado
+    e mesclado no bucket de 1 h. Consultas usam a camada mais grossa que cabe no
+    passo pedido e completam as bordas com as camadas mais finas.
+    """
+
+    def __init__(self, store, tiers=DEFAULT_TIERS, raw_retention=RAW_RETENTION):
+        self.store = store
+        self.tiers = tuple(tiers)
+        # Pseudo-camada dos dados brutos (resolução nominal de 1 s)
+        self.raw_tier = Tier('raw', 1, raw_retention, None)
+        self._open = {}
+        self._checked = set()
+        self._lock = threading.Lock()
+
+    def _directory(self, tier, name):
+        return os.path.join(self.store.path, f'@{tier.name}', quote(name, safe=''))
+
+    def record(self, name, timestamp, value):
+        """Acrescenta uma amostra bruta ao bucket aberto da primeira camada"""
+        with self._lock:
+            self._bucket(0, name, timestamp).record(value)
+
+    def _bucket(self, level, name, timestamp):
+        tier = self.tiers[level]
+        start = int(timestamp // tier.resolution * tier.resolution)
+        current = self._open.get((level, name))
+        # Amostras atrasadas entram no bucket aberto em vez de reabrir um fechado
+        if current is not None and start > current[0]:
+            self._seal(level, name)
+            current = None
+        if current is None:
+            current = self._open[(level, name)] = [start, SeriesAggregate()]
+        return current[1]
+
+    def _seal(self, level, name):
+        start, aggregate = self._open.pop((level, name))
+        if not aggregate.count:
+            return
+        self._write(self.tiers[level], name, start, aggregate)
+        if level + 1 < len(self.tiers):
+            self._bucket(level + 1, name, start).merge(aggregate)
+
+    def _write(self, tier, name, start, aggregate):
+        if self.store.readonly:
+            return
+        directory = self._directory(tier, name)
+        segment = start - start % tier.segment_duration
+        path = os.path.join(directory, f'{segment}{ROLLUP_SUFFIX}')
+
+        # Na primeira escrita do processo, descarta um registro incompleto no final
+        if path not in self._checked:
+            os.makedirs(directory, exist_ok=True)
+            if os.path.exists(path):
+                _, valid = _read_records(path)
+                if valid < os.path.getsize(path):
+                    os.truncate(path, valid)
+            self._checked.add(path)
+
+        body = aggregate.encode()
+        with open(path, 'ab') as f:
+            f.write(RECORD_HEADER.pack(start, zlib.crc32(body), len(body)) + body)
+
+    def maintain(self, now=None):
+        """Fecha buckets ociosos e aplica a retenção de cada camada"""
+        now = time.time() if now is None else now
+        with self._lock:
+            for level, tier in enumerate(self.tiers):
+                for key in [k for k, v in self._open.items()
+                            if k[0] == level and v[0] + tier.resolution <= now]:
+                    self._seal(*key)
+
+            if self.store.readonly:
+                return
+            for name in self.store.series_names():
+                self.store.drop_before(name, now - self.raw_tier.retention)
+            for tier in self.tiers:
+                self._drop_expired(tier, now - tier.retention)
+
+    def _drop_expired(self, tier, cutoff):
+        root = os.path.join(self.store.path, f'@{tier.name}')
+        if not os.path.isdir(root):
+            return
+        for series in os.listdir(root):
+            directory = os.path.join(root, series)
+            for filename in os.listdir(directory):
+                segment = int(filename[:-len(ROLLUP_SUFFIX)])
+                if segment + tier.segment_duration <= cutoff:
+                    path = os.path.join(directory, filename)
+                    os.remove(path)
+                    self._checked.discard(path)
+
+    def close(self):
+        """Grava os buckets abertos (parciais), da camada mais fina para a mais grossa"""
+        with self._lock:
+            for level in range(len(self.tiers)):
+                for key in [k for k in self._open if k[0] == level]:
+                    self._seal(*key)
+
+    def query(self, name, start=None, end=None, step=None):
+        """
+        Agrega a série em buckets de `step` segundos no intervalo [start, end].
+
+        Cada bucket da consulta é montado da camada mais grossa para a mais fina: um
+        bucket de rollup entra só se couber inteiro no bucket da consulta e já estiver
+        gravado em disco. O início e o fim desalinhados, e o trecho ainda não
+        consolidado, vêm da camada seguinte e por fim dos dados brutos, então o
+        resultado cobre exatamente o intervalo pedido (também para leitores em outro
+        processo, que não veem os buckets abertos).
+        Retorna (camadas usadas, [(início do bucket, SeriesAggregate)]).
+        """
+        now = time.time()
+        end = now if end is None else end
+        start = end - 3600 if start is None else start
+        if step is None:
+            # Passo automático: arredonda para a camada mais grossa que couber
+            step = max(1, (end - start) / DEFAULT_QUERY_POINTS)
+            resolution = max(
+                (tier.resolution for tier in self.tiers if tier.resolution <= step), default=1
+            )
+            step = math.ceil(step / resolution) * resolution
+
+        buckets = {}
+
+        def bucket_for(timestamp):
+            key = start + max(0, (timestamp - start) // step) * step
+            aggregate = buckets.get(key)
+            if aggregate is None:
+                aggregate = buckets[key] = SeriesAggregate()
+            return aggregate
+
+        # Trechos ainda sem dados, já cortados nas fronteiras dos buckets da consulta
+        count = max(1, math.ceil((end - start) / step))
+        gaps = [(start + index * step, min(start + (index + 1) * step, end)) for index in range(count)]
+        used = []
+        for tier in reversed(self.tiers):
+            if tier.resolution > step or not gaps:
+                continue
+            records = sorted(self._read_tier(tier, name, start, end), key=lambda record: record[0])
+            if not records:
+                continue
+            starts = [bucket_start for bucket_start, _ in records]
+            # Depois do último bucket gravado, a camada ainda não consolidou os dados
+            covered = starts[-1] + tier.resolution
+            remaining = []
+            for gap_start, gap_end in gaps:
+                first = math.ceil(gap_start / tier.resolution) * tier.resolution
+                last = min(gap_end // tier.resolution * tier.resolution, covered)
+                if first >= last:
+                    remaining.append((gap_start, gap_end))
+                    continue
+                aggregate = bucket_for(first)
+                for _, record in records[bisect.bisect_left(starts, first):bisect.bisect_left(starts, last)]:
+                    aggregate.merge(record)
+                if gap_start < first:
+                    remaining.append((gap_start, first))
+                if last < gap_end:
+                    remaining.append((last, gap_end))
+            gaps = remaining
+            used.append(tier)
+
+        # O que sobrou sai dos dados brutos, lendo de uma vez os trechos contíguos
+        runs = []
+        for gap_start, gap_end in gaps:
+            if runs and runs[-1][1] == gap_start:
+                runs[-1][1] = gap_end
+            else:
+                runs.append([gap_start, gap_end])
+        for run_start, run_end in runs:
+            for timestamp, value in self.store.read(name, run_start, run_end):
+                if run_start <= timestamp and (timestamp < run_end or run_end == end):
+                    bucket_for(timestamp).record(value)
+                    if self.raw_tier not in used:
+                        used.append(self.raw_tier)
+
+        return used, sorted(buckets.items())
+
+    def _read_tier(self, tier, name, start, end):
+        """Buckets gravados da camada com início em [start, end) (os abertos ficam de fora)"""
+        first = start - 1
+        records = []
+        directory = self._directory(tier, name)
+        if os.path.isdir(directory):
+            for filename in sorted(os.listdir(directory)):
+                segment = int(filename[:-len(ROLLUP_SUFFIX)])
+                if segment > end or segment + tier.segment_duration <= first:
+                    continue
+                segment_records, _ = _read_records(
+                    os.path.join(directory, filename), first, end
+                )
+                records.extend(segment_records)
+        return records
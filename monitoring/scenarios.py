@@ -0,0 +1,340 @@
+"""
+Jornadas sintéticas de usuário (cenários) em várias etapas
+Um cenário é uma sequência de requisições com tempo de pensar entre elas e
+variáveis propagadas de uma resposta para as próximas (ex.: o token do login).
+Os mesmos cenários servem de carga no `manage.py bench` e de sondas no monitor
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import string
+import time
+import uuid
+
+from .http import HttpClient, HttpError
+from .probes import Probe, ProbeResult
+
+# Intervalo padrão entre execuções de um cenário como sonda (segundos); 0 desativa
+PROBE_INTERVAL = 300
+
+# Termos usados em {query} quando o cenário não define os seus
+SEARCH_TERMS = ('dom', 'machado', 'amor', 'historia', 'python', 'guerra', 'mar', 'casa')
+
+DEFAULT_SCENARIOS = [
+    {
+        'name': 'leitor', 'weight': 70,
+        'steps': [
+            {'name': 'login', 'method': 'POST', 'path': '/api/auth/login',
+             'body': {'email': '{email}', 'password': '{password}'},
+             'extract': {'token': 'token'}, 'think': [1, 3]},
+            {'name': 'profile', 'path': '/api/auth/profile', 'auth': True, 'think': [2, 5]},
+            {'name': 'search', 'path': '/api/books/search?query={query}',
+             'extract': {'book_id': '0._id|0.id'}, 'think': [3, 8]},
+            {'name': 'download', 'method': 'POST', 'path': '/api/books/download/{book_id}',
+             'think': [1, 3]},
+            {'name': 'notifications', 'path': '/api/notifications', 'auth': True,
+             'repeat': 3, 'think': 10},
+        ],
+    },
+    {
+        'name': 'visitante', 'weight': 25,
+        'steps': [
+            {'name': 'search', 'path': '/api/books/search?query={query}', 'think': [2, 6]},
+            {'name': 'search-category', 'path': '/api/books/search?category=ficcao', 'think': [2, 6]},
+        ],
+    },
+    {
+        # Cria um usuário por sessão: só como carga, nunca como sonda
+        'name': 'cadastro', 'weight': 5, 'probe_interval': 0,
+        'vars': {'email': 'bench-{session}@bookverse.invalid', 'password': 'bench-{session}'},
+        'steps': [
+            {'name': 'register', 'method': 'POST', 'path': '/api/auth/register',
+             'body': {'name': 'Bench {session}', 'email': '{email}', 'password': '{password}'},
+             'extract': {'token': 'token'}, 'think': [5, 15]},
+            {'name': 'profile', 'path': '/api/auth/profile', 'auth': True, 'think': [2, 5]},
+            {'name': 'notifications', 'path': '/api/notifications', 'auth': True},
+        ],
+    },
+]
+
+
+class ScenarioError(Exception):
+    """Cenário inválido ou variável ausente ao montar uma etapa"""
+
+
+def render(template, values):
+    """Substitui {variável} em strings, listas e dicts"""
+    if isinstance(template, str):
+        try:
+            return template.format_map(values)
+        except KeyError as e:
+            raise ScenarioError(f"Variável ausente: {e.args[0]}")
+    if isinstance(template, dict):
+        return {key: render(value, values) for key, value in template.items()}
+    if isinstance(template, list):
+        return [render(value, values) for value in template]
+    return template
+
+
+def template_fields(template):
+    """Nomes das variáveis usadas em strings, listas e dicts"""
+    if isinstance(template, str):
+        return [field for _, field, _, _ in string.Formatter().parse(template) if field]
+    if isinstance(template, dict):
+        return [field for value in template.values() for field in template_fields(value)]
+    if isinstance(template, list):
+        return [field for value in template for field in template_fields(value)]
+    return []
+
+
+def extract(data, path):
+    """
+    Valor de um caminho pontuado no JSON ('token', '0._id'); alternativas
+    separadas por '|' são tentadas em ordem
+    """
+    for alternative in path.split('|'):
+        value = data
+        try:
+            for key in alternative.split('.'):
+                value = value[int(key)] if isinstance(value, list) else value[key]
+        except (KeyError, IndexError, TypeError, ValueError):
+            continue
+        if value is not None:
+            return str(value)
+    return None
+
+
+class Step:
+    """Uma etapa: requisição, variáveis extraídas da resposta e tempo de pensar depois dela"""
+
+    def __init__(self, name, path, method='GET', body=None, headers=None, auth=False,
+                 extract=None, think=0, repeat=1, expect_status=200, timeout=10):
+        self.name = name
+        self.path = path
+        self.method = method.upper()
+        self.body = body
+        self.headers = headers or {}
+        self.auth = auth
+        self.extract = extract or {}
+        self.think = think
+        self.repeat = repeat
+        self.expect_status = expect_status
+        self.timeout = timeout
+        self.probe = None
+
+    def think_time(self, rng):
+        if isinstance(self.think, (list, tuple)):
+            return rng.uniform(*self.think)
+        return self.think
+
+
+class Scenario:
+    """
+    Jornada de um tipo de usuário: etapas em ordem, peso na mistura e intervalo como sonda.
+
+    `vars` define variáveis da sessão a partir das globais (ex.: um e-mail por sessão
+    com {session}). Cada etapa vira uma Probe '<cenário>-<etapa>' para as séries do monitor.
+    """
+
+    def __init__(self, name, steps, weight=1, vars=None, probe_interval=PROBE_INTERVAL):
+        self.name = name
+        self.steps = [step if isinstance(step, Step) else Step(**step) for step in steps]
+        if not self.steps:
+            raise ScenarioError(f"Cenário {name} sem etapas")
+        self.weight = weight
+        self.vars = vars or {}
+        self.probe_interval = probe_interval
+        for step in self.steps:
+            step.probe = Probe(
+                f'{name}-{step.name}', step.path, interval=probe_interval or PROBE_INTERVAL,
+                timeout=step.timeout, method=step.method, auth=step.auth,
+                expect_status=step.expect_status
+            )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def probes(self):
+        return [step.probe for step in self.steps]
+
+    def missing(self, variables):
+        """Variáveis usadas pelo cenário que nem as globais nem as etapas anteriores fornecem"""
+        available = set(variables) | set(self.vars) | {'session', 'query'}
+        missing = []
+        for step in self.steps:
+            fields = template_fields([step.path, step.body, step.headers])
+            if step.auth:
+                fields.append('token')
+            for field in fields:
+                if field not in available and field not in missing:
+                    missing.append(field)
+            available |= set(step.extract)
+        return missing
+
+
+def load_scenarios(path=None):
+    """Carrega os cenários de um arquivo JSON ou usa os padrão"""
+    path = path or os.environ.get('BOOKVERSE_SCENARIOS', 'scenarios.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            definitions = json.load(f)
+    else:
+        definitions = DEFAULT_SCENARIOS
+    return [Scenario.from_dict(definition) for definition in definitions]
+
+
+def variables_from_env():
+    """Variáveis globais: credenciais do usuário de teste e token pronto, se houver"""
+    variables = {}
+    for name, key in (('email', 'BOOKVERSE_EMAIL'), ('password', 'BOOKVERSE_PASSWORD'),
+                      ('token', 'BOOKVERSE_TOKEN')):
+        if os.environ.get(key):
+            variables[name] = os.environ[key]
+    return variables
+
+
+class ScenarioRunner:
+    """
+    Executa sessões de cenários: etapa a etapa, com o tempo de pensar multiplicado por
+    `think_scale` (0 nas sondas). Uma etapa com falha encerra a sessão, já que as
+    seguintes dependem dela.
+    """
+
+    def __init__(self, base_url, client=None, variables=None, think_scale=1.0,
+                 limiter=None, seed=None):
+        self.base_url = base_url.rstrip('/')
+        self.client = client or HttpClient()
+        self.variables = variables if variables is not None else variables_from_env()
+        self.think_scale = think_scale
+        self.limiter = limiter
+        self.random = random.Random(seed)
+
+    def session_values(self, scenario):
+        values = dict(self.variables)
+        values['session'] = uuid.uuid4().hex[:12]
+        values['query'] = self.random.choice(SEARCH_TERMS)
+        values.update(render(scenario.vars, values))
+        return values
+
+    async def execute(self, step, values):
+        """Executa uma etapa e retorna o ProbeResult; variáveis extraídas entram em `values`"""
+        timestamp = time.time()
+        try:
+            path = render(step.path, values)
+            body = render(step.body, values)
+            headers = render(step.headers, values)
+            if step.auth:
+                headers['x-auth-token'] = render('{token}', values)
+            response = await self.client.request(
+                step.method, self.base_url + path, headers=headers,
+                json_body=body, timeout=step.timeout
+            )
+        except asyncio.TimeoutError:
+            return ProbeResult(step.probe, timestamp, error=f"Timeout após {step.timeout}s")
+        except (OSError, ValueError, EOFError, HttpError, ScenarioError) as e:
+            return ProbeResult(step.probe, timestamp, error=str(e) or e.__class__.__name__)
+
+        result = ProbeResult(
+            step.probe, timestamp, response.status, response.elapsed, len(response.body),
+            phases=response.timings, reused=response.reused, body=response.body
+        )
+        if result.ok and step.extract:
+            try:
+                data = response.json()
+            except ValueError:
+                data = None
+            for name, path in step.extract.items():
+                value = extract(data, path)
+                if value is None:
+                    result.error = f"Campo {path} ausente na resposta"
+                    break
+                values[name] = value
+        return result
+
+    async def run(self, scenario, on_step=None, due=None):
+        """
+        Executa uma sessão; True se todas as etapas passaram.
+
+        `on_step(step, result, due, finished)` recebe cada resultado com o horário (do
+        loop) em que a etapa deveria sair e em que terminou. `due` é o horário previsto
+        da primeira etapa (geradores em malha aberta); as seguintes vencem ao fim do
+        tempo de pensar.
+        """
+        loop = asyncio.get_running_loop()
+        values = self.session_values(scenario)
+        due = loop.time() if due is None else due
+        for step in scenario.steps:
+            for _ in range(step.repeat):
+                if self.limiter:
+                    await self.limiter.acquire()
+                result = await self.execute(step, values)
+                finished = loop.time()
+                if on_step:
+                    on_step(step, result, due, finished)
+                if not result.ok:
+                    return False
+                think = step.think_time(self.random) * self.think_scale
+                if think > 0:
+                    await asyncio.sleep(think)
+                due = loop.time()
+        return True
+
+
+class ScenarioProbes:
+    """
+    Executa cada cenário como sonda sintética a cada `probe_interval` segundos, sem
+    tempo de pensar. Cada etapa entrega um ProbeResult a `on_result`, como as sondas
+    de uma rota só; cenários com variáveis que faltam (ex.: sem credenciais) ficam de fora.
+    """
+
+    def __init__(self, base_url, scenarios, on_result=None, client=None, limiter=None,
+                 variables=None):
+        self.runner = ScenarioRunner(base_url, client, variables, think_scale=0, limiter=limiter)
+        self.scenarios = []
+        for scenario in scenarios:
+            if not scenario.probe_interval:
+                continue
+            missing = scenario.missing(self.runner.variables)
+            if missing:
+                logging.info(f"ℹ️ Cenário {scenario.name} não será sondado: faltam {', '.join(missing)}")
+                continue
+            self.scenarios.append(scenario)
+        self.on_result = on_result
+        self._stopped = None
+        self._loop = None
+
+    def _deliver(self, step, result, due, finished):
+        if self.on_result:
+            try:
+                self.on_result(result)
+            except Exception as e:
+                logging.error(f"Erro ao processar resultado do cenário {step.probe.name}: {e}")
+
+    async def _run_scenario(self, scenario):
+        next_run = self._loop.time()
+        while not self._stopped.is_set():
+            await self.runner.run(scenario, on_step=self._deliver)
+            next_run += scenario.probe_interval
+            delay = max(next_run - self._loop.time(), 0)
+            try:
+                await asyncio.wait_for(self._stopped.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        """Executa os cenários até stop() ser chamado"""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        try:
+            await asyncio.gather(*(self._run_scenario(scenario) for scenario in self.scenarios))
+        finally:
+            await self.runner.client.close()
+
+    def stop(self):
+        """Interrompe os cenários (seguro para chamar de outra thread)"""
+        if self._loop and self._stopped:
+            self._loop.call_soon_threadsafe(self._stopped.set)
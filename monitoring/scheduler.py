@@ -0,0 +1,164 @@
+"""
+Agendador único dos coletores do performance-monitor.py
+Todos os coletores rodam como tarefas de um só event loop, em taxa fixa com
+correção de deriva; chamadas bloqueantes (psutil, disco) vão para um executor pequeno
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .adaptive import AdaptiveInterval
+from .aggregates import SeriesAggregate
+
+# Threads do executor para chamadas bloqueantes (psutil, escrita de relatórios)
+EXECUTOR_WORKERS = 2
+
+
+class Job:
+    """
+    Um coletor periódico: `func` é uma corrotina sem argumentos.
+
+    Com `fast`, o intervalo é adaptativo: tighten() passa a amostrar a cada `fast`
+    segundos, e depois o intervalo volta aos poucos para `interval`.
+    """
+
+    def __init__(self, name, interval, func, timeout=None, delay=0.0, fast=None):
+        self.name = name
+        self.adaptive = AdaptiveInterval(interval, fast)
+        self.func = func
+        # Sem timeout explícito, uma execução não pode passar do intervalo base
+        self.timeout = timeout if timeout is not None else interval
+        self.delay = delay
+        self.runs = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.lag = SeriesAggregate()
+        self.duration = SeriesAggregate()
+
+    @property
+    def interval(self):
+        return self.adaptive.current
+
+    def tighten(self):
+        """Amostra mais rápido por um tempo (desvio da linha de base, falha)"""
+        if self.adaptive.tighten():
+            logging.info(f"🔎 Coletor {self.name}: amostrando a cada {self.adaptive.fast:g}s")
+
+    def stats(self):
+        """Execuções, falhas, ticks perdidos, apertos, atraso (jitter) e duração em ms"""
+        return {
+            'interval': self.interval,
+            'base_interval': self.adaptive.base,
+            'tightened': self.adaptive.tightened,
+            'runs': self.runs,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'skipped': self.skipped,
+            'lag': self.lag.snapshot(),
+            'duration': self.duration.snapshot(),
+        }
+
+
+class Scheduler:
+    """
+    Executa os jobs em taxa fixa: cada tick é agendado a partir do horário previsto do
+    anterior (não de quando ele terminou), então o atraso de uma execução não se acumula
+    nas seguintes. Ticks que já passaram quando a execução anterior termina são pulados
+    (e contados), não executados em rajada.
+
+    Com `budget` (CpuBudget), apertos só valem dentro do orçamento de CPU do monitor;
+    acima dele os intervalos base são alongados.
+
+    stop() cancela as tarefas na hora, inclusive as que estão esperando o próximo tick.
+    `on_run`, se informado, recebe (job, atraso, duração) em ms após cada execução.
+    """
+
+    def __init__(self, executor_workers=EXECUTOR_WORKERS, on_run=None, budget=None):
+        self.on_run = on_run
+        self.budget = budget
+        self.stretch = 1.0
+        self.jobs = []
+        self.tasks = []
+        self.executor = ThreadPoolExecutor(executor_workers, thread_name_prefix='collector')
+        self._loop = None
+        self._stopped = None
+
+    def add(self, name, interval, func, timeout=None, delay=0.0, fast=None):
+        job = Job(name, interval, func, timeout, delay, fast)
+        self.jobs.append(job)
+        return job
+
+    def job(self, name):
+        return next(job for job in self.jobs if job.name == name)
+
+    def tighten(self, name):
+        """Aperta a amostragem de um job, se o monitor estiver dentro do orçamento de CPU"""
+        if self.stretch > 1:
+            return False
+        self.job(name).tighten()
+        return True
+
+    async def run_blocking(self, func, *args):
+        """Executa uma chamada bloqueante no executor sem travar o event loop"""
+        return await self._loop.run_in_executor(self.executor, func, *args)
+
+    async def _run_job(self, job):
+        scheduled = self._loop.time() + job.delay
+        while True:
+            delay = scheduled - self._loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            began = self._loop.time()
+            lag = (began - scheduled) * 1000
+            job.lag.record(lag)
+            try:
+                await asyncio.wait_for(job.func(), job.timeout)
+            except asyncio.TimeoutError:
+                # O trabalho já entregue ao executor termina em segundo plano
+                job.timeouts += 1
+                logging.warning(f"⚠️ Coletor {job.name} excedeu {job.timeout:g}s")
+            except Exception as e:
+                job.errors += 1
+                logging.error(f"Erro no coletor {job.name}: {e}")
+            finished = self._loop.time()
+            duration = (finished - began) * 1000
+            job.duration.record(duration)
+            job.runs += 1
+            if self.on_run:
+                self.on_run(job, lag, duration)
+
+            if self.budget:
+                self.stretch = self.budget.stretch()
+            interval = job.adaptive.relax(stretch=self.stretch)
+
+            # Próximo tick ainda no futuro; os que já passaram são pulados
+            scheduled += interval
+            if scheduled <= finished:
+                missed = int((finished - scheduled) / interval) + 1
+                job.skipped += missed
+                scheduled += missed * interval
+
+    async def run(self, *background):
+        """Executa os jobs (e corrotinas extras, como as sondas) até stop()"""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self.tasks = [asyncio.create_task(self._run_job(job), name=job.name) for job in self.jobs]
+        self.tasks += [asyncio.create_task(coroutine) for coroutine in background]
+        try:
+            await self._stopped.wait()
+        finally:
+            for task in self.tasks:
+                task.cancel()
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self):
+        """Interrompe o agendador (seguro para chamar de outra thread ou de um sinal)"""
+        if self._loop and self._stopped:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def stats(self):
+        return {job.name: job.stats() for job in self.jobs}
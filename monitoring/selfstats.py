@@ -0,0 +1,171 @@
+"""
+Custo dos próprios monitores: tempo de cada etapa, CPU/RSS do processo
+e um profiler por amostragem acionado sob demanda (SIGUSR1)
+Os monitores rodam na mesma VPS do servidor Node, então o custo deles conta
+"""
+
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from .aggregates import SeriesAggregate
+
+PROFILE_INTERVAL = 0.005
+PROFILE_DURATION = 10
+PROFILE_DIR = os.environ.get('BOOKVERSE_PROFILE_DIR', '.')
+PROFILE_TOP = 15
+
+
+class Spans:
+    """
+    Mede a duração (ms) de etapas nomeadas: coleta, renderização, relatório.
+
+    Cada etapa acumula um agregado (estatísticas + histograma); `on_span`, se
+    informado, recebe (nome, duração) a cada medição para virar série.
+    """
+
+    def __init__(self, on_span=None):
+        self.on_span = on_span
+        self.series = {}
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000)
+
+    def record(self, name, duration):
+        aggregate = self.series.get(name)
+        if aggregate is None:
+            aggregate = self.series[name] = SeriesAggregate()
+        aggregate.record(duration)
+        if self.on_span:
+            self.on_span(name, duration)
+
+    def mean(self, name):
+        aggregate = self.series.get(name)
+        return aggregate.mean if aggregate and aggregate.count else None
+
+    def summary(self):
+        return {name: aggregate.snapshot() for name, aggregate in sorted(self.series.items())}
+
+
+def _rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # Sem /proc: pico de RSS (KB no Linux, bytes no macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class ProcessUsage:
+    """CPU (% de um núcleo, desde a leitura anterior) e RSS do próprio processo, sem psutil"""
+
+    def __init__(self):
+        self._cpu = time.process_time()
+        self._wall = time.monotonic()
+
+    def sample(self):
+        cpu, wall = time.process_time(), time.monotonic()
+        elapsed = wall - self._wall
+        percent = (cpu - self._cpu) / elapsed * 100 if elapsed > 0 else 0.0
+        self._cpu, self._wall = cpu, wall
+        return {'cpu': percent, 'rss': _rss(), 'threads': threading.active_count()}
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem: lê as pilhas de todas as threads a cada `interval`
+    segundos durante `duration` segundos e grava as pilhas no formato "collapsed"
+    (uma linha por pilha, com contagem; aceito por flamegraph.pl e speedscope).
+    """
+
+    def __init__(self, name, interval=PROFILE_INTERVAL, duration=PROFILE_DURATION,
+                 directory=PROFILE_DIR):
+        self.name = name
+        self.interval = interval
+        self.duration = duration
+        self.directory = directory
+        self.last_path = None
+        self._thread = None
+
+    def install(self, signum=getattr(signal, 'SIGUSR1', None)):
+        """Aciona o profiler com um sinal (só na thread principal; sem efeito no Windows)"""
+        if signum is None:
+            return False
+        signal.signal(signum, lambda *_: self.trigger())
+        return True
+
+    def trigger(self):
+        """Inicia uma amostragem em segundo plano; ignorado se já houver uma em andamento"""
+        if self._thread and self._thread.is_alive():
+            return False
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        logging.info(f"🔬 Profiler: amostrando por {self.duration:g}s...")
+        try:
+            path = self.dump(self.collect())
+        except OSError as e:
+            logging.error(f"Erro ao gravar o perfil: {e}")
+            return
+        self.last_path = path
+        logging.info(f"🔬 Perfil gravado em {path}")
+
+    def collect(self):
+        """Amostra as pilhas e retorna Counter({pilha collapsed: amostras})"""
+        stacks = Counter()
+        names = {}
+        own = threading.get_ident()
+        deadline = time.monotonic() + self.duration
+        while time.monotonic() < deadline:
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, str(ident)))
+                stacks[';'.join(reversed(labels))] += 1
+            time.sleep(self.interval)
+        return stacks
+
+    def dump(self, stacks):
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, f'profile-{self.name}-{os.getpid()}-{stamp}.txt')
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+        # Resumo no log: funções que mais aparecem no topo da pilha
+        leaves = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        for function, count in leaves.most_common(PROFILE_TOP):
+            logging.info(f"   {count / total:6.1%}  {function}")
+        return path
@@ -0,0 +1,265 @@
+"""
+Publicação das séries recentes em memória compartilhada
+O performance-monitor.py escreve; monitor.py e start-monitor.py só leem,
+sem coletar nada por conta própria
+
+Layout (little-endian):
+  cabeçalho (64 bytes): magic, versão do layout, seq, atualização, pid, slots, capacidade, em uso
+  diretório: um registro de 64 bytes por série (nome, quantidade, posição de escrita)
+  dados: por série, `capacidade` pares (timestamp, valor) em float64
+
+Consistência por seqlock: o escritor deixa `seq` ímpar durante a escrita e par ao
+terminar; o leitor copia os dados e descarta a cópia se `seq` mudou no meio.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+DEFAULT_NAME = os.environ.get('BOOKVERSE_SHM', 'bookverse-metrics')
+DEFAULT_SLOTS = 512
+DEFAULT_CAPACITY = 120
+
+MAGIC = 0x4D535642  # 'BVSM'
+LAYOUT_VERSION = 1
+
+# magic, versão, seq, atualização, pid, slots, capacidade, em uso
+_HEADER = struct.Struct('<IIQdIIII')
+_HEADER_SIZE = 64
+_SEQ_OFFSET = 8
+_SEQ = struct.Struct('<Q')
+_UPDATED = struct.Struct('<d')
+
+_NAME_SIZE = 48
+# nome, quantidade, posição de escrita, reservado
+_SLOT = struct.Struct(f'<{_NAME_SIZE}sIIQ')
+_POINT = struct.Struct('<dd')
+
+# Tentativas de leitura antes de desistir de um escritor que não para de publicar
+MAX_READ_RETRIES = 100
+
+# Segmento sem atualização há mais que isso é de um escritor morto (mesmo com o pid reaproveitado)
+STALE_AFTER = 300
+
+
+def _segment_size(slots, capacity):
+    return _HEADER_SIZE + slots * _SLOT.size + slots * capacity * _POINT.size
+
+
+class SharedMetricsWriter:
+    """
+    Escritor único do segmento (protegido por lock entre threads do mesmo processo).
+
+    Cada série ocupa um slot fixo com um buffer circular de `capacity` pontos;
+    cada amostra nova escreve só o próprio ponto e o registro do slot.
+    """
+
+    def __init__(self, name=DEFAULT_NAME, slots=DEFAULT_SLOTS, capacity=DEFAULT_CAPACITY):
+        self.name = name
+        self.slots = slots
+        self.capacity = capacity
+        size = _segment_size(slots, capacity)
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            owner = self._live_owner(name)
+            if owner:
+                # Outro performance-monitor.py publica aqui: não rouba o segmento dele
+                raise FileExistsError(f"Segmento {name} em uso pelo processo {owner}")
+            # Segmento de uma execução anterior que não foi removido
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        self._dropped = set()
+
+        self.buffer = self.shm.buf
+        self.index = {}
+        self.counts = []
+        self.heads = []
+        self._seq = 0
+        self._depth = 0
+        self._lock = threading.RLock()
+        self._data_offset = _HEADER_SIZE + slots * _SLOT.size
+        _HEADER.pack_into(self.buffer, 0, MAGIC, LAYOUT_VERSION, 0, time.time(),
+                          os.getpid(), slots, capacity, 0)
+
+    @staticmethod
+    def _live_owner(name):
+        """pid do escritor de um segmento existente, se ainda estiver publicando"""
+        try:
+            reader = SharedMetricsReader(name)
+        except (OSError, ValueError, struct.error):
+            return None
+        try:
+            updated = _UPDATED.unpack_from(reader.buffer, 16)[0]
+            alive = (reader.pid != os.getpid() and reader.writer_alive()
+                     and time.time() - updated < STALE_AFTER)
+            return reader.pid if alive else None
+        finally:
+            reader.close()
+
+    @contextmanager
+    def batch(self):
+        """Agrupa várias escritas em uma única publicação (seq ímpar -> par)"""
+        with self._lock:
+            if self._depth == 0:
+                self._seq += 1
+                _SEQ.pack_into(self.buffer, _SEQ_OFFSET, self._seq)
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    _UPDATED.pack_into(self.buffer, 16, time.time())
+                    self._seq += 1
+                    _SEQ.pack_into(self.buffer, _SEQ_OFFSET, self._seq)
+
+    def _slot(self, series):
+        slot = self.index.get(series)
+        if slot is not None:
+            return slot
+        slot = len(self.counts)
+        encoded = series.encode('utf-8')
+        if slot >= self.slots or len(encoded) > _NAME_SIZE:
+            if series not in self._dropped:
+                self._dropped.add(series)
+                reason = (f"nome acima de {_NAME_SIZE} bytes" if len(encoded) > _NAME_SIZE
+                          else f"diretório cheio ({self.slots} séries)")
+                logging.warning(f"⚠️ Série {series} fora da memória compartilhada: {reason}")
+            return None
+        self.index[series] = slot
+        self.counts.append(0)
+        self.heads.append(0)
+        _SLOT.pack_into(self.buffer, _HEADER_SIZE + slot * _SLOT.size, encoded, 0, 0, 0)
+        struct.pack_into('<I', self.buffer, 36, slot + 1)
+        return slot
+
+    def append(self, series, timestamp, value):
+        """Grava um ponto; séries além da capacidade do diretório são ignoradas"""
+        with self.batch():
+            slot = self._slot(series)
+            if slot is None:
+                return False
+            head = self.heads[slot]
+            offset = self._data_offset + (slot * self.capacity + head) * _POINT.size
+            _POINT.pack_into(self.buffer, offset, timestamp, value)
+            self.heads[slot] = (head + 1) % self.capacity
+            self.counts[slot] = min(self.counts[slot] + 1, self.capacity)
+            _SLOT.pack_into(self.buffer, _HEADER_SIZE + slot * _SLOT.size,
+                            series.encode('utf-8'), self.counts[slot], self.heads[slot], 0)
+            return True
+
+    def close(self):
+        """Remove o segmento; leitores já conectados mantêm o mapeamento até fecharem"""
+        self.buffer = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedMetricsReader:
+    """Leitor somente leitura do segmento publicado pelo performance-monitor.py"""
+
+    def __init__(self, name=DEFAULT_NAME):
+        self.name = name
+        self._shm = None
+        path = os.path.join('/dev/shm', name)
+        if os.path.exists(path):
+            # POSIX: mapeamento realmente somente leitura
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                self._map = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+            finally:
+                os.close(fd)
+            self.buffer = memoryview(self._map)
+        else:
+            self._shm = shared_memory.SharedMemory(name)
+            self._untrack()
+            self._map = None
+            self.buffer = self._shm.buf
+
+        magic, version, _, _, self.pid, self.slots, self.capacity, _ = _HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            self.close()
+            raise ValueError(f"Segmento {name} com layout desconhecido")
+        self._data_offset = _HEADER_SIZE + self.slots * _SLOT.size
+
+    def _untrack(self):
+        # Antes do Python 3.13, anexar registra o segmento no resource_tracker,
+        # que o removeria ao fim deste processo (o dono é o escritor)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+        except Exception:
+            pass
+
+    @staticmethod
+    def exists(name=DEFAULT_NAME):
+        """Verifica se há um segmento publicado (sem anexar)"""
+        if os.path.isdir('/dev/shm'):
+            return os.path.exists(os.path.join('/dev/shm', name))
+        try:
+            shm = shared_memory.SharedMemory(name)
+        except (FileNotFoundError, OSError):
+            return False
+        shm.close()
+        return True
+
+    def _copy(self):
+        for _ in range(MAX_READ_RETRIES):
+            seq = _SEQ.unpack_from(self.buffer, _SEQ_OFFSET)[0]
+            if seq & 1:
+                time.sleep(0)
+                continue
+            used = struct.unpack_from('<I', self.buffer, 36)[0]
+            directory = bytes(self.buffer[_HEADER_SIZE:_HEADER_SIZE + used * _SLOT.size])
+            data = bytes(self.buffer[self._data_offset:
+                                     self._data_offset + used * self.capacity * _POINT.size])
+            updated = _UPDATED.unpack_from(self.buffer, 16)[0]
+            if _SEQ.unpack_from(self.buffer, _SEQ_OFFSET)[0] == seq:
+                return updated, used, directory, data
+        raise TimeoutError("Não foi possível obter uma cópia consistente do segmento")
+
+    def snapshot(self):
+        """Retorna (última atualização, {série: [(timestamp, valor), ...]}) em ordem cronológica"""
+        updated, used, directory, data = self._copy()
+        series = {}
+        for slot in range(used):
+            raw_name, count, head, _ = _SLOT.unpack_from(directory, slot * _SLOT.size)
+            name = raw_name.rstrip(b'\0').decode('utf-8')
+            start = (head - count) % self.capacity
+            base = slot * self.capacity
+            points = []
+            for index in range(count):
+                offset = (base + (start + index) % self.capacity) * _POINT.size
+                points.append(_POINT.unpack_from(data, offset))
+            series[name] = points
+        return updated, series
+
+    def writer_alive(self):
+        """O processo escritor ainda existe?"""
+        if os.name == 'nt':
+            return True
+        try:
+            os.kill(self.pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def close(self):
+        self.buffer.release()
+        if self._map is not None:
+            self._map.close()
+        if self._shm is not None:
+            self._shm.close()
@@ -0,0 +1,256 @@
+"""
+SLOs por rota com orçamento de erros e taxas de queima em várias janelas
+Os eventos vêm do fluxo das sondas; cada janela mantém contadores em buckets
+com somas correntes, então nenhum cálculo relê o histórico. Cada evento pesa a
+fração do intervalo base que representa: com a sonda apertada (0,5s em vez de
+10s), um período ruim não conta 20 vezes mais que um bom
+"""
+
+import json
+import logging
+import os
+import time
+from collections import deque
+
+# Janelas das taxas de queima (segundos) e alertas de janela dupla:
+# (nome, janela longa, janela curta, taxa limite); os dois precisam passar do limite
+BURN_WINDOWS = {'5m': 300, '1h': 3600, '6h': 6 * 3600}
+BURN_ALERTS = (
+    ('rápida', '1h', '5m', 14.4),
+    ('lenta', '6h', '1h', 6.0),
+)
+
+# Buckets por janela: a resolução de cada janela é janela / WINDOW_BUCKETS
+WINDOW_BUCKETS = 60
+# Eventos mínimos na janela longa para alertar: no início, um erro isolado é 100% de erros
+MIN_EVENTS = 20
+# Histerese: um alerta ativo só termina quando uma das janelas cai abaixo de CLEAR_RATIO do limite
+CLEAR_RATIO = 0.75
+PERIOD_DAYS = 30
+
+DEFAULT_SLOS = [
+    {'name': 'search-latency', 'probe': 'search', 'objective': 99, 'latency_ms': 300},
+    {'name': 'health-availability', 'probe': 'health', 'objective': 99.9},
+]
+
+
+class SLO:
+    """
+    Objetivo de uma rota: `objective`% das sondas boas no período.
+
+    Sem `latency_ms`, boa é a sonda com o status esperado (disponibilidade); com ele,
+    a sonda também precisa responder dentro do tempo. A rota é escolhida pelo nome
+    da sonda (`probe`) ou pelo prefixo do caminho (`route`).
+    """
+
+    def __init__(self, name, objective, probe=None, route=None, latency_ms=None,
+                 period_days=PERIOD_DAYS):
+        if not probe and not route:
+            raise ValueError(f"SLO {name}: informe 'probe' ou 'route'")
+        self.name = name
+        self.objective = objective
+        self.probe = probe
+        self.route = route
+        self.latency_ms = latency_ms
+        self.period_days = period_days
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    @property
+    def budget(self):
+        """Fração de eventos ruins permitida (ex.: 0.001 para 99.9%)"""
+        return 1 - self.objective / 100
+
+    def matches(self, probe):
+        if self.probe:
+            return probe.name == self.probe
+        return probe.path.split('?', 1)[0].startswith(self.route)
+
+    def is_good(self, result):
+        if not result.ok:
+            return False
+        return self.latency_ms is None or result.response_time <= self.latency_ms
+
+
+def load_slos(path=None):
+    """Carrega os SLOs de um arquivo JSON ou usa os padrão"""
+    path = path or os.environ.get('BOOKVERSE_SLOS', 'slos.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            definitions = json.load(f)
+    else:
+        definitions = DEFAULT_SLOS
+    return [SLO.from_dict(definition) for definition in definitions]
+
+
+class WindowCounter:
+    """
+    Eventos bons/totais numa janela deslizante, em `buckets` fatias de tempo.
+
+    As somas da janela são atualizadas ao entrar e ao expirar cada fatia:
+    O(1) amortizado por evento, memória fixa.
+    """
+
+    __slots__ = ('window', 'resolution', 'buckets', 'good', 'total')
+
+    def __init__(self, window, buckets=WINDOW_BUCKETS):
+        self.window = window
+        self.resolution = window / buckets
+        self.buckets = deque()
+        self.good = 0
+        self.total = 0
+
+    def _expire(self, now):
+        oldest = int(now // self.resolution) - int(self.window // self.resolution) + 1
+        while self.buckets and self.buckets[0][0] < oldest:
+            _, good, total = self.buckets.popleft()
+            self.good -= good
+            self.total -= total
+
+    def add(self, timestamp, good, weight=1.0):
+        index = int(timestamp // self.resolution)
+        if not self.buckets or self.buckets[-1][0] != index:
+            self.buckets.append([index, 0, 0])
+        bucket = self.buckets[-1]
+        if good:
+            bucket[1] += weight
+            self.good += weight
+        bucket[2] += weight
+        self.total += weight
+        self._expire(timestamp)
+
+    def error_rate(self, now):
+        self._expire(now)
+        return (self.total - self.good) / self.total if self.total else 0.0
+
+    def state(self):
+        return {'resolution': self.resolution, 'buckets': list(self.buckets)}
+
+    def restore(self, state, now):
+        # Janela com outra resolução (SLO alterado): os índices não valem mais
+        if not state or state.get('resolution') != self.resolution:
+            return
+        self.buckets = deque(list(bucket) for bucket in state['buckets'])
+        self.good = sum(bucket[1] for bucket in self.buckets)
+        self.total = sum(bucket[2] for bucket in self.buckets)
+        self._expire(now)
+
+
+class SLOTracker:
+    """Orçamento de erros e taxas de queima de um SLO"""
+
+    def __init__(self, slo):
+        self.slo = slo
+        self.windows = {name: WindowCounter(seconds) for name, seconds in BURN_WINDOWS.items()}
+        # Período do orçamento em buckets de 1 hora (30 dias = 720 buckets)
+        self.period = WindowCounter(slo.period_days * 86400, slo.period_days * 24)
+        self.alerts = set()
+
+    def record(self, timestamp, good, weight=1.0):
+        for counter in self.windows.values():
+            counter.add(timestamp, good, weight)
+        self.period.add(timestamp, good, weight)
+
+    def burn_rates(self, now):
+        """Taxa de queima por janela: 1 consome o orçamento exatamente no fim do período"""
+        return {
+            name: counter.error_rate(now) / self.slo.budget if self.slo.budget else 0.0
+            for name, counter in self.windows.items()
+        }
+
+    def evaluate(self, now):
+        """Retorna (alertas que começaram, alertas que terminaram)"""
+        rates = self.burn_rates(now)
+        firing = set()
+        for name, long, short, limit in BURN_ALERTS:
+            if name in self.alerts:
+                limit *= CLEAR_RATIO
+            elif self.windows[long].total < MIN_EVENTS:
+                continue
+            if rates[long] >= limit and rates[short] >= limit:
+                firing.add(name)
+        started, ended = firing - self.alerts, self.alerts - firing
+        self.alerts = firing
+        return started, ended, rates
+
+    def status(self, now):
+        period = self.period
+        period.error_rate(now)
+        bad = period.total - period.good
+        allowed = period.total * self.slo.budget
+        return {
+            'objective': self.slo.objective,
+            'latency_ms': self.slo.latency_ms,
+            'period_days': self.slo.period_days,
+            'events': round(period.total, 2),
+            'bad_events': round(bad, 2),
+            'compliance': period.good / period.total * 100 if period.total else None,
+            'budget_consumed': bad / allowed if allowed else None,
+            'burn_rates': self.burn_rates(now),
+            'alerts': sorted(self.alerts),
+        }
+
+
+class SLOEngine:
+    """
+    Avalia os SLOs a partir dos resultados das sondas.
+
+    record() é chamado para cada resultado; alertas de queima começam e terminam
+    com mensagens no log. O estado (buckets) pode ser salvo para sobreviver a reinícios.
+    """
+
+    def __init__(self, slos, path=None):
+        self.trackers = [SLOTracker(slo) for slo in slos]
+        self.path = path
+        if path:
+            self.load()
+
+    def record(self, result):
+        for tracker in self.trackers:
+            if not tracker.slo.matches(result.probe):
+                continue
+            tracker.record(result.timestamp, tracker.slo.is_good(result), result.weight)
+            started, ended, rates = tracker.evaluate(result.timestamp)
+            for alert in started:
+                logging.warning(
+                    f"🔥 SLO {tracker.slo.name}: queima {alert} do orçamento "
+                    f"({', '.join(f'{name} {rate:.1f}x' for name, rate in rates.items())})"
+                )
+            for alert in ended:
+                logging.info(f"✅ SLO {tracker.slo.name}: queima {alert} encerrada")
+
+    def summary(self, now=None):
+        now = time.time() if now is None else now
+        return {tracker.slo.name: tracker.status(now) for tracker in self.trackers}
+
+    def save(self):
+        if not self.path:
+            return
+        state = {
+            tracker.slo.name: {
+                'windows': {name: counter.state() for name, counter in tracker.windows.items()},
+                'period': tracker.period.state(),
+            }
+            for tracker in self.trackers
+        }
+        temp_file = f'{self.path}.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_file, self.path)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for tracker in self.trackers:
+            saved = state.get(tracker.slo.name)
+            if not saved:
+                continue
+            for name, counter in tracker.windows.items():
+                counter.restore(saved['windows'].get(name), now)
+            tracker.period.restore(saved.get('period'), now)
@@ -0,0 +1,202 @@
+"""
+Renderização diferencial de painéis no terminal
+Mantém a tela anterior em memória e reescreve só as células que mudaram,
+usando endereçamento de cursor na tela alternativa
+"""
+
+import os
+import re
+import shutil
+import sys
+import unicodedata
+
+_SGR = re.compile(r'(\x1b\[[0-9;]*m)')
+_VARIATION_SELECTOR = '️'
+
+# Sequências de controle (xterm/VT100)
+ALT_SCREEN_ON = '\x1b[?1049h'
+ALT_SCREEN_OFF = '\x1b[?1049l'
+HIDE_CURSOR = '\x1b[?25l'
+SHOW_CURSOR = '\x1b[?25h'
+CLEAR_SCREEN = '\x1b[2J'
+CLEAR_LINE_END = '\x1b[K'
+RESET_STYLE = '\x1b[0m'
+
+# Células iguais entre duas alterações que ainda compensam reescrever,
+# em vez de pagar outro posicionamento de cursor (~8 bytes)
+MAX_GAP = 6
+
+
+def _char_width(char):
+    if unicodedata.category(char) in ('Mn', 'Me', 'Cf'):
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+
+def display_width(text):
+    """Largura do texto no terminal (emojis ocupam 2 colunas, acentos combinantes 0)"""
+    return len(to_cells(text))
+
+
+def to_cells(line):
+    """
+    Converte uma linha em células de terminal: (texto, estilo) por coluna.
+
+    Caracteres largos ocupam a célula seguinte com None; caracteres de largura
+    zero são anexados à célula anterior. Sequências SGR viram o estilo das células.
+    """
+    cells = []
+    style = ''
+    for token in _SGR.split(line):
+        if not token:
+            continue
+        if token.startswith('\x1b['):
+            style = '' if token in (RESET_STYLE, '\x1b[m') else style + token
+            continue
+        for char in token:
+            if char == _VARIATION_SELECTOR and cells:
+                # Seletor de variação: o símbolo anterior passa a ser exibido como emoji
+                index = len(cells) - 1 if cells[-1] is not None else len(cells) - 2
+                text, cell_style = cells[index]
+                cells[index] = (text + char, cell_style)
+                if index == len(cells) - 1:
+                    cells.append(None)
+                continue
+            width = _char_width(char)
+            if width == 0:
+                if cells:
+                    index = len(cells) - 1 if cells[-1] is not None else len(cells) - 2
+                    cells[index] = (cells[index][0] + char, cells[index][1])
+                continue
+            cells.append((char, style))
+            if width == 2:
+                cells.append(None)
+    return cells
+
+
+def _clip(cells, columns):
+    # Não deixa meio caractere largo na última coluna
+    if len(cells) > columns and cells[columns] is None:
+        return cells[:columns - 1]
+    return cells[:columns]
+
+
+def truncate(text, width):
+    """Corta o texto (sem estilos) para caber em `width` colunas, terminando em reticências"""
+    cells = to_cells(text)
+    if len(cells) <= width:
+        return text
+    return ''.join(cell[0] for cell in _clip(cells, width - 1) if cell is not None) + '…'
+
+
+def supports_ansi(stream):
+    """Verifica se o terminal aceita endereçamento de cursor"""
+    if not hasattr(stream, 'isatty') or not stream.isatty():
+        return False
+    return os.environ.get('TERM', 'dumb' if os.name != 'nt' else '') != 'dumb'
+
+
+class TerminalRenderer:
+    """
+    Desenha quadros de texto reescrevendo apenas as células alteradas.
+
+    Em terminais sem suporte (TERM=dumb, saída redirecionada) cai para o modo
+    simples: cada quadro diferente do anterior é impresso inteiro, sem limpar a tela.
+    """
+
+    def __init__(self, stream=None, force_plain=False):
+        self.stream = stream or sys.stdout
+        self.ansi = not force_plain and supports_ansi(self.stream)
+        self.screen = []
+        self.size = None
+        self.frame_bytes = 0
+        self._last_frame = None
+        self._active = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """Entra na tela alternativa e esconde o cursor"""
+        if self.ansi and not self._active:
+            self._write(ALT_SCREEN_ON + HIDE_CURSOR + CLEAR_SCREEN)
+            self._active = True
+
+    def stop(self):
+        """Restaura a tela original do terminal"""
+        if self._active:
+            self._write(RESET_STYLE + SHOW_CURSOR + ALT_SCREEN_OFF)
+            self._active = False
+
+    def _write(self, data):
+        self.stream.write(data)
+        self.stream.flush()
+        return len(data.encode('utf-8', 'replace'))
+
+    def draw(self, frame):
+        """Desenha um quadro; retorna o número de bytes escritos"""
+        if not self.ansi:
+            if frame == self._last_frame:
+                self.frame_bytes = 0
+            else:
+                self.frame_bytes = self._write(frame + '\n')
+                self._last_frame = frame
+            return self.frame_bytes
+
+        size = shutil.get_terminal_size()
+        output = []
+        if size != self.size:
+            # Redimensionado (ou primeiro quadro): redesenha tudo
+            output.append(CLEAR_SCREEN)
+            self.screen = []
+            self.size = size
+
+        lines = [_clip(to_cells(line), size.columns) for line in frame.split('\n')[:size.lines]]
+
+        for y in range(max(len(lines), len(self.screen))):
+            new = lines[y] if y < len(lines) else []
+            old = self.screen[y] if y < len(self.screen) else []
+            if new != old:
+                output.append(self._diff_line(y, old, new))
+
+        self.screen = lines
+        self.frame_bytes = self._write(''.join(output)) if output else 0
+        return self.frame_bytes
+
+    @staticmethod
+    def _diff_line(y, old, new):
+        changed = [x for x in range(len(new)) if x >= len(old) or old[x] != new[x]]
+        runs = []
+        for x in changed:
+            if runs and x - runs[-1][1] <= MAX_GAP:
+                runs[-1][1] = x
+            else:
+                runs.append([x, x])
+
+        output = []
+        for start, end in runs:
+            # Placeholder de caractere largo: reescreve a partir do próprio caractere
+            if new[start] is None:
+                start -= 1
+            if end + 1 < len(new) and new[end + 1] is None:
+                end += 1
+            output.append(f'\x1b[{y + 1};{start + 1}H')
+            style = ''
+            for cell in new[start:end + 1]:
+                if cell is None:
+                    continue
+                text, cell_style = cell
+                if cell_style != style:
+                    output.append(RESET_STYLE + cell_style)
+                    style = cell_style
+                output.append(text)
+            if style:
+                output.append(RESET_STYLE)
+
+        if len(new) < len(old):
+            output.append(f'\x1b[{y + 1};{len(new) + 1}H{CLEAR_LINE_END}')
+        return ''.join(output)
@@ -0,0 +1,442 @@
+"""
+Armazenamento de séries temporais em disco (append-only, segmentado)
+Timestamps em delta-of-delta e valores em XOR (compressão estilo Gorilla)
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import threading
+import zlib
+from urllib.parse import quote, unquote
+
+MAGIC = 0x53545642  # 'BVTS'
+BLOCK_HEADER = struct.Struct('<IIIIqq')  # magic, crc32, tamanho, pontos, t_min, t_max
+SEGMENT_SUFFIX = '.seg'
+
+DEFAULT_BLOCK_SIZE = 256
+DEFAULT_SEGMENT_DURATION = 24 * 3600
+
+_DOUBLE = struct.Struct('<d')
+_UINT64 = struct.Struct('<Q')
+
+
+def _float_bits(value):
+    return _UINT64.unpack(_DOUBLE.pack(value))[0]
+
+
+def _bits_float(bits):
+    return _DOUBLE.unpack(_UINT64.pack(bits))[0]
+
+
+def _signed(value, nbits):
+    return value - (1 << nbits) if value >= 1 << (nbits - 1) else value
+
+
+class BitWriter:
+    """Acumula bits em um inteiro e exporta como bytes big-endian"""
+
+    def __init__(self):
+        self.value = 0
+        self.bits = 0
+
+    def write(self, value, nbits):
+        self.value = (self.value << nbits) | (value & ((1 << nbits) - 1))
+        self.bits += nbits
+
+    def to_bytes(self):
+        padding = -self.bits % 8
+        return (self.value << padding).to_bytes((self.bits + padding) // 8, 'big')
+
+
+class BitReader:
+    """Lê bits sequencialmente de um buffer big-endian"""
+
+    def __init__(self, data):
+        self.value = int.from_bytes(data, 'big')
+        self.total = len(data) * 8
+        self.position = 0
+
+    def read(self, nbits):
+        self.position += nbits
+        return (self.value >> (self.total - self.position)) & ((1 << nbits) - 1)
+
+
+# Faixas do delta-of-delta: (prefixo, bits do prefixo, bits do valor)
+_DOD_BUCKETS = ((0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12))
+
+
+def encode_block(points):
+    """Codifica [(timestamp_ms, valor)] em um bloco comprimido"""
+    writer = BitWriter()
+    first_time, first_value = points[0]
+    writer.write(first_time, 64)
+    previous_bits = _float_bits(first_value)
+    writer.write(previous_bits, 64)
+
+    previous_time = first_time
+    previous_delta = 0
+    previous_leading = previous_trailing = None
+
+    for timestamp, value in points[1:]:
+        delta = timestamp - previous_time
+        dod = delta - previous_delta
+        if dod == 0:
+            writer.write(0, 1)
+        else:
+            for prefix, prefix_bits, value_bits in _DOD_BUCKETS:
+                limit = 1 << (value_bits - 1)
+                if -limit <= dod < limit:
+                    writer.write(prefix, prefix_bits)
+                    writer.write(dod, value_bits)
+                    break
+            else:
+                writer.write(0b1111, 4)
+                writer.write(dod, 64)
+        previous_time, previous_delta = timestamp, delta
+
+        bits = _float_bits(value)
+        xor = bits ^ previous_bits
+        previous_bits = bits
+        if xor == 0:
+            writer.write(0, 1)
+            continue
+
+        leading = min(64 - xor.bit_length(), 31)
+        trailing = (xor & -xor).bit_length() - 1
+        if (previous_leading is not None
+                and leading >= previous_leading and trailing >= previous_trailing):
+            writer.write(0b10, 2)
+            writer.write(xor >> previous_trailing, 64 - previous_leading - previous_trailing)
+        else:
+            significant = 64 - leading - trailing
+            writer.write(0b11, 2)
+            writer.write(leading, 5)
+            writer.write(significant - 1, 6)
+            writer.write(xor >> trailing, significant)
+            previous_leading, previous_trailing = leading, trailing
+
+    return writer.to_bytes()
+
+
+def decode_block(payload, count):
+    """Decodifica um bloco em uma lista de (timestamp_ms, valor)"""
+    reader = BitReader(payload)
+    timestamp = _signed(reader.read(64), 64)
+    bits = reader.read(64)
+    points = [(timestamp, _bits_float(bits))]
+
+    delta = 0
+    leading = trailing = 0
+    for _ in range(count - 1):
+        if reader.read(1):
+            for prefix_bits, value_bits in ((1, 7), (1, 9), (1, 12)):
+                if not reader.read(prefix_bits):
+                    delta += _signed(reader.read(value_bits), value_bits)
+                    break
+            else:
+                delta += _signed(reader.read(64), 64)
+        timestamp += delta
+
+        if reader.read(1):
+            if reader.read(1):
+                leading = reader.read(5)
+                significant = reader.read(6) + 1
+                trailing = 64 - leading - significant
+            bits ^= reader.read(64 - leading - trailing) << trailing
+        points.append((timestamp, _bits_float(bits)))
+
+    return points
+
+
+class _Block:
+    __slots__ = ('t_min', 't_max', 'offset', 'length', 'count', 'crc')
+
+    def __init__(self, t_min, t_max, offset, length, count, crc):
+        self.t_min = t_min
+        self.t_max = t_max
+        self.offset = offset
+        self.length = length
+        self.count = count
+        self.crc = crc
+
+
+class _Segment:
+    """
+    Arquivo de segmento: sequência de blocos com cabeçalho e CRC.
+
+    O índice de blocos só é montado no primeiro acesso (leitura ou escrita), então
+    abrir uma série com muitos segmentos não toca nos que a consulta não usa.
+    """
+
+    def __init__(self, path, readonly):
+        self.path = path
+        self.start = int(os.path.basename(path)[:-len(SEGMENT_SUFFIX)])
+        self.readonly = readonly
+        self.blocks = []
+        self._prefix_max = []
+        self._size = 0
+        self._indexed = False
+        self._map = None
+        self._mapped_size = 0
+
+    @property
+    def size(self):
+        self._scan()
+        return self._size
+
+    def _scan(self):
+        """
+        Monta o índice percorrendo só os cabeçalhos pelo mmap, saltando cada payload
+        pelo tamanho. O CRC de cada bloco é conferido na leitura; ao abrir para escrita,
+        só o do último bloco, que é o que uma queda pode ter deixado pela metade
+        """
+        if self._indexed:
+            return
+        self._indexed = True
+        file_size = os.path.getsize(self.path)
+        offset = 0
+        if file_size:
+            with open(self.path, 'rb') as f:
+                view = mmap.mmap(f.fileno(), file_size, access=mmap.ACCESS_READ)
+            try:
+                while offset + BLOCK_HEADER.size <= file_size:
+                    magic, crc, length, count, t_min, t_max = BLOCK_HEADER.unpack_from(view, offset)
+                    end = offset + BLOCK_HEADER.size + length
+                    if magic != MAGIC or end > file_size:
+                        break
+                    self._index(_Block(t_min, t_max, offset, length, count, crc))
+                    offset = end
+                if not self.readonly and self.blocks and not self._valid(self.blocks[-1], view):
+                    offset = self.blocks[-1].offset
+                    self.blocks.pop()
+                    self._prefix_max.pop()
+            finally:
+                view.close()
+
+        self._size = offset
+        # Bloco incompleto no final (queda durante a escrita): descarta
+        if offset < file_size and not self.readonly:
+            os.truncate(self.path, offset)
+
+    @staticmethod
+    def _valid(block, view):
+        payload_start = block.offset + BLOCK_HEADER.size
+        return zlib.crc32(view[payload_start:payload_start + block.length]) == block.crc
+
+    def _index(self, block):
+        self.blocks.append(block)
+        previous = self._prefix_max[-1] if self._prefix_max else block.t_max
+        self._prefix_max.append(max(previous, block.t_max))
+
+    def add_block(self, block):
+        self._scan()
+        self._index(block)
+        self._size = block.offset + BLOCK_HEADER.size + block.length
+
+    def _view(self):
+        if self._map is None or self._mapped_size < self.size:
+            if self._map is not None:
+                self._map.close()
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), self.size, access=mmap.ACCESS_READ)
+            self._mapped_size = self.size
+        return self._map
+
+    def read(self, start, end):
+        self._scan()
+        if not self.blocks:
+            return
+        view = self._view()
+        first = bisect.bisect_left(self._prefix_max, start)
+        for block in self.blocks[first:]:
+            if block.t_max < start or block.t_min > end:
+                continue
+            payload_start = block.offset + BLOCK_HEADER.size
+            payload = view[payload_start:payload_start + block.length]
+            if zlib.crc32(payload) != block.crc:
+                # Bloco corrompido: os demais do segmento continuam legíveis
+                continue
+            for timestamp, value in decode_block(payload, block.count):
+                if start <= timestamp <= end:
+                    yield timestamp, value
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+class _Series:
+    def __init__(self, directory, block_size, segment_duration, fsync, readonly):
+        self.directory = directory
+        self.block_size = block_size
+        self.segment_duration = segment_duration
+        self.fsync = fsync
+        self.readonly = readonly
+        self.pending = []
+        self._fd = None
+        self._active = None
+
+        self.segments = []
+        if os.path.isdir(directory):
+            names = [n for n in os.listdir(directory) if n.endswith(SEGMENT_SUFFIX)]
+            self.segments = sorted(
+                (_Segment(os.path.join(directory, n), readonly) for n in names),
+                key=lambda segment: segment.start
+            )
+        self._starts = [segment.start for segment in self.segments]
+
+    def _segment_start(self, timestamp):
+        return timestamp - timestamp % self.segment_duration
+
+    def append(self, timestamp, value):
+        if self.pending and (
+            self._segment_start(timestamp) != self._segment_start(self.pending[0][0])
+        ):
+            self.flush()
+        self.pending.append((timestamp, value))
+        if len(self.pending) >= self.block_size:
+            self.flush()
+
+    def _segment_for(self, start):
+        index = bisect.bisect_left(self._starts, start)
+        if index < len(self._starts) and self._starts[index] == start:
+            return self.segments[index]
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{start}{SEGMENT_SUFFIX}")
+        open(path, 'ab').close()
+        segment = _Segment(path, self.readonly)
+        self.segments.insert(index, segment)
+        self._starts.insert(index, start)
+        return segment
+
+    def flush(self):
+        if not self.pending or self.readonly:
+            return
+
+        segment = self._segment_for(self._segment_start(self.pending[0][0]))
+        if self._active is not segment:
+            if self._fd is not None:
+                os.close(self._fd)
+            self._fd = os.open(segment.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._active = segment
+
+        payload = encode_block(self.pending)
+        times = [timestamp for timestamp, _ in self.pending]
+        block = _Block(min(times), max(times), segment.size, len(payload), len(self.pending),
+                       zlib.crc32(payload))
+        header = BLOCK_HEADER.pack(
+            MAGIC, block.crc, block.length, block.count, block.t_min, block.t_max
+        )
+        # Uma única escrita por bloco: um bloco parcial é descartado na reabertura
+        os.write(self._fd, header + payload)
+        if self.fsync:
+            os.fsync(self._fd)
+        segment.add_block(block)
+        self.pending = []
+
+    def read(self, start, end):
+        # Último segmento iniciado até `start`: não depende da duração com que foi gravado
+        first = max(0, bisect.bisect_right(self._starts, start) - 1)
+        for segment in self.segments[first:]:
+            if segment.start > end:
+                break
+            yield from segment.read(start, end)
+        for timestamp, value in self.pending:
+            if start <= timestamp <= end:
+                yield timestamp, value
+
+    def drop_before(self, timestamp):
+        """Remove segmentos inteiramente anteriores a `timestamp`"""
+        while len(self.segments) > 1 and self._starts[1] <= self._segment_start(timestamp):
+            segment = self.segments.pop(0)
+            self._starts.pop(0)
+            if segment is self._active:
+                os.close(self._fd)
+                self._fd = self._active = None
+            segment.close()
+            os.remove(segment.path)
+
+    def close(self):
+        self.flush()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = self._active = None
+        for segment in self.segments:
+            segment.close()
+
+
+class TimeSeriesStore:
+    """
+    Base de séries temporais append-only.
+
+    Cada série fica em um diretório com segmentos de duração fixa; cada segmento
+    é uma sequência de blocos comprimidos com CRC. Leituras por intervalo usam
+    busca binária nos segmentos e blocos e leem os dados via mmap.
+    """
+
+    def __init__(self, path='metrics', block_size=DEFAULT_BLOCK_SIZE,
+                 segment_duration=DEFAULT_SEGMENT_DURATION, fsync=False, readonly=False):
+        self.path = path
+        self.block_size = block_size
+        self.segment_duration = int(segment_duration * 1000)
+        self.fsync = fsync
+        self.readonly = readonly
+        self._series = {}
+        self._lock = threading.Lock()
+        if not readonly:
+            os.makedirs(path, exist_ok=True)
+
+    def _get(self, name):
+        series = self._series.get(name)
+        if series is None:
+            series = _Series(
+                os.path.join(self.path, quote(name, safe='')), self.block_size,
+                self.segment_duration, self.fsync, self.readonly
+            )
+            self._series[name] = series
+        return series
+
+    def append(self, name, timestamp, value):
+        """Adiciona um ponto (timestamp em segundos) à série"""
+        with self._lock:
+            self._get(name).append(int(timestamp * 1000), float(value))
+
+    def read(self, name, start=None, end=None):
+        """Retorna [(timestamp_s, valor)] da série no intervalo [start, end]"""
+        start_ms = int(start * 1000) if start is not None else -(1 << 62)
+        end_ms = int(end * 1000) if end is not None else 1 << 62
+        with self._lock:
+            points = list(self._get(name).read(start_ms, end_ms))
+        return [(timestamp / 1000, value) for timestamp, value in points]
+
+    def series_names(self):
+        """Lista as séries existentes no disco ou em memória"""
+        names = set(self._series)
+        if os.path.isdir(self.path):
+            # Diretórios iniciados por '@' guardam os rollups (ver rollup.py)
+            names.update(
+                unquote(entry) for entry in os.listdir(self.path)
+                if not entry.startswith('@') and os.path.isdir(os.path.join(self.path, entry))
+            )
+        return sorted(names)
+
+    def flush(self):
+        """Grava em disco os pontos pendentes de todas as séries"""
+        with self._lock:
+            for series in self._series.values():
+                series.flush()
+
+    def drop_before(self, name, timestamp):
+        """Aplica retenção: remove segmentos antigos de uma série"""
+        with self._lock:
+            self._get(name).drop_before(int(timestamp * 1000))
+
+    def close(self):
+        with self._lock:
+            for series in self._series.values():
+                series.close()
+            self._series.clear()
@@ -0,0 +1,195 @@
+"""
+Métricas por processo dos workers Node do BookVerse
+Descobre os workers (árvore do PM2 ou linha de comando) e reaproveita os handles do psutil
+"""
+
+import os
+import re
+import time
+
+import psutil
+
+# Scripts do servidor reconhecidos fora do PM2
+SERVER_SCRIPT = re.compile(r'server[\w-]*\.js$')
+
+# Intervalo mínimo entre redescobertas completas (segundos)
+DISCOVERY_INTERVAL = 30
+
+
+def find_services():
+    """Verifica se nginx e o daemon do PM2 estão rodando"""
+    services = {'nginx': False, 'pm2': False}
+    for process in psutil.process_iter(['name', 'cmdline']):
+        name = (process.info['name'] or '').lower()
+        cmdline = process.info['cmdline'] or ['']
+        if name.startswith('nginx'):
+            services['nginx'] = True
+        elif cmdline and cmdline[0].startswith('PM2 v'):
+            services['pm2'] = True
+    return services
+
+
+class NodeWorker:
+    """Handle persistente de um worker e o estado da amostra anterior"""
+
+    def __init__(self, label, process):
+        self.label = label
+        self.process = process
+        self.pid = process.pid
+        self._previous = None
+
+        # Primeira chamada de cpu_percent só inicializa a referência
+        process.cpu_percent(None)
+
+    def sample(self):
+        """Coleta CPU, RSS, FDs, threads, trocas de contexto/s e I/O/s"""
+        process = self.process
+        now = time.monotonic()
+        with process.oneshot():
+            cpu = process.cpu_percent(None)
+            rss = process.memory_info().rss
+            threads = process.num_threads()
+            fds = process.num_fds() if hasattr(process, 'num_fds') else process.num_handles()
+            switches = process.num_ctx_switches()
+            switches = switches.voluntary + switches.involuntary
+            try:
+                io = process.io_counters()
+                read_bytes, write_bytes = io.read_bytes, io.write_bytes
+            except (psutil.AccessDenied, AttributeError):
+                read_bytes = write_bytes = 0
+
+        sample = {
+            'cpu': cpu,
+            'rss': rss,
+            'fds': fds,
+            'threads': threads,
+            'ctx_switches': 0.0,
+            'read_bytes': 0.0,
+            'write_bytes': 0.0,
+        }
+        if self._previous:
+            elapsed = max(now - self._previous[0], 1e-6)
+            sample['ctx_switches'] = (switches - self._previous[1]) / elapsed
+            sample['read_bytes'] = (read_bytes - self._previous[2]) / elapsed
+            sample['write_bytes'] = (write_bytes - self._previous[3]) / elapsed
+        self._previous = (now, switches, read_bytes, write_bytes)
+        return sample
+
+
+class WorkerCollector:
+    """
+    Descobre os workers Node do BookVerse e amostra cada um.
+
+    Sob PM2, os workers são os filhos do daemon (God Daemon) e recebem o rótulo
+    `<name>-<pm_id>`, estável entre reinícios. Fora do PM2, os processos são
+    encontrados pela linha de comando e rotulados como `<script>#<n>`, reutilizando
+    o menor número livre quando um processo é substituído.
+    """
+
+    def __init__(self, discovery_interval=DISCOVERY_INTERVAL):
+        self.discovery_interval = discovery_interval
+        self.workers = {}
+        self._daemon = None
+        self._last_discovery = None
+
+    def _find_pm2_daemon(self):
+        if self._daemon is not None and self._daemon.is_running():
+            return self._daemon
+        self._daemon = None
+        for process in psutil.process_iter(['name', 'cmdline']):
+            cmdline = process.info['cmdline'] or []
+            if cmdline and cmdline[0].startswith('PM2 v') and 'God Daemon' in cmdline[0]:
+                self._daemon = process
+                break
+        return self._daemon
+
+    @staticmethod
+    def _is_node(process):
+        try:
+            return 'node' in process.name().lower()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return False
+
+    @staticmethod
+    def _pm2_label(process):
+        try:
+            env = process.environ()
+        except (psutil.AccessDenied, psutil.NoSuchProcess, OSError):
+            return None
+        if 'pm_id' in env:
+            return f"{env.get('name', 'node')}-{env['pm_id']}"
+        return None
+
+    def _candidates(self):
+        """Lista (rótulo, processo); rótulo é o prefixo `<script>#` fora do PM2"""
+        daemon = self._find_pm2_daemon()
+        if daemon is not None:
+            try:
+                children = [p for p in daemon.children() if self._is_node(p)]
+            except psutil.NoSuchProcess:
+                children = []
+            labelled = [(self._pm2_label(p), p) for p in children]
+            if any(label for label, _ in labelled):
+                return [(label, p) for label, p in labelled if label]
+
+        # Sem PM2 (ou ambiente ilegível): casa pelo script na linha de comando
+        candidates = []
+        for process in psutil.process_iter(['name', 'cmdline', 'create_time']):
+            cmdline = process.info['cmdline'] or []
+            if 'node' not in (process.info['name'] or '').lower():
+                continue
+            scripts = [os.path.basename(arg) for arg in cmdline[1:] if SERVER_SCRIPT.search(arg)]
+            if scripts:
+                candidates.append((f"{scripts[0]}#", process))
+        candidates.sort(key=lambda candidate: candidate[1].info['create_time'])
+        return candidates
+
+    def discover(self):
+        """Atualiza a lista de workers mantendo os handles e rótulos de PIDs já conhecidos"""
+        known = {worker.pid: worker for worker in self.workers.values()}
+        current = {}
+        new = []
+        for label, process in self._candidates():
+            worker = known.get(process.pid)
+            if worker is not None and (worker.label == label or
+                                       (label.endswith('#') and worker.label.startswith(label))):
+                current[worker.label] = worker
+            else:
+                new.append((label, process))
+
+        for label, process in new:
+            if label.endswith('#'):
+                index = 0
+                while f"{label}{index}" in current:
+                    index += 1
+                label = f"{label}{index}"
+            try:
+                current[label] = NodeWorker(label, process)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+
+        self.workers = current
+        self._last_discovery = time.monotonic()
+        return self.workers
+
+    def sample(self):
+        """Retorna {rótulo: amostra} de todos os workers vivos"""
+        if (self._last_discovery is None
+                or time.monotonic() - self._last_discovery >= self.discovery_interval):
+            self.discover()
+
+        samples = {}
+        lost = False
+        for label, worker in list(self.workers.items()):
+            try:
+                samples[label] = worker.sample()
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                del self.workers[label]
+                lost = True
+            except psutil.AccessDenied:
+                continue
+
+        # Worker reiniciado pelo PM2: redescobre para pegar o novo PID com o mesmo rótulo
+        if lost:
+            self.discover()
+        return samples
@@ -219,6 +219,12 @@ module.exports = {
         self.log("Criando configuração Nginx otimizada...")
         
         nginx_config = '''# BookVerse - Configuração Nginx Otimizada
+
+# combined + $request_time, $upstream_response_time e $msec: usados por manage.py replay
+log_format bookverse_timed '$remote_addr - $remote_user [$time_local] "$request" '
+                           '$status $body_bytes_sent "$http_referer" "$http_user_agent" '
+                           '$request_time $upstream_response_time $msec';
+
 server {
     listen 80;
     server_name _;
@@ -296,7 +302,7 @@ server {
     }
     
     # Logs otimizados
-    access_log /var/log/nginx/bookverse_access.log combined buffer=16k flush=2m;
+    access_log /var/log/nginx/bookverse_access.log bookverse_timed buffer=16k flush=2m;
     error_log /var/log/nginx/bookverse_error.log warn;
 }'''
         
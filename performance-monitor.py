@@ -4,15 +4,37 @@ Monitor de Performance Avançado
 Monitora métricas de performance em tempo real
 """
 
+import argparse
+import asyncio
 import time
 import psutil
-import requests
 import json
+import signal
 import subprocess
 import os
 from datetime import datetime
-import threading
 import logging
+from collections import deque
+
+from monitoring import (
+    PHASES, AggregateEngine, ProbeEngine, RingBuffer, RollupManager, TimeSeriesStore,
+    load_probes
+)
+from monitoring.adaptive import CpuBudget, Baselines
+from monitoring.anomaly import AnomalyDetector
+from monitoring.leaks import LeakTracker, format_hours, pm2_memory_limit
+from monitoring.netstats import (
+    DEFAULT_PORTS, NIC_COUNTERS, TCP_STATES, NetworkRateCollector, port_states
+)
+from monitoring.push import (
+    DEFAULT_PORT as PUSH_PORT, PushAgent, PushAggregator, parse_address
+)
+from monitoring.scenarios import ScenarioProbes, load_scenarios
+from monitoring.scheduler import Scheduler
+from monitoring.selfstats import ProcessUsage, SamplingProfiler, Spans
+from monitoring.slo import SLOEngine, load_slos
+from monitoring.shm import DEFAULT_NAME as SHARED_NAME, SharedMetricsWriter
+from monitoring.workers import WorkerCollector, find_services
 
 # Configuração de logging
 logging.basicConfig(
@@ -24,181 +46,586 @@ logging.basicConfig(
     ]
 )
 
+# Intervalos de coleta (segundos)
+SYSTEM_INTERVAL = 5
+WORKER_INTERVAL = 5
+NETWORK_INTERVAL = 1
+REPORT_INTERVAL = 300
+
+# Intervalos rápidos usados quando uma série foge da linha de base (amostragem adaptativa)
+SYSTEM_FAST_INTERVAL = 0.5
+WORKER_FAST_INTERVAL = 1
+NETWORK_FAST_INTERVAL = 0.25
+SELF_INTERVAL = 5
+# Disco e serviços (nginx, PM2) para os painéis; só publicados na memória compartilhada
+HOST_INTERVAL = 30
+
+# Campos amostrados por worker Node
+WORKER_FIELDS = ('cpu', 'rss', 'fds', 'threads', 'ctx_switches', 'read_bytes', 'write_bytes')
+
+# Custo do próprio monitor e de cada coletor (ms)
+SELF_FIELDS = ('cpu', 'rss', 'threads')
+COLLECTOR_FIELDS = ('lag', 'duration', 'interval')
+
+# Regras da detecção de anomalias: direção observada, desvio mínimo e unidade dos alertas
+ANOMALY_RULES = {
+    'cpu': {'direction': 'high', 'floor': 10, 'unit': '%'},
+    'memory': {'direction': 'high', 'floor': 5, 'unit': '%'},
+    'response_times': {'direction': 'high', 'floor': 20, 'unit': 'ms'},
+    'workers.cpu': {'direction': 'high', 'floor': 20, 'unit': '%'},
+    'workers.rss': {'direction': 'high', 'floor': 64 * 1024 * 1024, 'unit': 'B'},
+    'connections.established': {'direction': 'both', 'floor': 20, 'unit': ''},
+}
+
+# Estados TCP gravados por porta (nomes de campo em minúsculas)
+CONNECTION_FIELDS = tuple(state.lower() for state in TCP_STATES)
+
+# Retenção padrão das séries em memória (segundos); as de rede, amostradas a cada
+# segundo, ficam só com a última hora em memória (o histórico completo vai para a base)
+DEFAULT_RETENTION = 24 * 3600
+NETWORK_RETENTION = 3600
+MAX_ERRORS = 1000
+
+# Diretório da base de séries temporais e arquivo do último relatório
+METRICS_DIR = os.environ.get('BOOKVERSE_METRICS_DIR', 'metrics')
+REPORT_FILE = 'performance_report.json'
+
+# Resumo da frota gravado pelo agregador (modo --aggregator)
+FLEET_FILE = 'fleet_report.json'
+FLEET_REPORT_INTERVAL = 10
+
+def format_value(value, unit):
+    """Valor com unidade para as mensagens de alerta"""
+    if unit == 'B':
+        return f"{value / 1024 / 1024:.0f}MB"
+    return f"{value:.1f}{unit}"
+
 class PerformanceMonitor:
-    def __init__(self):
+    def __init__(self, retention=DEFAULT_RETENTION, probes=None, store=None, shared_name=SHARED_NAME,
+                 agent=None):
+        self.retention = retention
+        self.agent = agent
+        self.store = store if store is not None else TimeSeriesStore(METRICS_DIR)
+        self.shared = self.open_shared(shared_name)
+        self.rollups = RollupManager(self.store)
+        self.server_url = 'http://localhost:5000'
+        self.probes = probes if probes is not None else load_probes()
+        # Cada etapa de cenário sondada vira uma sonda '<cenário>-<etapa>' nas séries
+        self.scenarios = [scenario for scenario in load_scenarios() if scenario.probe_interval]
+        step_probes = [probe for scenario in self.scenarios for probe in scenario.probes()]
         self.metrics = {
-            'cpu': [],
-            'memory': [],
-            'network': [],
-            'response_times': [],
-            'errors': []
+            'cpu': RingBuffer.for_retention(retention, SYSTEM_INTERVAL),
+            'memory': RingBuffer.for_retention(
+                retention, SYSTEM_INTERVAL, ('used', 'available', 'percent')
+            ),
+            'network': {},
+            'connections': {
+                port: RingBuffer.for_retention(
+                    min(retention, NETWORK_RETENTION), NETWORK_INTERVAL, CONNECTION_FIELDS, 'l'
+                )
+                for port in DEFAULT_PORTS
+            },
+            'response_times': {
+                probe.name: RingBuffer.for_retention(
+                    retention, probe.interval, ('response_time', 'status_code') + PHASES
+                )
+                for probe in self.probes + step_probes
+            },
+            'workers': {},
+            'self': RingBuffer.for_retention(retention, SELF_INTERVAL, SELF_FIELDS),
+            'collectors': {},
+            'errors': deque(maxlen=MAX_ERRORS)
         }
+        self.worker_collector = WorkerCollector()
+        self.network_collector = NetworkRateCollector()
+        self.dropping_interfaces = set()
+        self.aggregates = AggregateEngine()
+        self.baselines = Baselines()
+        self.leaks = LeakTracker(pm2_memory_limit())
+        self.anomalies = AnomalyDetector(
+            ANOMALY_RULES, os.path.join(self.store.path, 'anomaly.json')
+        )
+        self.slos = SLOEngine(load_slos(), os.path.join(self.store.path, 'slo.json'))
+        self.usage = ProcessUsage()
+        self.spans = Spans(on_span=lambda name, duration: self.aggregates.record(f'spans:{name}', duration))
+        self.profiler = SamplingProfiler('performance-monitor')
+        self.total_errors = 0
+        # Sondas em falha -> horário da primeira falha (o log só registra a transição)
+        self.failing_probes = {}
         self.running = False
-        self.server_url = 'http://localhost:5000'
+        self.probe_engine = None
+        self.scheduler = None
         
+    @staticmethod
+    def open_shared(name):
+        """Cria o segmento de memória compartilhada lido por monitor.py (vazio desativa)"""
+        if not name:
+            return None
+        try:
+            return SharedMetricsWriter(name)
+        except OSError as e:
+            logging.warning(f"⚠️ Memória compartilhada indisponível ({name}): {e}")
+            return None
+    
     def start_monitoring(self):
-        """Inicia o monitoramento"""
+        """Inicia o monitoramento e bloqueia até SIGINT/SIGTERM ou stop_monitoring()"""
         self.running = True
         logging.info("🚀 Iniciando monitor de performance...")
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.running = False
+            logging.info("⏹️ Parando monitor de performance...")
+            with self.spans.span('save'):
+                self.save_metrics()
+            if self.shared:
+                self.shared.close()
+                self.shared = None
+    
+    async def run(self):
+        """Executa todos os coletores em um único event loop"""
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.stop_monitoring)
+            except (NotImplementedError, RuntimeError, ValueError):
+                # Windows ou fora da thread principal: fica o KeyboardInterrupt
+                pass
+        if hasattr(signal, 'SIGUSR1'):
+            # kill -USR1 <pid>: grava um perfil por amostragem de 10s
+            try:
+                loop.add_signal_handler(signal.SIGUSR1, self.profiler.trigger)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass
         
-        # Threads para diferentes tipos de monitoramento
-        threads = [
-            threading.Thread(target=self.monitor_system),
-            threading.Thread(target=self.monitor_server),
-            threading.Thread(target=self.monitor_network),
-            threading.Thread(target=self.generate_reports)
-        ]
+        self.scheduler = Scheduler(on_run=self.record_collector_run, budget=CpuBudget())
+        self.scheduler.add('system', SYSTEM_INTERVAL, self.monitor_system,
+                           fast=SYSTEM_FAST_INTERVAL)
+        self.scheduler.add('workers', WORKER_INTERVAL, self.monitor_workers,
+                           fast=WORKER_FAST_INTERVAL)
+        self.scheduler.add('network', NETWORK_INTERVAL, self.monitor_network,
+                           fast=NETWORK_FAST_INTERVAL)
+        self.scheduler.add('self', SELF_INTERVAL, self.monitor_self)
+        if self.shared:
+            self.scheduler.add('host', HOST_INTERVAL, self.publish_host)
+        self.scheduler.add('reports', REPORT_INTERVAL, self.generate_reports,
+                           delay=REPORT_INTERVAL)
+        self.probe_engine = ProbeEngine(
+            self.server_url, self.probes, on_result=self.record_probe_result
+        )
+        # Jornadas sintéticas dividem o teto de QPS com as sondas de rota
+        scenario_probes = ScenarioProbes(
+            self.server_url, self.scenarios, on_result=self.record_probe_result,
+            limiter=self.probe_engine.limiter
+        )
         
-        for thread in threads:
-            thread.daemon = True
-            thread.start()
-            
+        # A primeira leitura de CPU só define a referência do intervalo
+        psutil.cpu_percent(interval=None)
+        self.usage = ProcessUsage()
+        agent = asyncio.create_task(self.agent.run()) if self.agent else None
         try:
-            while self.running:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            self.stop_monitoring()
+            await self.scheduler.run(self.probe_engine.run(), scenario_probes.run())
+        finally:
+            if agent:
+                # O agente tenta enviar o que restou no spool antes de sair
+                self.agent.stop()
+                await agent
     
     def stop_monitoring(self):
-        """Para o monitoramento"""
+        """Para o monitoramento (seguro para chamar de outra thread)"""
         self.running = False
-        logging.info("⏹️ Parando monitor de performance...")
-        self.save_metrics()
+        if self.scheduler:
+            self.scheduler.stop()
+    
+    def record_collector_run(self, job, lag, duration):
+        """Atraso do tick e duração de cada execução de coletor viram séries"""
+        if job.name not in self.metrics['collectors']:
+            self.metrics['collectors'][job.name] = RingBuffer.for_retention(
+                min(self.retention, NETWORK_RETENTION), job.interval, COLLECTOR_FIELDS
+            )
+        self.record_sample(f'collectors:{job.name}', lag=lag, duration=duration, interval=job.interval)
+        self.aggregates.record(f'collectors:{job.name}.lag', lag)
+        self.aggregates.record(f'collectors:{job.name}.duration', duration)
     
-    def monitor_system(self):
+    async def monitor_self(self):
+        """CPU e RSS do próprio monitor (ele divide a VPS com o servidor Node)"""
+        usage = self.usage.sample()
+        self.record_sample('self', **usage)
+        self.aggregates.record('self.cpu', usage['cpu'])
+        self.aggregates.record('self.rss', usage['rss'])
+    
+    @staticmethod
+    def read_host():
+        disk = psutil.disk_usage(os.path.abspath(os.sep))
+        return disk, find_services()
+    
+    async def publish_host(self):
+        """Disco e serviços para o monitor.py, que no modo compartilhado não coleta nada"""
+        disk, services = await self.scheduler.run_blocking(self.read_host)
+        if not self.shared:
+            return
+        timestamp = time.time()
+        with self.shared.batch():
+            self.shared.append('host.disk_used', timestamp, disk.used)
+            self.shared.append('host.disk_total', timestamp, disk.total)
+            for service, running in services.items():
+                self.shared.append(f'host.{service}', timestamp, float(running))
+    
+    @staticmethod
+    def read_system():
+        # CPU média desde a leitura anterior (sem bloquear com interval=1)
+        return psutil.cpu_percent(interval=None), psutil.virtual_memory()
+    
+    async def monitor_system(self):
         """Monitora recursos do sistema"""
-        while self.running:
-            try:
-                # CPU
-                cpu_percent = psutil.cpu_percent(interval=1)
-                self.metrics['cpu'].append({
-                    'timestamp': datetime.now().isoformat(),
-                    'value': cpu_percent
-                })
-                
-                # Memória
-                memory = psutil.virtual_memory()
-                self.metrics['memory'].append({
-                    'timestamp': datetime.now().isoformat(),
-                    'used': memory.used,
-                    'available': memory.available,
-                    'percent': memory.percent
-                })
-                
-                # Alerta se recursos estão altos
-                if cpu_percent > 80:
-                    logging.warning(f"⚠️ CPU alta: {cpu_percent}%")
-                if memory.percent > 80:
-                    logging.warning(f"⚠️ Memória alta: {memory.percent}%")
-                    
-            except Exception as e:
-                logging.error(f"Erro no monitoramento do sistema: {e}")
-            
-            time.sleep(5)
+        cpu_percent, memory = await self.scheduler.run_blocking(self.read_system)
+        self.record_sample('cpu', value=cpu_percent)
+        self.aggregates.record('cpu', cpu_percent)
+        
+        # Memória
+        self.record_sample(
+            'memory',
+            used=memory.used,
+            available=memory.available,
+            percent=memory.percent
+        )
+        self.aggregates.record('memory', memory.percent)
+        
+        # Fora da linha de base: amostra mais rápido para não perder o pico
+        # (| em vez de or: as duas linhas de base precisam receber a amostra)
+        if self.baselines.deviates('cpu', cpu_percent) | self.baselines.deviates('memory', memory.percent):
+            self.scheduler.tighten('system')
+        
+        # Alerta quando CPU/memória fogem do normal para este horário (não por limite fixo)
+        self.check_anomaly('cpu', cpu_percent)
+        self.check_anomaly('memory', memory.percent)
     
-    def monitor_server(self):
-        """Monitora performance do servidor"""
-        while self.running:
-            try:
-                start_time = time.time()
-                response = requests.get(f"{self.server_url}/api/health", timeout=5)
-                response_time = (time.time() - start_time) * 1000
-                
-                self.metrics['response_times'].append({
-                    'timestamp': datetime.now().isoformat(),
-                    'endpoint': '/api/health',
-                    'response_time': response_time,
-                    'status_code': response.status_code
-                })
-                
-                # Alerta para tempos de resposta altos
-                if response_time > 1000:
-                    logging.warning(f"⚠️ Tempo de resposta alto: {response_time:.2f}ms")
-                
-                if response.status_code != 200:
-                    self.metrics['errors'].append({
-                        'timestamp': datetime.now().isoformat(),
-                        'endpoint': '/api/health',
-                        'status_code': response.status_code,
-                        'error': 'Status code não é 200'
-                    })
-                    
-            except requests.exceptions.RequestException as e:
-                self.metrics['errors'].append({
-                    'timestamp': datetime.now().isoformat(),
-                    'endpoint': '/api/health',
-                    'error': str(e)
-                })
-                logging.error(f"Erro na requisição: {e}")
-            
-            time.sleep(10)
+    async def monitor_workers(self):
+        """Monitora cada worker Node (PM2 cluster ou processos avulsos)"""
+        samples = await self.scheduler.run_blocking(self.worker_collector.sample)
+        for label, sample in samples.items():
+            if label not in self.metrics['workers']:
+                self.metrics['workers'][label] = RingBuffer.for_retention(
+                    self.retention, WORKER_INTERVAL, WORKER_FIELDS
+                )
+            self.record_sample(f'workers:{label}', **sample)
+            self.aggregates.record(f'workers:{label}.cpu', sample['cpu'])
+            self.aggregates.record(f'workers:{label}.rss', sample['rss'])
+            if (self.baselines.deviates(f'workers:{label}.cpu', sample['cpu'])
+                    | self.baselines.deviates(f'workers:{label}.rss', sample['rss'])):
+                self.scheduler.tighten('workers')
+            self.check_anomaly(f'workers:{label}.cpu', sample['cpu'])
+            self.check_anomaly(f'workers:{label}.rss', sample['rss'])
+            self.check_memory_trend(label, sample['rss'])
+        
+        self.check_runaway_workers(samples)
     
-    def monitor_network(self):
-        """Monitora tráfego de rede"""
-        while self.running:
-            try:
-                net_io = psutil.net_io_counters()
-                self.metrics['network'].append({
-                    'timestamp': datetime.now().isoformat(),
-                    'bytes_sent': net_io.bytes_sent,
-                    'bytes_recv': net_io.bytes_recv,
-                    'packets_sent': net_io.packets_sent,
-                    'packets_recv': net_io.packets_recv
-                })
-                
-            except Exception as e:
-                logging.error(f"Erro no monitoramento de rede: {e}")
+    def check_memory_trend(self, label, rss):
+        """Avisa horas antes de o PM2 reiniciar um worker por max_memory_restart"""
+        worker = self.worker_collector.workers.get(label)
+        if worker is None:
+            return
+        for warning in self.leaks.observe(label, worker.pid, time.time(), rss):
+            status = warning['status']
+            heap = ''
+            if status['heap_slope'] is not None and status['heap_slope'] > 0:
+                heap = f", heap +{status['heap_slope'] / 1024 / 1024:.1f}MB/h"
+            logging.warning(f"⚠️ Worker {label} (pid {status['pid']}) deve atingir "
+                            f"{status['limit'] / 1024 / 1024:.0f}MB em {format_hours(warning['hours'])}: "
+                            f"RSS {status['rss'] / 1024 / 1024:.0f}MB, "
+                            f"+{status['rss_slope'] / 1024 / 1024:.1f}MB/h{heap}")
+    
+    def record_health_memory(self, result):
+        """heapUsed do worker que respondeu /api/health entra na tendência daquele PID"""
+        try:
+            health = json.loads(result.body)
+            pid, heap_used = health['pid'], health['memory']['heapUsed']
+        except (ValueError, KeyError, TypeError):
+            return
+        # Cópia: a redescoberta dos workers roda no executor
+        for label, worker in list(self.worker_collector.workers.items()):
+            if worker.pid == pid:
+                self.leaks.observe_heap(label, pid, result.timestamp, heap_used)
+                return
+    
+    def check_runaway_workers(self, samples):
+        """Alerta quando um worker consome muito mais CPU que os demais"""
+        if len(samples) < 2:
+            return
+        
+        cpus = sorted(sample['cpu'] for sample in samples.values())
+        median = cpus[len(cpus) // 2]
+        for label, sample in samples.items():
+            if sample['cpu'] > 50 and sample['cpu'] > 3 * max(median, 1):
+                logging.warning(f"⚠️ Worker {label} fora do padrão: CPU {sample['cpu']:.1f}% "
+                                f"(mediana {median:.1f}%), RSS {sample['rss'] / 1024 / 1024:.0f}MB")
+    
+    def record_probe_result(self, result):
+        """Registra o resultado de uma sonda nas séries da rota"""
+        probe = result.probe
+        endpoint = probe.path.split('?', 1)[0]
+        
+        # Falhas de conexão também contam contra o orçamento de erros
+        self.slos.record(result)
+        
+        # Só a mudança de estado vai para o log; as repetições ficam em `errors`
+        if result.ok:
+            if self.failing_probes.pop(probe.name, None):
+                logging.info(f"✅ Sonda {probe.name} voltou a responder ({endpoint})")
+        elif probe.name not in self.failing_probes:
+            self.failing_probes[probe.name] = result.timestamp
+            reason = result.error or f"HTTP {result.status_code}, esperado {probe.expect_status}"
+            logging.error(f"Erro na requisição {endpoint}: {reason}")
+        
+        if result.error:
+            self.record_error({
+                'timestamp': datetime.now().isoformat(),
+                'endpoint': endpoint,
+                'error': result.error
+            })
+            return
+        
+        self.record_sample(
+            f'response_times:{probe.name}',
+            timestamp=result.timestamp,
+            response_time=result.response_time,
+            status_code=result.status_code,
+            **result.phases
+        )
+        self.aggregates.record('response_times', result.response_time)
+        self.aggregates.record(f'response_times:{probe.name}', result.response_time)
+        if (self.baselines.deviates(f'response_times:{probe.name}', result.response_time)
+                and self.scheduler and self.scheduler.stretch <= 1
+                and probe.name in self.probe_engine.intervals):
+            self.probe_engine.tighten(probe.name)
+        
+        # DNS/conexão/TLS só existem em conexões novas; TTFB e transferência sempre
+        for phase, duration in result.phases.items():
+            self.aggregates.record(f'phase_{phase}:{probe.name}', duration)
+        
+        if probe.path.startswith('/api/health') and result.ok:
+            self.record_health_memory(result)
+        
+        # Alerta para tempos de resposta fora da linha de base da rota
+        self.check_anomaly(f'response_times:{probe.name}', result.response_time, result.timestamp)
+        
+        if not result.ok:
+            self.record_error({
+                'timestamp': datetime.now().isoformat(),
+                'endpoint': endpoint,
+                'status_code': result.status_code,
+                'error': f'Status code não é {probe.expect_status}'
+            })
+    
+    def record_sample(self, name, timestamp=None, **values):
+        """Grava uma amostra no buffer em memória e na base em disco"""
+        if timestamp is None:
+            timestamp = time.time()
+        
+        series, _, child = name.partition(':')
+        if child and series == 'connections':
+            child = int(child)
+        buffer = self.metrics[series][child] if child else self.metrics[series]
+        buffer.append(timestamp, **values)
+        
+        for field, value in values.items():
+            self.store.append(f'{name}.{field}', timestamp, value)
+            self.rollups.record(f'{name}.{field}', timestamp, value)
+        
+        if self.shared:
+            with self.shared.batch():
+                for field, value in values.items():
+                    self.shared.append(f'{name}.{field}', timestamp, value)
+        
+        if self.agent:
+            for field, value in values.items():
+                self.agent.record(f'{name}.{field}', value)
+    
+    def check_anomaly(self, name, value, timestamp=None):
+        """Passa a amostra ao detector e registra no log o início/fim de anomalias"""
+        event = self.anomalies.observe(name, value, timestamp)
+        if event is None:
+            return
+        unit = self.anomalies.rule(name).get('unit', '')
+        if event['type'] == 'start':
+            baseline = 'sazonal' if event['seasonal'] else 'recente'
+            logging.warning(f"⚠️ Anomalia em {name}: {format_value(value, unit)} "
+                            f"(esperado ~{format_value(event['expected'], unit)} pela linha de base "
+                            f"{baseline}, z={event['zscore']:.1f})")
+        else:
+            logging.info(f"✅ {name} voltou ao normal após {event['duration']:.0f}s "
+                         f"(pico {format_value(event['peak'], unit)})")
+    
+    def record_error(self, error):
+        """Registra um erro mantendo a contagem total desde o início"""
+        self.metrics['errors'].append(error)
+        self.total_errors += 1
+    
+    def read_network(self):
+        return self.network_collector.sample(), port_states(DEFAULT_PORTS)
+    
+    async def monitor_network(self):
+        """Monitora taxas por interface e estados TCP das portas do servidor"""
+        timestamp = time.time()
+        interfaces, ports = await self.scheduler.run_blocking(self.read_network)
+        for nic, rates in interfaces.items():
+            if nic not in self.metrics['network']:
+                self.metrics['network'][nic] = RingBuffer.for_retention(
+                    min(self.retention, NETWORK_RETENTION), NETWORK_INTERVAL, NIC_COUNTERS
+                )
+            self.record_sample(f'network:{nic}', timestamp=timestamp, **rates)
+            self.aggregates.record(f'network:{nic}.bytes_recv', rates['bytes_recv'])
+            self.aggregates.record(f'network:{nic}.bytes_sent', rates['bytes_sent'])
+            if (self.baselines.deviates(f'network:{nic}.bytes_recv', rates['bytes_recv'])
+                    | self.baselines.deviates(f'network:{nic}.bytes_sent', rates['bytes_sent'])):
+                self.scheduler.tighten('network')
             
-            time.sleep(15)
+            # Alerta só na transição para não repetir a cada segundo
+            dropped = rates['dropin'] + rates['dropout'] + rates['errin'] + rates['errout']
+            if dropped > 0 and nic not in self.dropping_interfaces:
+                logging.warning(f"⚠️ Pacotes descartados/com erro em {nic}: {dropped:.1f}/s")
+                self.dropping_interfaces.add(nic)
+            elif dropped == 0:
+                self.dropping_interfaces.discard(nic)
+        
+        for port, states in ports.items():
+            self.record_sample(
+                f'connections:{port}',
+                timestamp=timestamp,
+                **{state.lower(): count for state, count in states.items()}
+            )
+            self.aggregates.record(
+                f'connections:{port}.established', states[psutil.CONN_ESTABLISHED]
+            )
+            if self.baselines.deviates(f'connections:{port}.established', states[psutil.CONN_ESTABLISHED]):
+                self.scheduler.tighten('network')
+            self.check_anomaly(
+                f'connections:{port}.established', states[psutil.CONN_ESTABLISHED], timestamp
+            )
     
-    def generate_reports(self):
+    async def generate_reports(self):
         """Gera relatórios periódicos"""
-        while self.running:
-            time.sleep(300)  # A cada 5 minutos
-            try:
-                self.generate_performance_report()
-            except Exception as e:
-                logging.error(f"Erro ao gerar relatório: {e}")
+        # Roda no próprio loop: não concorre com record_sample pelas mesmas estruturas
+        with self.spans.span('rollups'):
+            self.rollups.maintain()
+        with self.spans.span('report'):
+            self.generate_performance_report()
+        self.anomalies.save()
+        self.slos.save()
     
     def generate_performance_report(self):
         """Gera relatório de performance"""
-        if not any(self.metrics.values()):
+        if not self.aggregates.series and not self.total_errors:
             return
-            
+        
+        response_times = self.aggregates.snapshot('response_times')
         report = {
             'timestamp': datetime.now().isoformat(),
             'summary': {
-                'avg_cpu': self.calculate_average('cpu'),
-                'avg_memory': self.calculate_average('memory', 'percent'),
-                'avg_response_time': self.calculate_average('response_times', 'response_time'),
-                'total_errors': len(self.metrics['errors'])
+                'avg_cpu': self.aggregates.mean('cpu'),
+                'avg_memory': self.aggregates.mean('memory'),
+                'avg_response_time': response_times['mean'],
+                'p99_response_time': response_times['p99'],
+                'total_errors': self.total_errors
             },
+            'phases': self.get_phase_breakdown(),
+            'workers': self.get_worker_summary(),
+            'network': self.get_network_summary(),
+            'series': self.aggregates.summary(),
+            'scheduler': self.scheduler.stats() if self.scheduler else {},
+            'overhead': self.get_overhead_summary(),
+            'anomalies': self.anomalies.summary(),
+            'memory_trends': self.leaks.summary(time.time()),
+            'slos': self.slos.summary(),
             'recommendations': self.get_recommendations()
         }
         
-        # Salva relatório
-        with open(f'performance_report_{int(time.time())}.json', 'w') as f:
+        # Salva o último relatório substituindo o anterior de forma atômica
+        temp_file = f'{REPORT_FILE}.tmp'
+        with open(temp_file, 'w') as f:
             json.dump(report, f, indent=2)
+        os.replace(temp_file, REPORT_FILE)
+        self.store.flush()
         
         logging.info(f"📊 Relatório gerado: CPU {report['summary']['avg_cpu']:.1f}%, "
                     f"Memória {report['summary']['avg_memory']:.1f}%, "
-                    f"Resposta {report['summary']['avg_response_time']:.1f}ms")
+                    f"Resposta {report['summary']['avg_response_time']:.1f}ms "
+                    f"(p99 {report['summary']['p99_response_time']:.1f}ms)")
     
-    def calculate_average(self, metric_type, field='value'):
-        """Calcula média de uma métrica"""
-        if not self.metrics[metric_type]:
-            return 0
-        
-        values = [item[field] for item in self.metrics[metric_type] if field in item]
-        return sum(values) / len(values) if values else 0
+    def get_phase_breakdown(self):
+        """Resume as fases das requisições (DNS, conexão, TLS, TTFB, transferência) por sonda"""
+        breakdown = {}
+        for probe in self.probes:
+            phases = {}
+            for phase in PHASES:
+                aggregate = self.aggregates.series.get(f'phase_{phase}:{probe.name}')
+                if aggregate and aggregate.count:
+                    snapshot = aggregate.snapshot()
+                    phases[phase] = {
+                        key: snapshot[key] for key in ('count', 'mean', 'p50', 'p99', 'max')
+                    }
+            if phases:
+                breakdown[probe.name] = phases
+        return breakdown
+    
+    def get_worker_summary(self):
+        """Última amostra e médias de CPU/RSS de cada worker Node"""
+        summary = {}
+        for label, series in self.metrics['workers'].items():
+            latest = series.latest()
+            if latest is None:
+                continue
+            summary[label] = {
+                'latest': latest,
+                'avg_cpu': self.aggregates.mean(f'workers:{label}.cpu'),
+                'p99_cpu': self.aggregates.snapshot(f'workers:{label}.cpu')['p99'],
+                'max_rss': self.aggregates.snapshot(f'workers:{label}.rss')['max'],
+            }
+        return summary
+    
+    def get_overhead_summary(self):
+        """Custo do próprio monitor: CPU, RSS e duração das etapas (ms)"""
+        latest = self.metrics['self'].latest()
+        return {
+            'latest': latest,
+            'avg_cpu': self.aggregates.mean('self.cpu'),
+            'p99_cpu': self.aggregates.snapshot('self.cpu')['p99'],
+            'max_rss': self.aggregates.snapshot('self.rss')['max'],
+            'cpu_budget': self.scheduler.budget.limit if self.scheduler else None,
+            'stretch': self.scheduler.stretch if self.scheduler else 1.0,
+            'probe_intervals': {
+                name: interval.current for name, interval in self.probe_engine.intervals.items()
+            } if self.probe_engine else {},
+            'spans': self.spans.summary(),
+        }
+    
+    def get_network_summary(self):
+        """Taxas médias/pico por interface e estados TCP atuais por porta"""
+        interfaces = {}
+        for nic in self.metrics['network']:
+            interfaces[nic] = {
+                direction: {
+                    'avg': self.aggregates.mean(f'network:{nic}.{direction}'),
+                    'max': self.aggregates.snapshot(f'network:{nic}.{direction}')['max'],
+                }
+                for direction in ('bytes_recv', 'bytes_sent')
+            }
+        connections = {
+            port: series.latest()
+            for port, series in self.metrics['connections'].items()
+            if series.latest() is not None
+        }
+        return {'interfaces': interfaces, 'connections': connections}
     
     def get_recommendations(self):
         """Gera recomendações baseadas nas métricas"""
         recommendations = []
         
-        avg_cpu = self.calculate_average('cpu')
-        avg_memory = self.calculate_average('memory', 'percent')
-        avg_response = self.calculate_average('response_times', 'response_time')
+        avg_cpu = self.aggregates.mean('cpu')
+        avg_memory = self.aggregates.mean('memory')
+        response_times = self.aggregates.snapshot('response_times')
         
         if avg_cpu > 70:
             recommendations.append("CPU alta detectada. Considere otimizar algoritmos ou adicionar cache.")
@@ -206,20 +633,32 @@ class PerformanceMonitor:
         if avg_memory > 70:
             recommendations.append("Uso de memória alto. Verifique vazamentos de memória.")
         
-        if avg_response > 500:
+        if response_times['mean'] > 500:
             recommendations.append("Tempo de resposta alto. Otimize consultas ao banco de dados.")
+        elif response_times['p99'] > 1000:
+            recommendations.append("Latência de cauda alta (p99). Investigue requisições lentas e bloqueios no event loop.")
         
-        if len(self.metrics['errors']) > 10:
+        if self.total_errors > 10:
             recommendations.append("Muitos erros detectados. Verifique logs do servidor.")
         
+        for name, status in self.slos.summary().items():
+            if status['budget_consumed'] is not None and status['budget_consumed'] >= 1:
+                recommendations.append(f"SLO {name} esgotou o orçamento de erros. Priorize estabilidade antes de novas entregas.")
+        
         return recommendations
     
+    def query(self, series, start=None, end=None, step=None):
+        """Consulta uma série usando as camadas de rollup mais grossas que atendem ao intervalo"""
+        used, buckets = self.rollups.query(series, start, end, step)
+        return [tier.name for tier in used], [(bucket_start, aggregate.snapshot()) for bucket_start, aggregate in buckets]
+    
     def save_metrics(self):
-        """Salva métricas em arquivo"""
-        filename = f'metrics_{int(time.time())}.json'
-        with open(filename, 'w') as f:
-            json.dump(self.metrics, f, indent=2)
-        logging.info(f"💾 Métricas salvas em {filename}")
+        """Grava em disco as amostras pendentes e os buckets de rollup abertos"""
+        self.rollups.close()
+        self.store.flush()
+        self.anomalies.save()
+        self.slos.save()
+        logging.info(f"💾 Métricas salvas em {self.store.path}/")
     
     def run_lighthouse_audit(self):
         """Executa auditoria Lighthouse"""
@@ -246,63 +685,137 @@ class PerformanceMonitor:
     
     def optimize_suggestions(self):
         """Sugere otimizações baseadas nas métricas"""
-        suggestions = []
-        
-        # Análise de CPU
-        if self.calculate_average('cpu') > 60:
-            suggestions.extend([
-                "Implementar cache Redis para reduzir processamento",
-                "Otimizar consultas SQL com índices",
-                "Usar compressão gzip no servidor",
-                "Implementar lazy loading no frontend"
-            ])
-        
-        # Análise de memória
-        if self.calculate_average('memory', 'percent') > 60:
-            suggestions.extend([
-                "Implementar garbage collection otimizado",
-                "Reduzir tamanho de bundles JavaScript",
-                "Usar paginação em listas grandes",
-                "Otimizar imagens com WebP"
-            ])
-        
-        # Análise de rede
-        if self.calculate_average('response_times', 'response_time') > 300:
-            suggestions.extend([
-                "Implementar CDN para assets estáticos",
-                "Usar HTTP/2 para multiplexing",
-                "Minificar CSS e JavaScript",
-                "Implementar service workers"
-            ])
-        
-        return suggestions
+        response_times = self.aggregates.snapshot('response_times')
+        return optimize_suggestions({
+            'avg_cpu': self.aggregates.mean('cpu'),
+            'avg_memory': self.aggregates.mean('memory'),
+            'avg_response_time': response_times['mean'],
+            'p99_response_time': response_times['p99'],
+        })
+
+def optimize_suggestions(summary):
+    """Sugestões a partir do resumo de um relatório (médias de CPU/memória e tempos de resposta)"""
+    suggestions = []
+    
+    # Análise de CPU
+    if (summary.get('avg_cpu') or 0) > 60:
+        suggestions.extend([
+            "Implementar cache Redis para reduzir processamento",
+            "Otimizar consultas SQL com índices",
+            "Usar compressão gzip no servidor",
+            "Implementar lazy loading no frontend"
+        ])
+    
+    # Análise de memória
+    if (summary.get('avg_memory') or 0) > 60:
+        suggestions.extend([
+            "Implementar garbage collection otimizado",
+            "Reduzir tamanho de bundles JavaScript",
+            "Usar paginação em listas grandes",
+            "Otimizar imagens com WebP"
+        ])
+    
+    # Análise de rede
+    if (summary.get('avg_response_time') or 0) > 300 or (summary.get('p99_response_time') or 0) > 1000:
+        suggestions.extend([
+            "Implementar CDN para assets estáticos",
+            "Usar HTTP/2 para multiplexing",
+            "Minificar CSS e JavaScript",
+            "Implementar service workers"
+        ])
+    
+    return suggestions
+
+def print_suggestions(path=REPORT_FILE):
+    """Sugestões a partir do último relatório gravado pelo monitor em execução"""
+    try:
+        with open(path) as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        print(f"⚠️ Relatório {path} não encontrado: inicie o monitor (python3 performance-monitor.py) "
+              "e aguarde o primeiro relatório")
+        return False
+    
+    summary = report.get('summary', {})
+    print(f"\n💡 Sugestões de Otimização (relatório de {report.get('timestamp', '?')}):")
+    suggestions = optimize_suggestions(summary)
+    for i, suggestion in enumerate(suggestions, 1):
+        print(f"{i}. {suggestion}")
+    if not suggestions:
+        print("Nenhuma: CPU, memória e tempos de resposta dentro dos limites")
+    return True
+
+async def run_aggregator(host, port, interval=FLEET_REPORT_INTERVAL):
+    """Recebe métricas dos agentes e grava periodicamente o resumo da frota"""
+    aggregator = await PushAggregator(host, port).start()
+    logging.info(f"📡 Agregador escutando em {host}:{aggregator.port} (TCP e UDP)")
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            report = {
+                'timestamp': datetime.now().isoformat(),
+                'nodes': aggregator.node_summary(),
+                'series': aggregator.fleet(),
+                'stats': dict(aggregator.stats),
+            }
+            temp_file = f'{FLEET_FILE}.tmp'
+            with open(temp_file, 'w') as f:
+                json.dump(report, f, indent=2)
+            os.replace(temp_file, FLEET_FILE)
+            logging.info(f"📊 Frota: {len(report['nodes'])} nós, {len(report['series'])} séries, "
+                        f"{aggregator.stats['samples']} amostras recebidas")
+    finally:
+        await aggregator.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Monitor de Performance Avançado (sem argumentos: monitora até SIGINT/SIGTERM)"
+    )
+    parser.add_argument('--lighthouse', action='store_true',
+                        help="Executa a auditoria Lighthouse e sai")
+    parser.add_argument('--suggestions', action='store_true',
+                        help="Mostra sugestões de otimização e sai")
+    parser.add_argument('--agent', metavar='HOST:PORTA',
+                        help="Também envia as métricas a um agregador central")
+    parser.add_argument('--transport', choices=('tcp', 'udp'), default='tcp',
+                        help="Transporte do agente (UDP não confirma entrega)")
+    parser.add_argument('--node', default=os.environ.get('BOOKVERSE_NODE'),
+                        help="Nome deste nó no agregador (padrão: hostname)")
+    parser.add_argument('--aggregator', metavar='[HOST:]PORTA', nargs='?', const=str(PUSH_PORT),
+                        help=f"Executa o agregador central (padrão: porta {PUSH_PORT})")
+    return parser.parse_args()
+
 
 def main():
-    monitor = PerformanceMonitor()
+    args = parse_args()
     
-    print("🚀 Monitor de Performance Avançado")
-    print("Comandos disponíveis:")
-    print("1. start - Iniciar monitoramento")
-    print("2. lighthouse - Executar auditoria Lighthouse")
-    print("3. suggestions - Ver sugestões de otimização")
-    print("4. quit - Sair")
+    if args.aggregator:
+        host, port = parse_address(args.aggregator, default_host='0.0.0.0')
+        try:
+            asyncio.run(run_aggregator(host, port))
+        except KeyboardInterrupt:
+            logging.info("⏹️ Agregador encerrado")
+        return
     
-    while True:
-        command = input("\n> ").strip().lower()
-        
-        if command == 'start':
-            monitor.start_monitoring()
-        elif command == 'lighthouse':
-            monitor.run_lighthouse_audit()
-        elif command == 'suggestions':
-            suggestions = monitor.optimize_suggestions()
-            print("\n💡 Sugestões de Otimização:")
-            for i, suggestion in enumerate(suggestions, 1):
-                print(f"{i}. {suggestion}")
-        elif command == 'quit':
-            break
-        else:
-            print("Comando não reconhecido")
+    if args.lighthouse:
+        # Comando avulso: sem publicar em memória compartilhada
+        PerformanceMonitor(shared_name='').run_lighthouse_audit()
+    if args.suggestions:
+        # As métricas estão com o monitor em execução: lê o último relatório dele
+        if not print_suggestions():
+            raise SystemExit(1)
+    if args.lighthouse or args.suggestions:
+        return
+    
+    agent = None
+    if args.agent:
+        host, port = parse_address(args.agent)
+        agent = PushAgent(host, port, node=args.node, transport=args.transport)
+        logging.info(f"📡 Enviando métricas para {host}:{port} ({args.transport}) como {agent.node}")
+    
+    # Modo daemon: roda sem terminal até SIGINT/SIGTERM
+    PerformanceMonitor(agent=agent).start_monitoring()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
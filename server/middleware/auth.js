@@ -1,5 +1,31 @@
 import jwt from 'jsonwebtoken';
 
+// Usuário de um token (de desenvolvimento ou JWT); lança erro se o token for inválido
+export const verifyToken = function(token) {
+  // Verificar se é um token de desenvolvimento
+  if (token.startsWith('dev_token_')) {
+    const userId = token.replace('dev_token_', '');
+    // Verificar se é o usuário admin (ID = 1)
+    return { id: userId, role: userId === '1' ? 'admin' : 'user' };
+  }
+  // Token JWT normal
+  const decoded = jwt.verify(token, process.env.JWT_SECRET || 'secret');
+  return decoded.user;
+};
+
+// Diagnóstico do processo em /api/health (pid, memória, contadores) só com
+// BOOKVERSE_HEALTH_DETAILS=1 ou token de administrador
+export const showHealthDetails = function(req) {
+  if (process.env.BOOKVERSE_HEALTH_DETAILS === '1') return true;
+  const token = req.header('x-auth-token');
+  if (!token) return false;
+  try {
+    return verifyToken(token)?.role === 'admin';
+  } catch (error) {
+    return false;
+  }
+};
+
 const auth = function(req, res, next) {
   // Pegar token do header
   const token = req.header('x-auth-token');
@@ -10,27 +36,11 @@ const auth = function(req, res, next) {
   }
 
   try {
-    // Verificar se é um token de desenvolvimento
-    if (token.startsWith('dev_token_')) {
-      // Token de desenvolvimento
-      const userId = token.replace('dev_token_', '');
-      
-      // Verificar se é o usuário admin (ID = 1)
-      if (userId === '1') {
-        req.user = { id: userId, role: 'admin' };
-      } else {
-        req.user = { id: userId, role: 'user' };
-      }
-      next();
-    } else {
-      // Token JWT normal
-      const decoded = jwt.verify(token, process.env.JWT_SECRET || 'secret');
-      req.user = decoded.user;
-      next();
-    }
+    req.user = verifyToken(token);
   } catch (error) {
-    res.status(401).json({ message: 'Token inválido' });
+    return res.status(401).json({ message: 'Token inválido' });
   }
+  next();
 };
 
 // Middleware para verificar se é admin
@@ -137,10 +137,71 @@ export const imageOptimization = (req, res, next) => {
   next();
 };
 
+// Contadores de requisições expostos em /api/health (painel multi-nó do monitor.py)
+// Latência em buckets cumulativos: o painel calcula a taxa e o p99 pela diferença entre leituras
+const LATENCY_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000];
+const requestStats = {
+  total: 0,
+  inFlight: 0,
+  latency: new Array(LATENCY_BUCKETS.length + 1).fill(0)
+};
+
+// Linha por requisição no formato bookverse_timed do nginx (combined + tempos), lida por
+// `manage.py logs analyze` em logs/combined.log; ligada com BOOKVERSE_ACCESS_LOG=1
+const ACCESS_LOG = process.env.BOOKVERSE_ACCESS_LOG === '1';
+const MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'];
+const pad = value => String(value).padStart(2, '0');
+const quoted = value => (value || '-').replace(/"/g, '\\x22');
+
+const writeAccessLog = (req, res, elapsed) => {
+  const now = new Date();
+  const time = `${pad(now.getUTCDate())}/${MONTHS[now.getUTCMonth()]}/${now.getUTCFullYear()}:` +
+    `${pad(now.getUTCHours())}:${pad(now.getUTCMinutes())}:${pad(now.getUTCSeconds())} +0000`;
+  // Conexão fechada antes da resposta: 499, como no nginx
+  const status = res.writableFinished ? res.statusCode : 499;
+  const size = res.getHeader('content-length') || '-';
+  const seconds = (elapsed / 1000).toFixed(3);
+  process.stdout.write(
+    `${req.ip || '-'} - - [${time}] "${req.method} ${quoted(req.originalUrl)} HTTP/${req.httpVersion}" ` +
+    `${status} ${size} "${quoted(req.get('referer'))}" "${quoted(req.get('user-agent'))}" ` +
+    `${seconds} ${seconds} ${(now.getTime() / 1000).toFixed(3)}\n`
+  );
+};
+
+export const requestMetrics = (req, res, next) => {
+  const start = process.hrtime.bigint();
+  let done = false;
+  requestStats.total++;
+  requestStats.inFlight++;
+
+  const finish = () => {
+    if (done) return;
+    done = true;
+    requestStats.inFlight--;
+    const elapsed = Number(process.hrtime.bigint() - start) / 1e6;
+    let bucket = LATENCY_BUCKETS.findIndex(limit => elapsed <= limit);
+    if (bucket === -1) bucket = LATENCY_BUCKETS.length;
+    requestStats.latency[bucket]++;
+    if (ACCESS_LOG) writeAccessLog(req, res, elapsed);
+  };
+  res.once('finish', finish);
+  res.once('close', finish);
+  next();
+};
+
+export const getRequestStats = () => ({
+  total: requestStats.total,
+  inFlight: requestStats.inFlight,
+  buckets: LATENCY_BUCKETS,
+  latency: [...requestStats.latency]
+});
+
 export default {
   smartCache,
   optimizedCompression,
   performanceHeaders,
   adaptiveRateLimit,
-  imageOptimization
+  imageOptimization,
+  requestMetrics,
+  getRequestStats
 };
\ No newline at end of file
@@ -17,7 +17,9 @@ import {
   optimizedCompression,
   performanceHeaders,
   adaptiveRateLimit,
-  imageOptimization
+  imageOptimization,
+  requestMetrics,
+  getRequestStats
 } from './middleware/performance.js';
 
 // Importar rotas
@@ -27,7 +29,7 @@ import adminRoutes from './routes/admin.js';
 import notificationRoutes from './routes/notifications.js';
 
 // Importar middleware
-import { authenticateToken } from './middleware/auth.js';
+import { authenticateToken, showHealthDetails } from './middleware/auth.js';
 import firewall from './middleware/firewall.js';
 
 // Importar WebSocket manager
@@ -71,6 +73,7 @@ async function startServer() {
   app.set('x-powered-by', false);
 
   // Middleware de performance (ordem importa!)
+  app.use(requestMetrics);
   app.use(performanceHeaders);
   app.use(optimizedCompression);
   app.use(imageOptimization);
@@ -178,14 +181,21 @@ async function startServer() {
   // Rota de health check otimizada
   app.get('/api/health', (req, res) => {
     res.set('Cache-Control', 'no-cache');
-    res.json({
+    const health = {
       status: 'OK',
       timestamp: new Date().toISOString(),
-      uptime: process.uptime(),
-      memory: process.memoryUsage(),
-      pid: process.pid,
       version: process.env.npm_package_version || '1.0.0'
-    });
+    };
+    // Mesma regra do server.js: diagnóstico do processo só para administradores
+    if (showHealthDetails(req)) {
+      Object.assign(health, {
+        uptime: process.uptime(),
+        memory: process.memoryUsage(),
+        requests: getRequestStats(),
+        pid: process.pid
+      });
+    }
+    res.json(health);
   });
 
   // Rota de status com métricas
@@ -8,11 +8,16 @@ import mongoSanitize from 'express-mongo-sanitize';
 import hpp from 'hpp';
 import { createServer } from 'http';
 import { initializeSocket } from './websocket/socketManager.js';
+import { requestMetrics, getRequestStats } from './middleware/performance.js';
+import { showHealthDetails } from './middleware/auth.js';
 
 config();
 
 const app = express();
 
+// Contadores de requisições e latência (expostos em /api/health)
+app.use(requestMetrics);
+
 // Middleware de segurança
 app.use(helmet({
     contentSecurityPolicy: {
@@ -239,12 +244,21 @@ app.use('/api/admin', adminRoutes);
 
 // Rota de saúde da API
 app.get('/api/health', (req, res) => {
-    res.json({ 
+    const health = {
         status: 'OK', 
         message: 'BookVerse API funcionando',
         database: req.dbType,
         timestamp: new Date().toISOString()
-    });
+    };
+    if (showHealthDetails(req)) {
+        Object.assign(health, {
+            uptime: process.uptime(),
+            memory: process.memoryUsage(),
+            requests: getRequestStats(),
+            pid: process.pid
+        });
+    }
+    res.json(health);
 });
 
 // Rota para a raiz (temporária)
@@ -8,6 +8,22 @@ import subprocess
 import sys
 import os
 
+def shared_metrics_available():
+    """Verifica se o performance-monitor.py está publicando métricas"""
+    try:
+        from monitoring.shm import SharedMetricsReader
+    except ImportError:
+        return False
+    if not SharedMetricsReader.exists():
+        return False
+    try:
+        reader = SharedMetricsReader()
+    except (OSError, ValueError):
+        return False
+    alive = reader.writer_alive()
+    reader.close()
+    return alive
+
 def main():
     print("🚀 Iniciando Monitor BookVerse...")
     
@@ -17,6 +33,10 @@ def main():
         print("Execute este script no diretório raiz do BookVerse")
         sys.exit(1)
     
+    # Com o performance-monitor.py rodando, o painel só lê as métricas publicadas
+    if shared_metrics_available():
+        print("🔗 Usando as métricas do performance-monitor.py (memória compartilhada)")
+    
     try:
         # Executar monitor
         subprocess.run([sys.executable, 'monitor.py'])
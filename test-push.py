@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+🧪 Teste do envio de métricas por push (monitoring/push.py)
+Agentes locais enviam ao mesmo agregador: confere vazão, perdas, reenvios e a
+expiração de nós que param de enviar
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from monitoring.aggregates import SeriesAggregate  # noqa: E402
+from monitoring.push import PushAggregator, encode_frames, throughput_test  # noqa: E402
+
+COLORS = {
+    'info': '\033[96m',
+    'success': '\033[92m',
+    'error': '\033[91m',
+    'warning': '\033[93m',
+    'reset': '\033[0m',
+}
+
+
+class PushTester:
+    def __init__(self, agents=20, duration=2.0):
+        self.agents = agents
+        self.duration = duration
+        self.passed = 0
+        self.failed = 0
+
+    def log(self, message, kind='info'):
+        print(f"{COLORS[kind]}{message}{COLORS['reset']}")
+
+    def test(self, name, test_fn):
+        try:
+            test_fn()
+            self.log(f"✅ {name}", 'success')
+            self.passed += 1
+        except Exception as e:
+            self.log(f"❌ {name}: {e}", 'error')
+            self.failed += 1
+
+    @staticmethod
+    def frame(node, session, seq, value=1.0):
+        aggregate = SeriesAggregate()
+        aggregate.record(value)
+        return encode_frames(node, session, seq, time.time(), {'cpu.value': aggregate})[0][1]
+
+    def test_tcp_lossless(self):
+        result = asyncio.run(throughput_test(self.agents, self.duration, transport='tcp'))
+        self.log(f"   {result['agents']} agentes por {result['seconds']:.1f}s: "
+                 f"{result['samples_per_second']:.0f} amostras/s, {result['frames']} quadros "
+                 f"({result['bytes'] / 1024:.0f} KB)")
+        if not result['samples_recorded']:
+            raise AssertionError("nenhuma amostra gravada pelos agentes")
+        if not result['lossless']:
+            raise AssertionError(f"{result['samples_received']}/{result['samples_recorded']} "
+                                 f"amostras recebidas")
+        if result['fleet_p99'] is None:
+            raise AssertionError("p99 da frota ausente")
+
+    def test_udp(self):
+        # UDP não confirma entrega: perdas só geram aviso, mas algo precisa chegar
+        result = asyncio.run(throughput_test(self.agents, self.duration, transport='udp'))
+        if not result['samples_received']:
+            raise AssertionError("nenhuma amostra recebida")
+        if not result['lossless']:
+            self.log(f"   ⚠️ {result['samples_received']}/{result['samples_recorded']} amostras "
+                     f"(buffer do kernel)", 'warning')
+
+    def test_duplicates(self):
+        aggregator = PushAggregator(window=60)
+        for seq in (0, 1, 1, 0):
+            aggregator.ingest(self.frame('vps-1', 7, seq))
+        if aggregator.stats['samples'] != 2 or aggregator.stats['duplicates'] != 2:
+            raise AssertionError(f"estatísticas inesperadas: {aggregator.stats}")
+        aggregator.ingest(b'lixo')
+        if aggregator.stats['invalid'] != 1:
+            raise AssertionError("quadro inválido não contado")
+
+    def test_expiry(self):
+        aggregator = PushAggregator(window=60, expire_after=30)
+        aggregator.ingest(self.frame('vps-1', 1, 0, 10.0))
+        aggregator.ingest(self.frame('vps-2', 2, 0, 20.0))
+        # vps-2 parou de enviar há mais que expire_after
+        aggregator.nodes['vps-2'].last_seen -= 31
+        if aggregator.fleet()['cpu.value']['count'] != 1:
+            raise AssertionError("nó expirado ainda entra nos totais da frota")
+        if list(aggregator.node_summary()) != ['vps-1']:
+            raise AssertionError(f"nós restantes: {list(aggregator.node_summary())}")
+        # O nó volta a enviar: entra de novo na frota
+        aggregator.ingest(self.frame('vps-2', 2, 1, 20.0))
+        if aggregator.fleet()['cpu.value']['count'] != 2:
+            raise AssertionError("nó que voltou não entrou na frota")
+
+    def run_all(self):
+        self.log('🧪 Testando envio de métricas por push', 'info')
+        self.log('=' * 60, 'info')
+        self.test('Quadros duplicados e inválidos', self.test_duplicates)
+        self.test('Nós sem envios saem da frota', self.test_expiry)
+        self.test(f'TCP sem perdas ({self.agents} agentes)', self.test_tcp_lossless)
+        self.test(f'UDP entrega amostras ({self.agents} agentes)', self.test_udp)
+
+        self.log('\n' + '=' * 60, 'info')
+        self.log('📊 Resumo dos Testes:', 'info')
+        self.log(f"✅ Passou: {self.passed}", 'success')
+        self.log(f"❌ Falhou: {self.failed}", 'error' if self.failed else 'info')
+        return self.failed == 0
+
+
+if __name__ == '__main__':
+    agents = int(os.environ.get('BOOKVERSE_PUSH_AGENTS', 20))
+    duration = float(os.environ.get('BOOKVERSE_PUSH_DURATION', 2))
+    sys.exit(0 if PushTester(agents, duration).run_all() else 1)